@@ -0,0 +1,204 @@
+"""
+Admission control for the expensive endpoints.
+
+Every request in an endpoint class (chat, transcription, report) passes:
+  1. a token bucket per user_id for that class   -> 429 + Retry-After
+  2. optionally, a token bucket per client IP (all classes)
+                                                  -> 429 + Retry-After
+  3. an in-flight cap per class with a short, bounded wait queue
+                                                  -> 503 + Retry-After when full
+so one client cannot monopolise LLM / Whisper capacity, and bursts are shed
+early instead of inflating latency for everyone. A request that fans out to
+several provider calls (/submit_answers) is charged one token per call and
+takes one in-flight slot per call, via check_rate() and acquire_slot().
+
+The per-IP bucket is off by default (RATE_LIMIT_IP_PER_MIN=0): the backend's
+client is normally the Streamlit server, so every end user shares its IP (or
+the proxy's), and a per-IP limit would cap the whole deployment.
+"""
+import asyncio
+import math
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+ENDPOINT_CLASSES = ("chat", "transcription", "report")
+
+# (requests per minute, burst) per user and class
+_DEFAULT_USER_LIMITS = {"chat": (20, 5), "transcription": (30, 10), "report": (3, 2)}
+# (max in flight, max queued) per class
+_DEFAULT_CONCURRENCY = {"chat": (32, 64), "transcription": (16, 32), "report": (4, 8)}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate_per_s: float, capacity: float):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, cost: float = 1) -> Tuple[bool, float]:
+        """Take cost tokens; returns (allowed, seconds until they are available)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A cost above the burst could never be paid, so it takes a full bucket
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (cost - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+    def is_full(self) -> bool:
+        elapsed = time.monotonic() - self.updated
+        return self.tokens + elapsed * self.rate >= self.capacity
+
+
+class RateLimiter:
+    """Token buckets keyed by an identifier, pruned when idle"""
+
+    def __init__(self, per_minute: int, burst: int, max_tracked: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_tracked = max_tracked
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def check(self, key: str, cost: float = 1) -> Tuple[bool, float]:
+        if self.rate <= 0:
+            return True, 0.0
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_tracked:
+                self._prune()
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+        return bucket.try_acquire(cost)
+
+    def _prune(self):
+        # A refilled bucket behaves exactly like a new one, so it can be dropped
+        for key in [k for k, b in self.buckets.items() if b.is_full()]:
+            del self.buckets[key]
+
+
+class ConcurrencyGate:
+    """In-flight cap with a bounded wait queue"""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+class AdmissionController:
+    def __init__(self):
+        self.enabled = os.getenv("ADMISSION_CONTROL", "true").lower() != "false"
+        self.trust_proxy_headers = os.getenv("TRUST_PROXY_HEADERS", "false").lower() == "true"
+        queue_timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "5"))
+        self.user_limiters = {}
+        self.gates = {}
+        for name in ENDPOINT_CLASSES:
+            per_minute, burst = _DEFAULT_USER_LIMITS[name]
+            self.user_limiters[name] = RateLimiter(
+                _env_int(f"RATE_LIMIT_{name.upper()}_PER_MIN", per_minute),
+                _env_int(f"RATE_LIMIT_{name.upper()}_BURST", burst),
+            )
+            limit, max_queue = _DEFAULT_CONCURRENCY[name]
+            self.gates[name] = ConcurrencyGate(
+                _env_int(f"{name.upper()}_MAX_IN_FLIGHT", limit),
+                _env_int(f"{name.upper()}_MAX_QUEUE", max_queue),
+                queue_timeout,
+            )
+        # Opt-in: only meaningful when clients reach the backend directly (see module docstring)
+        self.ip_limiter = RateLimiter(_env_int("RATE_LIMIT_IP_PER_MIN", 0), _env_int("RATE_LIMIT_IP_BURST", 40))
+        self.stats = {name: {"admitted": 0, "rate_limited": 0, "shed": 0} for name in ENDPOINT_CLASSES}
+
+    def client_ip(self, request: Optional[Request]) -> str:
+        if request is None:
+            return "unknown"
+        if self.trust_proxy_headers:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    async def acquire(self, endpoint_class: str, user_id: str, request: Optional[Request]) -> Optional[str]:
+        """Admit a request or raise 429/503; returns a ticket to pass to release()"""
+        if not self.enabled:
+            return None
+        self.check_rate(endpoint_class, user_id, request)
+        return await self.acquire_slot(endpoint_class)
+
+    def check_rate(self, endpoint_class: str, user_id: str, request: Optional[Request], cost: int = 1):
+        """Charge cost tokens to the user's (and client IP's) bucket or raise 429"""
+        if not self.enabled:
+            return
+        stats = self.stats[endpoint_class]
+        checks = [(self.user_limiters[endpoint_class], user_id)]
+        if self.ip_limiter.rate > 0:
+            checks.append((self.ip_limiter, self.client_ip(request)))
+        for limiter, key in checks:
+            allowed, retry_after = limiter.check(key, cost)
+            if not allowed:
+                stats["rate_limited"] += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please slow down",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+
+    async def acquire_slot(self, endpoint_class: str) -> Optional[str]:
+        """Take one in-flight slot of the class or raise 503; returns a ticket to pass to release()"""
+        if not self.enabled:
+            return None
+        stats = self.stats[endpoint_class]
+        if not await self.gates[endpoint_class].acquire():
+            stats["shed"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "2"},
+            )
+        stats["admitted"] += 1
+        return endpoint_class
+
+    def release(self, ticket: Optional[str]):
+        if ticket is not None:
+            self.gates[ticket].release()
+
+    def snapshot(self) -> Dict:
+        return {
+            name: {
+                **self.stats[name],
+                "in_flight": self.gates[name].in_flight,
+                "queue_depth": self.gates[name].waiting,
+                "max_in_flight": self.gates[name].limit,
+            }
+            for name in ENDPOINT_CLASSES
+        }
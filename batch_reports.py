@@ -0,0 +1,268 @@
+"""
+Offline report generation over exported sessions.
+
+Streams sessions from an export written by session_transfer.py (.jsonl.gz,
+.jsonl or .msgpack; a session_store snapshot works too), builds each report
+prompt exactly as /generate_report does and generates the reports on a
+bounded pool of concurrent requests. Every finished report is appended to
+the output JSONL straight away; that file is also the checkpoint, so a rerun
+skips sessions that already have a report for the current REPORT_PROMPT
+and scoring rules.
+
+Rate limits: requests are paced by a token bucket (--rpm). A 429 from the
+provider pauses all workers for its Retry-After and halves the concurrency,
+which then grows back by one after each run of successes.
+
+  python batch_reports.py sessions.jsonl reports.jsonl --concurrency 8 --rpm 300
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from langchain.schema import HumanMessage
+
+from admission import TokenBucket
+from model_routing import DEFAULT_ROUTES, ModelConfig, build_groq_llm
+from prompt_budget import PromptAssembler
+from prompts import REPORT_PROMPT
+from scoring import SCORING_VERSION, load_questionnaire, score_assessment
+from sessions import Session
+from session_transfer import TransferFormatError, iter_file_records, parse_record
+from singleflight import content_key
+
+load_dotenv()
+
+
+def prompt_version() -> str:
+    """Short hash of the report template and scoring rules; reports are only reused for the same version"""
+    return content_key(REPORT_PROMPT.template, SCORING_VERSION)[:12]
+
+
+def iter_sessions(path: str) -> Iterator[Tuple[int, Optional[Tuple[str, Session]], Optional[Exception]]]:
+    """(record number, (user_id, session), None) per record, or (number, None, error) for a
+    record that does not parse. A stream that cannot be decoded further ends with its error."""
+    number = 0
+    try:
+        for number, record in enumerate(iter_file_records(path, yield_errors=True), 1):
+            if isinstance(record, TransferFormatError):
+                yield number, None, record
+                continue
+            try:
+                yield number, parse_record(record), None
+            except TransferFormatError as e:
+                yield number, None, e
+    except TransferFormatError as e:
+        yield number + 1, None, e
+
+
+def load_checkpoint(output_path: str, version: str) -> Set[str]:
+    """user_ids that already have a successful report for this prompt version"""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line of an interrupted run
+            if record.get("status") == "ok" and record.get("prompt_version") == version:
+                done.add(record["user_id"])
+    return done
+
+
+def rate_limit_delay(error: Exception) -> Optional[float]:
+    """Seconds to back off if the error is a provider 429, else None"""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(float(retry_after), 0.5)
+    except (TypeError, ValueError):
+        return 2.0
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on 429s and recovers additively, plus request pacing"""
+
+    def __init__(self, max_concurrency: int, rpm: float):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.successes = 0
+        self.paused_until = 0.0
+        self.bucket = TokenBucket(rpm / 60.0, max(1, max_concurrency)) if rpm > 0 else None
+        self.stats = {"rate_limited": 0, "min_limit": max_concurrency}
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            if self.bucket is not None:
+                allowed, wait = self.bucket.try_acquire()
+                if not allowed:
+                    await asyncio.sleep(wait)
+                    continue
+            return
+
+    async def release(self, retry_after: Optional[float] = None):
+        async with self._condition:
+            self.active -= 1
+            if retry_after is not None:
+                self.stats["rate_limited"] += 1
+                self.limit = max(1, self.limit // 2)
+                self.stats["min_limit"] = min(self.stats["min_limit"], self.limit)
+                self.successes = 0
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            else:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self.successes = 0
+            self._condition.notify_all()
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100.0 * len(ordered))) - 1]
+
+
+async def run_batch(args) -> Dict:
+    version = prompt_version()
+    done = load_checkpoint(args.output, version)
+    config = ModelConfig.from_env("report", DEFAULT_ROUTES["report"])
+    # Retries are handled here so 429s can slow the whole pool down
+    llm = build_groq_llm(config, max_retries=0)
+    assembler = PromptAssembler(verbose=False)
+    questions = load_questionnaire()
+    limiter = AdaptiveLimiter(args.concurrency, args.rpm)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    latencies = []
+    counts = {"read": 0, "invalid": 0, "skipped": 0, "ok": 0, "failed": 0, "empty": 0}
+
+    output = open(args.output, "a", encoding="utf-8")
+
+    def write(record: Dict):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+
+    async def generate(user_id: str, session: Session):
+        scores = score_assessment(questions, session.assessment_responses)
+        prompt, stats = assembler.build_report_prompt(REPORT_PROMPT, session.history, session.assessment_responses, scores)
+        error = None
+        for attempt in range(args.max_retries + 1):
+            await limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = await llm.ainvoke([HumanMessage(content=prompt)])
+            except Exception as e:
+                delay = rate_limit_delay(e)
+                await limiter.release(retry_after=delay)
+                error = e
+                if delay is None:
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+            await limiter.release()
+            latency = time.perf_counter() - start
+            latencies.append(latency)
+            counts["ok"] += 1
+            write({"user_id": user_id, "status": "ok", "prompt_version": version, "model": config.model,
+                   "prompt_tokens": stats["prompt_tokens"], "latency_s": round(latency, 3),
+                   "scores": scores.to_dict(), "report": response.content})
+            return
+        counts["failed"] += 1
+        write({"user_id": user_id, "status": "error", "prompt_version": version, "error": str(error)})
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                await generate(*item)
+            except Exception as e:
+                # A bad session must not kill the worker: the producer's bounded put would block forever
+                print(f"Report for {item[0]} failed: {e}")
+                counts["failed"] += 1
+                write({"user_id": item[0], "status": "error", "prompt_version": version, "error": str(e)})
+            finally:
+                queue.task_done()
+
+    start = time.perf_counter()
+    workers = [asyncio.ensure_future(worker()) for _ in range(args.concurrency)]
+    try:
+        for number, parsed, error in iter_sessions(args.sessions):
+            counts["read"] += 1
+            if error is not None:
+                # Like a failed job, one malformed record must not abort the run
+                print(f"Skipping record {number} of {args.sessions}: {error}")
+                counts["invalid"] += 1
+                continue
+            user_id, session = parsed
+            if user_id in done:
+                counts["skipped"] += 1
+                continue
+            if not session.history and not session.assessment_responses:
+                counts["empty"] += 1
+                continue
+            await queue.put((user_id, session))
+            if args.limit and counts["read"] - counts["invalid"] - counts["skipped"] - counts["empty"] >= args.limit:
+                break
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        output.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        **counts,
+        "prompt_version": version,
+        "model": config.model,
+        "elapsed_s": round(elapsed, 2),
+        "reports_per_s": round(counts["ok"] / elapsed, 2) if elapsed else 0.0,
+        "latency_p50_s": round(_percentile(latencies, 50), 3),
+        "latency_p95_s": round(_percentile(latencies, 95), 3),
+        "rate_limited": limiter.stats["rate_limited"],
+        "min_concurrency": limiter.stats["min_limit"],
+        "final_concurrency": limiter.limit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reports for exported sessions")
+    parser.add_argument("sessions", help="Session export (.jsonl.gz, .jsonl or .msgpack)")
+    parser.add_argument("output", help="Report output (JSONL); reused as the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum concurrent LLM requests")
+    parser.add_argument("--rpm", type=float, default=0, help="Request rate cap per minute (0 = none)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries per session after a failure or 429")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many new sessions (0 = all)")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_batch(args))
+    print(f"Sessions read: {summary['read']} ({summary['invalid']} invalid, {summary['skipped']} already done, "
+          f"{summary['empty']} empty)")
+    print(f"Reports: {summary['ok']} ok, {summary['failed']} failed in {summary['elapsed_s']}s "
+          f"({summary['reports_per_s']} reports/sec), latency p50 {summary['latency_p50_s']}s "
+          f"p95 {summary['latency_p95_s']}s")
+    print(f"Rate limited {summary['rate_limited']} times, concurrency {summary['min_concurrency']}.."
+          f"{summary['final_concurrency']} of {args.concurrency}, model {summary['model']}, "
+          f"prompt version {summary['prompt_version']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Recall / latency / memory sweep for the ANN index types in vector_index.py.
+
+The corpus is grown from the real mhguide_db vectors: each scale step adds
+jittered copies of the original chunks, which keeps the neighbourhood
+structure of the real embeddings. Queries are jittered copies too, and
+recall@k is measured against exact flat search on the same corpus.
+
+  python -m benchmarks.ann_benchmark --scales 1 10 100 --queries 200 --output ann.json
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from benchmarks.common import latency_summary
+from vector_index import build_index, flat_vectors, index_params_from_env
+
+
+def grow_corpus(base: np.ndarray, scale: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    if scale <= 1:
+        return base.copy()
+    copies = [base]
+    spread = noise * np.linalg.norm(base, axis=1).mean() / np.sqrt(base.shape[1])
+    for _ in range(scale - 1):
+        copies.append(base + rng.normal(0, spread, base.shape).astype("float32"))
+    return np.vstack(copies).astype("float32")
+
+
+def sample_queries(base: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    picks = base[rng.integers(0, len(base), count)]
+    spread = noise * np.linalg.norm(base, axis=1).mean() / np.sqrt(base.shape[1])
+    return (picks + rng.normal(0, spread, picks.shape)).astype("float32")
+
+
+def sweep_configs(args) -> List[Dict]:
+    defaults = index_params_from_env()
+    configs = [{**defaults, "type": "flat"}]
+    for m in args.hnsw_m:
+        for ef in args.hnsw_ef_search:
+            configs.append({**defaults, "type": "hnsw", "hnsw_m": m, "hnsw_ef_search": ef})
+    for pq_m in args.pq_m:
+        for nprobe in args.ivf_nprobe:
+            configs.append({**defaults, "type": "ivfpq", "pq_m": pq_m, "ivf_nprobe": nprobe})
+    return configs
+
+
+def describe(params: Dict) -> str:
+    if params["type"] == "hnsw":
+        return f"hnsw M={params['hnsw_m']} efSearch={params['hnsw_ef_search']}"
+    if params["type"] == "ivfpq":
+        return f"ivfpq m={params['pq_m']} nprobe={params['ivf_nprobe']}"
+    return "flat"
+
+
+def benchmark_index(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict:
+    latencies = []
+    hits = 0
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(set(ids[0]) & set(truth[i]))
+    summary = latency_summary(latencies)
+    return {
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "query_p50_ms": summary["p50_ms"],
+        "query_p95_ms": summary["p95_ms"],
+        "memory_mb": round(len(faiss.serialize_index(index)) / (1024 * 1024), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep ANN index configurations")
+    parser.add_argument("--db", default="mhguide_db/index.faiss", help="Flat FAISS index to grow from")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Corpus size multipliers")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.3, help="Relative jitter for synthetic copies")
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--hnsw-ef-search", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[48, 96])
+    parser.add_argument("--ivf-nprobe", type=int, nargs="+", default=[4, 16, 32])
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(args.seed)
+    base = flat_vectors(faiss.read_index(args.db)).astype("float32")
+    results = []
+
+    print(f"{'corpus':>8} {'config':<30}{'build_s':>9}{'recall@' + str(args.k):>10}{'p50_ms':>9}{'p95_ms':>9}{'mem_mb':>9}")
+    for scale in args.scales:
+        corpus = grow_corpus(base, scale, args.noise, rng)
+        queries = sample_queries(base, args.queries, args.noise, rng)
+        exact = faiss.IndexFlatL2(corpus.shape[1])
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+
+        for params in sweep_configs(args):
+            start = time.perf_counter()
+            index = build_index(corpus, params)
+            build_seconds = time.perf_counter() - start
+            row = {
+                "corpus_size": len(corpus),
+                "config": describe(params),
+                "params": params,
+                "build_s": round(build_seconds, 3),
+                **benchmark_index(index, queries, truth, args.k),
+            }
+            results.append(row)
+            print(f"{row['corpus_size']:>8} {row['config']:<30}{row['build_s']:>9.2f}{row['recall_at_k']:>10.3f}"
+                  f"{row['query_p50_ms']:>9.3f}{row['query_p95_ms']:>9.3f}{row['memory_mb']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"k": args.k, "queries": args.queries, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Cold-start latency with and without the start-up warm-up.
+
+Starts the backend against the fake providers, once with WARMUP=false and
+once with the warm-up, several times each. For every start it measures the
+time until /ready answers 200, the warm-up duration the backend reports, and
+the latency of the first /chat (a common query and an unseen one) and the
+first /submit_answer. The fake providers have no DNS/TLS set-up cost, so
+against the real providers the difference is larger.
+
+  python -m benchmarks.cold_start --runs 3
+"""
+import argparse
+import json
+import statistics
+import time
+
+import requests
+
+from benchmarks.common import start_backend, start_fake_providers, stop_backend, synthetic_wav
+from warmup import DEFAULT_WARMUP_QUERIES
+
+
+def timed_ms(request) -> float:
+    start = time.perf_counter()
+    response = request()
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def cold_start(provider_env, warmup: bool, run: int):
+    start = time.perf_counter()
+    backend, base_url = start_backend(provider_env, {"WARMUP": str(warmup).lower(), "ADMISSION_CONTROL": "false"})
+    ready_s = time.perf_counter() - start
+    user_id = f"cold-start-{run}"
+    try:
+        first_chat = timed_ms(lambda: requests.post(f"{base_url}/chat", timeout=60, json={
+            "user_id": user_id, "message": DEFAULT_WARMUP_QUERIES[run % len(DEFAULT_WARMUP_QUERIES)]}))
+        unseen_chat = timed_ms(lambda: requests.post(f"{base_url}/chat", timeout=60, json={
+            "user_id": user_id, "message": f"Something else on my mind today ({run})"}))
+        requests.post(f"{base_url}/assessment_response", json={"user_id": user_id, "accept_assessment": True})
+        first_answer = timed_ms(lambda: requests.post(
+            f"{base_url}/submit_answer", timeout=60, data={"user_id": user_id, "question_id": 0},
+            files={"audio_file": ("answer.wav", synthetic_wav(run), "audio/wav")}))
+        warmup_ms = requests.get(f"{base_url}/ready").json()["warmup_ms"]
+    finally:
+        stop_backend(backend)
+    return {"ready_s": ready_s, "warmup_ms": warmup_ms or 0.0, "first_chat_ms": first_chat,
+            "unseen_chat_ms": unseen_chat, "first_answer_ms": first_answer}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark first-request latency after a cold start")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    server, provider_env = start_fake_providers()
+    results = {}
+    try:
+        for warmup in (False, True):
+            runs = [cold_start(provider_env, warmup, run) for run in range(args.runs)]
+            results["warmup" if warmup else "no_warmup"] = {
+                metric: round(statistics.median(r[metric] for r in runs), 2) for metric in runs[0]}
+    finally:
+        server.should_exit = True
+
+    metrics = list(next(iter(results.values())))
+    print(f"\n{'':<12}" + "".join(f"{m:>16}" for m in metrics))
+    for mode, r in results.items():
+        print(f"{mode:<12}" + "".join(f"{r[m]:>16}" for m in metrics))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Shared helpers for the benchmark scripts: percentiles, synthetic audio,
+process memory and launching the backend against the fake providers.
+"""
+import io
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+import wave
+from typing import Dict, List, Optional
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import fake_providers  # noqa: E402
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values_ms),
+        "mean_ms": round(sum(values_ms) / len(values_ms), 2) if values_ms else 0.0,
+        "p50_ms": round(percentile(values_ms, 50), 2),
+        "p95_ms": round(percentile(values_ms, 95), 2),
+        "p99_ms": round(percentile(values_ms, 99), 2),
+        "max_ms": round(max(values_ms), 2) if values_ms else 0.0,
+    }
+
+
+def synthetic_wav(seed: int, seconds: float = 1.0, rate: int = 16000) -> bytes:
+    """Short sine tone whose pitch depends on the seed, so every answer has distinct bytes"""
+    frequency = 220 + (seed % 50) * 10
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        sample = int(12000 * math.sin(2 * math.pi * frequency * i / rate))
+        frames += sample.to_bytes(2, "little", signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Resident set size of a process in MB (Linux /proc), None when unavailable"""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_providers(config: Optional["fake_providers.FakeProviderConfig"] = None):
+    """Start the fake providers in-process and return (server, env) for the backend"""
+    port = free_port()
+    server = fake_providers.start_in_thread(port=port, config=config)
+    return server, fake_providers.provider_env(port=port)
+
+
+def start_backend(provider_env: Dict[str, str], extra_env: Optional[Dict[str, str]] = None,
+                  timeout: float = 120.0):
+    """Launch main.py under uvicorn in a subprocess and wait until /ready reports the warm-up done"""
+    port = free_port()
+    env = dict(os.environ)
+    env.update(provider_env)
+    env.update(extra_env or {})
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("Backend did not start in time")
+
+
+def stop_backend(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
@@ -0,0 +1,109 @@
+"""
+Embedding throughput with and without the micro-batcher.
+
+Simulates concurrent chat users that each embed a series of queries through
+the real HuggingFaceEndpointEmbeddings client pointed at the fake provider,
+first unbatched (one HTTP call per query) and then through
+EmbeddingMicroBatcher. The fake endpoint serves a bounded number of requests
+at once, like a vendor endpoint does. Reports backend embedding calls/sec,
+queries/sec and per-query p50/p95 latency.
+
+  python -m benchmarks.embedding_batching --users 64 --queries-per-user 20 --window-ms 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import requests
+
+from benchmarks.common import latency_summary, start_fake_providers
+from benchmarks.load_test import CHAT_MESSAGES
+from fake_providers import FakeProviderConfig, LatencyDistribution
+
+
+async def run_users(embed, users: int, queries_per_user: int, think_ms: float, seed: int):
+    latencies = []
+
+    async def user(index: int):
+        rng = random.Random(seed * 7919 + index)
+        for _ in range(queries_per_user):
+            await asyncio.sleep(rng.uniform(0, think_ms) / 1000.0)
+            text = f"{rng.choice(CHAT_MESSAGES)} ({index}-{rng.randrange(10**6)})"
+            start = time.perf_counter()
+            await embed(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_mode(embeddings, batched: bool, args):
+    from embedding_batcher import EmbeddingMicroBatcher
+
+    if batched:
+        embed = EmbeddingMicroBatcher(embeddings, window_ms=args.window_ms, max_batch_size=args.max_batch_size).embed
+    else:
+        embed = embeddings.aembed_query
+    return await run_users(embed, args.users, args.queries_per_user, args.think_ms, args.seed)
+
+
+def measure(embeddings, batched: bool, base_url: str, args):
+    requests.post(f"{base_url}/_reset")
+    latencies, elapsed = asyncio.run(run_mode(embeddings, batched, args))
+    stats = requests.get(f"{base_url}/_stats").json()
+    summary = latency_summary(latencies)
+    return {
+        "mode": "micro-batched" if batched else "unbatched",
+        "queries": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "queries_per_s": round(len(latencies) / elapsed, 1),
+        "embedding_calls": stats["embedding_calls"],
+        "embedding_calls_per_s": round(stats["embedding_calls"] / elapsed, 1),
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding micro-batching")
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--queries-per-user", type=int, default=20)
+    parser.add_argument("--think-ms", type=float, default=50.0, help="Max random pause between a user's queries")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--embed-latency", default="lognormal:40,0.3", help="Fake endpoint latency per call")
+    parser.add_argument("--embed-concurrency", type=int, default=8,
+                        help="Requests the fake endpoint serves at once (vendor-side limit)")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    config = FakeProviderConfig()
+    config.embeddings.latency = LatencyDistribution.parse(args.embed_latency)
+    config.embeddings.concurrency = args.embed_concurrency
+    server, env = start_fake_providers(config)
+    os.environ.update(env)
+
+    from ingest import build_embeddings
+
+    embeddings = build_embeddings()
+    results = [measure(embeddings, batched, env["GROQ_BASE_URL"], args) for batched in (False, True)]
+
+    print(f"\n{'mode':<15}{'queries':>9}{'q/s':>9}{'calls':>8}{'calls/s':>9}{'p50_ms':>9}{'p95_ms':>9}")
+    for r in results:
+        print(f"{r['mode']:<15}{r['queries']:>9}{r['queries_per_s']:>9}{r['embedding_calls']:>8}"
+              f"{r['embedding_calls_per_s']:>9}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
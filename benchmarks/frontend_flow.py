@@ -0,0 +1,115 @@
+"""
+Interaction latency of the full assessment flow in the Streamlit frontend.
+
+Drives front.py headlessly with streamlit's AppTest against the backend and
+fake providers: chat until the assessment is offered, accept it, answer
+every question, open the report page and generate the report. Each user
+interaction is timed from the click (or chat input) until the script runs it
+triggered, including st.rerun(), have finished, i.e. until the page is
+interactive again.
+
+Answers are submitted through the "Retry Audio Processing" path with a
+synthetic WAV placed in session state, since the audio recorder component
+cannot be clicked headlessly. With --batch-submit the "Answer all, then
+submit" mode is switched on instead: the WAVs are only recorded per question
+and sent together by "Submit All Answers" (/submit_answers).
+
+  python -m benchmarks.frontend_flow --runs 3
+  python -m benchmarks.frontend_flow --runs 3 --batch-submit
+  python -m benchmarks.frontend_flow --script old_front.py   # compare another version
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from collections import defaultdict
+
+from benchmarks.common import REPO_ROOT, start_backend, start_fake_providers, stop_backend, synthetic_wav
+from benchmarks.load_test import CHAT_MESSAGES
+
+
+def timed(timings, step: str, element):
+    start = time.perf_counter()
+    app = element.run()
+    timings[step].append((time.perf_counter() - start) * 1000)
+    if app.exception:
+        raise RuntimeError(f"{step}: {app.exception[0].message}")
+    return app
+
+
+def run_flow(script: str, max_chat_turns: int, batch_submit: bool = False):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(script, default_timeout=180)
+    app.run()
+    timings = defaultdict(list)
+    for turn in range(max_chat_turns):
+        app = timed(timings, "chat_message", app.chat_input[0].set_value(CHAT_MESSAGES[turn % len(CHAT_MESSAGES)]))
+        if app.session_state["show_assessment_prompt"]:
+            break
+    else:
+        raise RuntimeError(f"Assessment not offered within {max_chat_turns} chat turns")
+
+    app = timed(timings, "accept_assessment", app.button(key="accept_assessment").click())
+    if batch_submit:
+        app = app.toggle(key="batch_submit").set_value(True).run()
+    for question in range(len(app.session_state["questions"])):
+        app.session_state[f"temp_audio_{question}"] = synthetic_wav(question)
+        app.run()
+        if not batch_submit:
+            app = timed(timings, "submit_answer", app.button(key=f"retry_audio_{question}").click())
+        app = timed(timings, "next_question", app.button(key=f"next_btn_{question}").click())
+    if batch_submit:
+        app = timed(timings, "submit_all_answers", app.button(key="submit_all_answers").click())
+
+    app = timed(timings, "open_report_page", app.button(key="generate_report_btn").click())
+    app = timed(timings, "generate_report", app.button(key="start_report_generation").click())
+    if not app.session_state["generated_report"]:
+        raise RuntimeError("No report was generated")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark interaction latency of the assessment flow")
+    parser.add_argument("--script", default=os.path.join(REPO_ROOT, "front.py"), help="Streamlit script to drive")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-chat-turns", type=int, default=10)
+    parser.add_argument("--batch-submit", action="store_true", help='Use the "Answer all, then submit" mode')
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    server, provider_env = start_fake_providers()
+    # Several full journeys from one client would hit the per-user/IP limits
+    backend, base_url = start_backend(provider_env, {"ADMISSION_CONTROL": "false"})
+    os.environ["API_BASE_URL"] = base_url
+    steps = defaultdict(list)
+    flow_totals = []
+    try:
+        for _ in range(args.runs):
+            timings = run_flow(args.script, args.max_chat_turns, args.batch_submit)
+            for step, values in timings.items():
+                steps[step].extend(values)
+            flow_totals.append(sum(sum(values) for values in timings.values()))
+    finally:
+        stop_backend(backend)
+        server.should_exit = True
+
+    results = {
+        "steps": {step: {"count": len(values), "median_ms": round(statistics.median(values), 1),
+                         "max_ms": round(max(values), 1)} for step, values in steps.items()},
+        "flow_total_s": round(statistics.median(flow_totals) / 1000, 2),
+    }
+    print(f"\n{'step':<20}{'count':>7}{'median_ms':>11}{'max_ms':>10}")
+    for step, r in results["steps"].items():
+        print(f"{step:<20}{r['count']:>7}{r['median_ms']:>11}{r['max_ms']:>10}")
+    print(f"full flow (median of {args.runs} runs): {results['flow_total_s']}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
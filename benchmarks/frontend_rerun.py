@@ -0,0 +1,92 @@
+"""
+Streamlit rerun time of the chat page against conversation length.
+
+Runs front.py headlessly with streamlit's AppTest against the backend and
+fake providers, seeds the session with N chat exchanges and times repeated
+reruns, once rendering the whole history (CHAT_HISTORY_WINDOW=0) and once
+with the default window. Reports the median/p95 script run time, the time
+spent rendering the history and how many elements the page produced.
+
+  python -m benchmarks.frontend_rerun --lengths 10,50,200,500 --reruns 10
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from benchmarks.common import REPO_ROOT, percentile, start_backend, start_fake_providers, stop_backend
+from benchmarks.load_test import CHAT_MESSAGES
+from fake_providers import fake_completion_text
+
+
+def seeded_history(length: int, reply_words: int):
+    history = []
+    for i in range(length):
+        message = CHAT_MESSAGES[i % len(CHAT_MESSAGES)]
+        reply = fake_completion_text([{"content": f"{message} {i}"}], reply_words)
+        history.append({"user": f"{message} [{i}]", "assistant": reply})
+    return history
+
+
+def measure(length: int, window: int, reruns: int, reply_words: int):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["CHAT_HISTORY_WINDOW"] = str(window)
+    app = AppTest.from_file(os.path.join(REPO_ROOT, "front.py"), default_timeout=60)
+    app.session_state["chat_history"] = seeded_history(length, reply_words)
+    app.run()  # first run builds the session state and imports
+    runs, render_ms = [], []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        runs.append((time.perf_counter() - start) * 1000)
+        render_ms.append(app.session_state["last_history_render_ms"])
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return {
+        "exchanges": length,
+        "window": window or "all",
+        "rerun_p50_ms": round(statistics.median(runs), 1),
+        "rerun_p95_ms": round(percentile(runs, 95), 1),
+        "history_render_p50_ms": round(statistics.median(render_ms), 2),
+        "markdown_elements": len(app.markdown),
+        "markdown_kb": round(sum(len(m.value) for m in app.markdown) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Streamlit chat page reruns")
+    parser.add_argument("--lengths", default="10,50,200,500", help="Comma-separated conversation lengths")
+    parser.add_argument("--window", type=int, default=20, help="Windowed variant's CHAT_HISTORY_WINDOW")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--reply-words", type=int, default=80)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    server, provider_env = start_fake_providers()
+    backend, base_url = start_backend(provider_env)
+    os.environ["API_BASE_URL"] = base_url
+    results = []
+    try:
+        for length in (int(n) for n in args.lengths.split(",")):
+            for window in (0, args.window):
+                results.append(measure(length, window, args.reruns, args.reply_words))
+    finally:
+        stop_backend(backend)
+        server.should_exit = True
+
+    print(f"\n{'exchanges':>9}{'window':>8}{'rerun_p50':>11}{'rerun_p95':>11}{'render_p50':>12}"
+          f"{'elements':>10}{'html_kb':>9}")
+    for r in results:
+        print(f"{r['exchanges']:>9}{r['window']:>8}{r['rerun_p50_ms']:>11}{r['rerun_p95_ms']:>11}"
+              f"{r['history_render_p50_ms']:>12}{r['markdown_elements']:>10}{r['markdown_kb']:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Tail latency of chat completions with and without hedging.
+
+Sends chat prompts through HedgedChat against the fake provider, whose
+time-to-first-token follows a heavy-tailed distribution, first with hedging
+disabled and then enabled. Reports p50/p95/p99 latency, how often the hedge
+fired, which request won, deadline fallbacks and the extra provider calls
+hedging cost.
+
+  python -m benchmarks.hedging_benchmark --requests 300 --concurrency 16 --hedge-after-ms 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import requests
+
+from benchmarks.common import latency_summary, start_fake_providers
+from benchmarks.load_test import CHAT_MESSAGES
+from fake_providers import FakeProviderConfig, LatencyDistribution
+
+
+def build_chat(model_name: str):
+    from model_routing import ModelConfig, build_groq_llm
+
+    return build_groq_llm(ModelConfig(model_name))
+
+
+async def run_requests(chat, total: int, concurrency: int, seed: int):
+    from langchain.schema import HumanMessage
+
+    rng = random.Random(seed)
+    prompts = [rng.choice(CHAT_MESSAGES) for _ in range(total)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(prompt: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await chat.ainvoke([HumanMessage(content=prompt)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in prompts))
+    return latencies, time.perf_counter() - start
+
+
+async def measure(hedged: bool, base_url: str, args):
+    from llm_hedging import HedgedChat
+
+    chat = HedgedChat(
+        build_chat("llama-3.3-70b-versatile"),
+        build_chat(args.backup_model) if hedged else None,
+        hedge_after_ms=args.hedge_after_ms,
+        deadline_s=args.deadline_s,
+    )
+    requests.post(f"{base_url}/_reset")
+    latencies, elapsed = await run_requests(chat, args.requests, args.concurrency, args.seed)
+    provider_calls = requests.get(f"{base_url}/_stats").json()["chat_stream_calls"]
+    return {
+        "mode": "hedged" if hedged else "primary only",
+        **latency_summary(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "provider_calls": provider_calls,
+        **chat.snapshot(),
+    }
+
+
+async def measure_all(base_url: str, args):
+    # One event loop for both runs: the Groq async clients must close on the loop they were opened on
+    return [await measure(hedged, base_url, args) for hedged in (False, True)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hedged chat completions")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chat-latency", default="lognormal:400,0.8",
+                        help="Fake time-to-first-token distribution (heavy tail)")
+    parser.add_argument("--hedge-after-ms", type=float, default=800.0)
+    parser.add_argument("--deadline-s", type=float, default=25.0)
+    parser.add_argument("--backup-model", default="llama-3.1-8b-instant")
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    config = FakeProviderConfig(seed=args.seed)
+    config.chat.latency = LatencyDistribution.parse(args.chat_latency)
+    server, env = start_fake_providers(config)
+    os.environ.update(env)
+
+    results = asyncio.run(measure_all(env["GROQ_BASE_URL"], args))
+
+    print(f"\n{'mode':<14}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}{'max_ms':>9}{'hedge%':>8}"
+          f"{'backup_wins':>13}{'fallbacks':>11}{'calls':>7}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}"
+              f"{r['hedge_rate'] * 100:>7.1f}%{r['backup_wins']:>13}{r['deadline_fallbacks']:>11}{r['provider_calls']:>7}")
+    baseline, hedged = results
+    if baseline["p99_ms"]:
+        print(f"p99 improvement: {(1 - hedged['p99_ms'] / baseline['p99_ms']) * 100:.1f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+End-to-end load test of the FastAPI backend.
+
+Each virtual user runs the full journey:
+  /chat x N -> /assessment_response -> /get_questions -> /submit_answer x 7 -> /generate_report
+
+By default the backend is started in a subprocess against the fake providers
+(fake_providers.py), so results only reflect our own code. Admission control
+is off for that backend, since all virtual users share one client and the
+per-user limits would turn the test into a rate-limit test; pass
+--backend-env ADMISSION_CONTROL=true to measure with it. Use --base-url to
+drive an already running deployment instead.
+
+  python -m benchmarks.load_test --users 20 --chat-turns 5 --output baseline.json
+  python -m benchmarks.load_test --users 20 --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import (latency_summary, rss_mb, start_backend, start_fake_providers,
+                               stop_backend, synthetic_wav)
+
+CHAT_MESSAGES = [
+    "I've been feeling anxious lately and can't really explain why.",
+    "My sleep has been terrible, I keep waking up at 3am.",
+    "Work is overwhelming and I feel like I'm falling behind.",
+    "Sometimes I get a panic attack before meetings.",
+    "I don't enjoy the things I used to like anymore.",
+    "My friends say I seem withdrawn recently.",
+    "I find it hard to concentrate on anything for long.",
+]
+
+
+class JourneyRecorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.completed_journeys = 0
+
+    async def call(self, name: str, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        finally:
+            self.latencies[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return None
+        return response
+
+
+async def run_journey(client: httpx.AsyncClient, recorder: JourneyRecorder, user_index: int,
+                      chat_turns: int, seed: int):
+    rng = random.Random(seed * 100003 + user_index)
+    user_id = f"bench-{seed}-{user_index}"
+
+    for _ in range(chat_turns):
+        payload = {"user_id": user_id, "message": rng.choice(CHAT_MESSAGES)}
+        if await recorder.call("/chat", client.post("/chat", json=payload)) is None:
+            return
+
+    await recorder.call("/assessment_response", client.post(
+        "/assessment_response", json={"user_id": user_id, "accept_assessment": True}))
+
+    response = await recorder.call("/get_questions", client.get(f"/get_questions/{user_id}"))
+    if response is None:
+        return
+    questions = response.json()["questions"]
+
+    for question in questions:
+        audio = synthetic_wav(seed=user_index * 31 + question["question_id"] + seed)
+        await recorder.call("/submit_answer", client.post(
+            "/submit_answer",
+            data={"user_id": user_id, "question_id": str(question["question_id"])},
+            files={"audio_file": ("audio.wav", audio, "audio/wav")},
+        ))
+
+    if await recorder.call("/generate_report", client.post(
+            "/generate_report", json={"user_id": user_id})) is not None:
+        recorder.completed_journeys += 1
+
+
+async def run_load(base_url: str, users: int, chat_turns: int, ramp_up: float, seed: int,
+                   timeout: float) -> JourneyRecorder:
+    recorder = JourneyRecorder()
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def delayed(index: int):
+            await asyncio.sleep(ramp_up * index / max(users, 1))
+            await run_journey(client, recorder, index, chat_turns, seed)
+
+        await asyncio.gather(*(delayed(i) for i in range(users)))
+    return recorder
+
+
+def build_report(recorder: JourneyRecorder, args, elapsed: float,
+                 rss_start: Optional[float], rss_end: Optional[float]) -> Dict:
+    endpoints = {}
+    for name, values in recorder.latencies.items():
+        summary = latency_summary(values)
+        summary["errors"] = recorder.errors.get(name, 0)
+        endpoints[name] = summary
+    total_requests = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "config": {
+            "users": args.users,
+            "chat_turns": args.chat_turns,
+            "ramp_up_s": args.ramp_up,
+            "seed": args.seed,
+            "target": args.base_url or "local-fake-providers",
+        },
+        "endpoints": endpoints,
+        "throughput": {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total_requests,
+            "requests_per_s": round(total_requests / elapsed, 2) if elapsed else 0.0,
+            "completed_journeys": recorder.completed_journeys,
+            "journeys_per_s": round(recorder.completed_journeys / elapsed, 3) if elapsed else 0.0,
+        },
+        "memory": {
+            "rss_start_mb": round(rss_start, 1) if rss_start is not None else None,
+            "rss_end_mb": round(rss_end, 1) if rss_end is not None else None,
+            "growth_mb": round(rss_end - rss_start, 1) if rss_start is not None and rss_end is not None else None,
+        },
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a list of regressions (p95/p99 per endpoint, throughput, memory growth)"""
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if previous[key] and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name} {key}: {previous[key]} -> {current[key]}")
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name} errors: {previous.get('errors', 0)} -> {current['errors']}")
+    previous_rps = baseline.get("throughput", {}).get("requests_per_s")
+    if previous_rps and report["throughput"]["requests_per_s"] < previous_rps * (1 - tolerance):
+        regressions.append(f"requests_per_s: {previous_rps} -> {report['throughput']['requests_per_s']}")
+    previous_growth = baseline.get("memory", {}).get("growth_mb")
+    current_growth = report["memory"]["growth_mb"]
+    if previous_growth is not None and current_growth is not None:
+        if current_growth > max(previous_growth * (1 + tolerance), previous_growth + 5):
+            regressions.append(f"memory growth_mb: {previous_growth} -> {current_growth}")
+    return regressions
+
+
+def print_report(report: Dict):
+    print(f"\n{'endpoint':<22}{'count':>7}{'err':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, s in report["endpoints"].items():
+        print(f"{name:<22}{s['count']:>7}{s['errors']:>6}{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+    t = report["throughput"]
+    print(f"\nThroughput: {t['requests_per_s']} req/s, {t['journeys_per_s']} journeys/s "
+          f"({t['completed_journeys']} journeys in {t['elapsed_s']}s)")
+    m = report["memory"]
+    if m["growth_mb"] is not None:
+        print(f"Backend RSS: {m['rss_start_mb']} MB -> {m['rss_end_mb']} MB (growth {m['growth_mb']} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the full user journey")
+    parser.add_argument("--users", type=int, default=10, help="Number of concurrent virtual users")
+    parser.add_argument("--chat-turns", type=int, default=5, help="/chat calls per journey")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="Seconds over which users start")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--base-url", help="Drive an already running backend instead of a local one")
+    parser.add_argument("--backend-env", action="append", default=[],
+                        help="Extra KEY=VALUE environment for the local backend (repeatable)")
+    parser.add_argument("--output", help="Write the machine-readable results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    process = None
+    provider_server = None
+    base_url = args.base_url
+    if not base_url:
+        provider_server, provider_env = start_fake_providers()
+        extra_env = {"ADMISSION_CONTROL": "false", **dict(item.split("=", 1) for item in args.backend_env)}
+        process, base_url = start_backend(provider_env, extra_env)
+
+    try:
+        rss_start = rss_mb(process.pid) if process else None
+        start = time.perf_counter()
+        recorder = asyncio.run(run_load(base_url, args.users, args.chat_turns, args.ramp_up,
+                                        args.seed, args.timeout))
+        elapsed = time.perf_counter() - start
+        rss_end = rss_mb(process.pid) if process else None
+    finally:
+        if process:
+            stop_backend(process)
+        if provider_server:
+            provider_server.should_exit = True
+
+    report = build_report(recorder, args, elapsed, rss_start, rss_end)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
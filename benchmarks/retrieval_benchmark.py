@@ -0,0 +1,131 @@
+"""
+Latency and quality comparison of the dense, hybrid and lexical retrieval modes.
+
+Two query sets are generated from the docstore itself:
+  * known-item: a random 6-10 word window of a chunk; relevant = any chunk
+    containing that window (hit@3 and MRR@3)
+  * clinical terms: exact terms such as "insomnia" and "panic attack";
+    precision@3 = share of returned chunks that contain the term
+
+Dense latency includes the query embedding call. With --fake-providers the
+docstore is re-embedded through the stand-in embedding endpoint so that
+queries and index share a vector space; otherwise the live HuggingFace
+endpoint and the prebuilt index are used.
+
+  python -m benchmarks.retrieval_benchmark --fake-providers --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import time
+from typing import Dict, List
+
+from benchmarks.common import latency_summary, start_fake_providers
+
+CLINICAL_TERMS = [
+    "insomnia", "panic attack", "depression", "anxiety", "suicide", "psychosis",
+    "hallucinations", "alcohol", "trauma", "grief", "self-harm", "mania",
+    "dementia", "epilepsy", "postpartum", "nightmares",
+]
+
+
+def known_item_queries(texts: List[str], count: int, rng: random.Random) -> List[Dict]:
+    queries = []
+    while len(queries) < count:
+        words = texts[rng.randrange(len(texts))].split()
+        if len(words) < 12:
+            continue
+        size = rng.randint(6, 10)
+        start = rng.randrange(len(words) - size)
+        window = " ".join(words[start:start + size])
+        relevant = {i for i, text in enumerate(texts) if window in " ".join(text.split())}
+        queries.append({"query": window, "relevant": relevant})
+    return queries
+
+
+def evaluate(retriever, mode: str, known_items: List[Dict], terms: List[str], k: int) -> Dict:
+    retriever.mode = mode
+    latencies = []
+    hits = 0
+    reciprocal_ranks = 0.0
+    for item in known_items:
+        start = time.perf_counter()
+        ranking = retriever.rank(item["query"], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        for rank, doc_index in enumerate(ranking):
+            if doc_index in item["relevant"]:
+                hits += 1
+                reciprocal_ranks += 1.0 / (rank + 1)
+                break
+
+    term_matches = 0
+    term_returned = 0
+    for term in terms:
+        start = time.perf_counter()
+        ranking = retriever.rank(term, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        term_returned += len(ranking)
+        term_matches += sum(1 for i in ranking if term in retriever.texts[i].lower())
+
+    summary = latency_summary(latencies)
+    return {
+        "mode": mode,
+        f"known_item_hit_at_{k}": round(hits / len(known_items), 4),
+        f"known_item_mrr_at_{k}": round(reciprocal_ranks / len(known_items), 4),
+        f"term_precision_at_{k}": round(term_matches / term_returned, 4) if term_returned else 0.0,
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dense, hybrid and lexical retrieval")
+    parser.add_argument("--db", default="mhguide_db")
+    parser.add_argument("--queries", type=int, default=200, help="Known-item queries to generate")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--fake-providers", action="store_true",
+                        help="Use the stand-in embedding endpoint and re-embed the docstore")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    if args.fake_providers:
+        server, env = start_fake_providers()
+        os.environ.update(env)
+
+    # Imported after the provider environment is in place
+    from langchain_community.vectorstores.faiss import FAISS
+    from hybrid_retrieval import HybridRetriever
+    from ingest import build_embeddings, embed_in_batches
+
+    embeddings = build_embeddings()
+    store = FAISS.load_local(args.db, embeddings, allow_dangerous_deserialization=True)
+    retriever = HybridRetriever(store)
+    if args.fake_providers:
+        vectors = embed_in_batches(embeddings, retriever.texts, batch_size=64, workers=4)
+        store = FAISS.from_embeddings(list(zip(retriever.texts, vectors)), embeddings)
+        retriever.vector_store = store
+
+    rng = random.Random(args.seed)
+    known_items = known_item_queries(retriever.texts, args.queries, rng)
+    results = [evaluate(retriever, mode, known_items, CLINICAL_TERMS, args.k)
+               for mode in ("dense", "hybrid", "lexical")]
+
+    k = args.k
+    print(f"\n{'mode':<10}{'hit@' + str(k):>10}{'mrr@' + str(k):>10}{'term_p@' + str(k):>11}{'p50_ms':>10}{'p95_ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r[f'known_item_hit_at_{k}']:>10.3f}{r[f'known_item_mrr_at_{k}']:>10.3f}"
+              f"{r[f'term_precision_at_{k}']:>11.3f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"k": k, "queries": args.queries, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    if server:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Write throughput and recovery time of the session event log.
+
+Drives N sessions through chat turns, an accepted assessment and answers,
+applying each mutation in memory and appending it to SessionEventLog as
+main.py does, then measures:
+  - append throughput and how many fsyncs the batching needed
+  - recovery by replaying the whole log
+  - snapshot time, and recovery from the snapshot plus a short log tail
+
+  python -m benchmarks.session_log_benchmark --sessions 100000 --turns 3 --answers 7
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import benchmarks.common  # noqa: F401  (puts the repo root on sys.path)
+from benchmarks.load_test import CHAT_MESSAGES
+from fake_providers import fake_completion_text
+from session_store import SessionEventLog, apply_event
+
+
+def directory_mb(path: str) -> float:
+    return round(sum(entry.stat().st_size for entry in os.scandir(path)) / 1024 / 1024, 1)
+
+
+def session_events(index: int, turns: int, answers: int, replies):
+    user_id = f"user-{index}"
+    for turn in range(turns):
+        yield ["count", user_id]
+        message = CHAT_MESSAGES[(index + turn) % len(CHAT_MESSAGES)]
+        yield ["exchange", user_id, f"{message} [{index}.{turn}]", replies[(index + turn) % len(replies)]]
+    yield ["offered", user_id]
+    yield ["answers_reset", user_id]
+    for question_id in range(answers):
+        yield ["answer", user_id, {"question_id": question_id, "question": f"Question {question_id + 1}",
+                                   "answer": f"Answer {question_id + 1} from {user_id}"}]
+
+
+def write_events(log: SessionEventLog, sessions, first: int, count: int, args, replies) -> int:
+    events = 0
+    for index in range(first, first + count):
+        for event in session_events(index, args.turns, args.answers, replies):
+            apply_event(sessions, event)
+            log.append(*event)
+            events += 1
+    return events
+
+
+def recover(directory: str):
+    sessions = {}
+    log = SessionEventLog(sessions, directory)
+    start = time.perf_counter()
+    log.recover()
+    elapsed = time.perf_counter() - start
+    log.close()
+    return sessions, elapsed, log.stats["replayed_events"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the session event log")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--answers", type=int, default=7)
+    parser.add_argument("--reply-words", type=int, default=60)
+    parser.add_argument("--fsync-ms", type=float, default=50.0)
+    parser.add_argument("--tail-sessions", type=int, default=1000, help="Sessions written after the snapshot")
+    parser.add_argument("--dir", help="Log directory (default: a temporary directory, removed afterwards)")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="session-log-")
+    replies = [fake_completion_text([{"content": m}], args.reply_words) for m in CHAT_MESSAGES]
+    results = {}
+    try:
+        sessions = {}
+        log = SessionEventLog(sessions, directory, fsync_ms=args.fsync_ms, snapshot_every=10 ** 12)
+        log.recover()
+        start = time.perf_counter()
+        events = write_events(log, sessions, 0, args.sessions, args, replies)
+        elapsed = time.perf_counter() - start
+        results["write"] = {
+            "events": events,
+            "elapsed_s": round(elapsed, 2),
+            "events_per_s": round(events / elapsed),
+            "fsyncs": log.stats["fsyncs"],
+            "log_mb": directory_mb(directory),
+        }
+
+        log.close()
+        recovered, recovery_s, replayed = recover(directory)
+        assert len(recovered) == args.sessions
+        results["recover_full_log"] = {"sessions": len(recovered), "events_replayed": replayed,
+                                       "recovery_s": round(recovery_s, 2)}
+        del recovered
+
+        log = SessionEventLog(sessions, directory, fsync_ms=args.fsync_ms, snapshot_every=10 ** 12)
+        sessions.clear()
+        log.recover()
+        start = time.perf_counter()
+        log.snapshot(wait=True)
+        results["snapshot"] = {"total_s": round(time.perf_counter() - start, 2),
+                               "dir_mb_after_compaction": directory_mb(directory)}
+
+        write_events(log, sessions, args.sessions, args.tail_sessions, args, replies)
+        log.close()
+        recovered, recovery_s, replayed = recover(directory)
+        assert len(recovered) == args.sessions + args.tail_sessions
+        results["recover_snapshot_plus_tail"] = {"sessions": len(recovered), "events_replayed": replayed,
+                                                 "recovery_s": round(recovery_s, 2)}
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Memory and prompt-rendering cost of the session representation.
+
+Builds N sessions of T chat turns each, once as the original dict of lists
+(one dict per exchange) and once as sessions.Session (one rendered string
+per exchange in a __slots__ record, plus a ring buffer of recent turns), and
+reports traced memory per session. On a sample of sessions it also times
+packing the chat history (last 3 turns) and the report history with
+PromptAssembler, where the Session records reuse their rendered text and
+cached token counts after the first pass.
+
+  python -m benchmarks.session_memory --sessions 10000 --turns 50
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmarks.load_test import CHAT_MESSAGES
+from fake_providers import fake_completion_text
+from prompt_budget import PromptAssembler
+from sessions import Session
+
+REPORT_TEMPLATE_STUB = "Complete Chat History:\n{full_chat_history}\n\nAssessment Responses:\n{assessment_responses}\n"
+
+
+class _Template:
+    """Minimal stand-in for PromptTemplate.format"""
+
+    def __init__(self, template: str):
+        self.template = template
+
+    def format(self, **kwargs) -> str:
+        return self.template.format(**kwargs)
+
+
+def make_turns(turns: int, reply_words: int):
+    replies = [fake_completion_text([{"content": message}], reply_words) for message in CHAT_MESSAGES]
+    return [(CHAT_MESSAGES[t % len(CHAT_MESSAGES)], replies[t % len(replies)]) for t in range(turns)]
+
+
+def build_dict_sessions(count: int, turns):
+    sessions = {}
+    for s in range(count):
+        session = {
+            "chat_history": [],
+            "chat_count": 0,
+            "assessment_responses": [],
+            "assessment_declined": False,
+            "assessment_suggestion_count": 0,
+            "assessment_offered": False,
+        }
+        for t, (user, assistant) in enumerate(turns):
+            # Fresh strings per turn, as real messages would be
+            session["chat_history"].append({"user": f"{user} [{s}.{t}]", "assistant": f"{assistant} [{s}.{t}]"})
+            session["chat_count"] += 1
+        sessions[f"user-{s}"] = session
+    return sessions
+
+
+def build_compact_sessions(count: int, turns):
+    sessions = {}
+    for s in range(count):
+        session = Session()
+        for t, (user, assistant) in enumerate(turns):
+            session.add_exchange(f"{user} [{s}.{t}]", f"{assistant} [{s}.{t}]")
+            session.chat_count += 1
+        sessions[f"user-{s}"] = session
+    return sessions
+
+
+def traced_build(builder, count: int, turns):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    sessions = builder(count, turns)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sessions, current, elapsed
+
+
+def time_rendering(sessions, recent, history, sample: int, passes: int = 2):
+    """ms per session for chat-history and report-history packing, per pass"""
+    assembler = PromptAssembler(verbose=False)
+    chat_template = _Template("{context}{chat_history}{user_message}{chat_count}{assessment_declined}")
+    report_template = _Template(REPORT_TEMPLATE_STUB)
+    keys = list(sessions)[:sample]
+    results = []
+    for _ in range(passes):
+        start = time.perf_counter()
+        for key in keys:
+            assembler.build_chat_prompt(chat_template, [], recent(sessions[key]), "How can I sleep better?", 1, False)
+        chat_ms = (time.perf_counter() - start) * 1000 / len(keys)
+        start = time.perf_counter()
+        for key in keys:
+            assembler.build_report_prompt(report_template, history(sessions[key]), [])
+        report_ms = (time.perf_counter() - start) * 1000 / len(keys)
+        results.append({"chat_history_ms": round(chat_ms, 3), "report_history_ms": round(report_ms, 3)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session memory and history rendering")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--reply-words", type=int, default=80)
+    parser.add_argument("--render-sample", type=int, default=200, help="Sessions used for rendering timings")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    turns = make_turns(args.turns, args.reply_words)
+    variants = (
+        ("dict of lists", build_dict_sessions,
+         lambda s: s["chat_history"][-3:], lambda s: s["chat_history"]),
+        ("compact Session", build_compact_sessions,
+         lambda s: s.recent, lambda s: s.history),
+    )
+
+    results = []
+    for name, builder, recent, history in variants:
+        sessions, traced_bytes, build_s = traced_build(builder, args.sessions, turns)
+        rendering = time_rendering(sessions, recent, history, min(args.render_sample, args.sessions))
+        results.append({
+            "representation": name,
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "memory_mb": round(traced_bytes / 1024 / 1024, 1),
+            "bytes_per_session": traced_bytes // args.sessions,
+            "build_s": round(build_s, 2),
+            "rendering_first_pass": rendering[0],
+            "rendering_warm": rendering[-1],
+        })
+        del sessions
+        gc.collect()
+
+    print(f"\n{'representation':<18}{'memory_mb':>11}{'B/session':>11}{'chat_ms':>9}{'report_ms':>11}"
+          f"{'chat_ms(warm)':>15}{'report_ms(warm)':>17}")
+    for r in results:
+        print(f"{r['representation']:<18}{r['memory_mb']:>11}{r['bytes_per_session']:>11}"
+              f"{r['rendering_first_pass']['chat_history_ms']:>9}{r['rendering_first_pass']['report_history_ms']:>11}"
+              f"{r['rendering_warm']['chat_history_ms']:>15}{r['rendering_warm']['report_history_ms']:>17}")
+    baseline, compact = results
+    print(f"memory saved: {(1 - compact['memory_mb'] / baseline['memory_mb']) * 100:.1f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
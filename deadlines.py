@@ -0,0 +1,51 @@
+"""
+Per-request deadline budgets and the context cache used when retrieval
+runs out of time.
+
+A /chat request gets CHAT_DEADLINE_S in total. Retrieval may use at most
+CHAT_RETRIEVAL_BUDGET_MS of it; if it is slower the turn continues with the
+context last retrieved for the same query, or lexical-only results, or no
+context, and generation gets whatever is left of the total.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+
+class DeadlineBudget:
+    def __init__(self, total_s: Optional[float] = None):
+        self.total_s = total_s if total_s is not None else float(os.getenv("CHAT_DEADLINE_S", "25"))
+        self.started = time.monotonic()
+
+    def remaining(self) -> float:
+        return max(0.0, self.total_s - (time.monotonic() - self.started))
+
+    def slice(self, cap_s: float) -> float:
+        """Time a stage may use: its own cap, but never past the overall deadline"""
+        return min(cap_s, self.remaining())
+
+
+class ContextCache:
+    """LRU of the last documents retrieved per query key"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv("CONTEXT_CACHE_SIZE", "512"))
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        docs = self._entries.get(key)
+        if docs is not None:
+            self._entries.move_to_end(key)
+        return docs
+
+    def put(self, key: str, docs: List[str]):
+        if not docs:
+            return
+        self._entries[key] = docs
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,124 @@
+"""
+Micro-batching of concurrent query embeddings.
+
+Queries that arrive within a short window (EMBED_BATCH_WINDOW_MS) are
+coalesced into a single embed_documents call of at most
+EMBED_BATCH_MAX_SIZE texts, and each caller gets its own vector back.
+Identical texts in the same batch are embedded once.
+
+Query vectors are also kept in a small LRU (QUERY_EMBED_CACHE_SIZE, keyed by
+the lower-cased, whitespace-normalized text), which the start-up warm-up
+fills with common queries through prime().
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+class EmbeddingMicroBatcher:
+    def __init__(self, embeddings, window_ms: Optional[float] = None, max_batch_size: Optional[int] = None):
+        self.embeddings = embeddings
+        self.window_s = (window_ms if window_ms is not None else float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))) / 1000.0
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+        self.enabled = os.getenv("EMBED_BATCHING", "true").lower() != "false"
+        self.cache_size = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "256"))
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks, so in-flight batches are held here
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self.stats = {"requests": 0, "batches": 0, "embedded_texts": 0, "max_batch_size_seen": 0, "cache_hits": 0}
+
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def _remember(self, text: str, vector: List[float]):
+        if self.cache_size <= 0:
+            return
+        key = self._cache_key(text)
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed one query, sharing the backend call with concurrent queries"""
+        self.stats["requests"] += 1
+        key = self._cache_key(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return cached
+        if not self.enabled:
+            self.stats["batches"] += 1
+            self.stats["embedded_texts"] += 1
+            vector = await self.embeddings.aembed_query(text)
+            self._remember(text, vector)
+            return vector
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_now()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_s, self._flush_now)
+        return await future
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "cached_queries": len(self._cache)}
+
+    async def prime(self, texts: Sequence[str]) -> int:
+        """Embed texts ahead of time, in batches of at most max_batch_size; returns how many were new"""
+        missing = list(dict.fromkeys(t for t in texts if self._cache_key(t) not in self._cache))
+        for start in range(0, len(missing), self.max_batch_size):
+            batch = missing[start:start + self.max_batch_size]
+            vectors = await self.embeddings.aembed_documents(batch)
+            self.stats["batches"] += 1
+            self.stats["embedded_texts"] += len(batch)
+            self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], len(batch))
+            for text, vector in zip(batch, vectors):
+                self._remember(text, vector)
+        return len(missing)
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        unique: Dict[str, int] = {}
+        for text, _ in batch:
+            unique.setdefault(text, len(unique))
+        texts = list(unique)
+        self.stats["batches"] += 1
+        self.stats["embedded_texts"] += len(texts)
+        self.stats["max_batch_size_seen"] = max(self.stats["max_batch_size_seen"], len(texts))
+        error: Optional[Exception] = None
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding endpoint returned {len(vectors)} vectors for {len(texts)} texts")
+            for text, index in unique.items():
+                self._remember(text, vectors[index])
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(vectors[unique[text]])
+        except Exception as e:
+            error = e
+        finally:
+            # No caller may be left waiting, whatever failed (cancellation cancels the callers)
+            for _, future in batch:
+                if not future.done():
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.cancel()
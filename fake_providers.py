@@ -0,0 +1,425 @@
+"""
+Deterministic stand-in for the Groq and HuggingFace APIs used by main.py.
+
+Implements the provider endpoints the backend talks to:
+  POST /openai/v1/chat/completions      (Groq chat, streaming and non-streaming)
+  POST /openai/v1/audio/transcriptions  (Groq Whisper)
+  GET  /openai/v1/models                (Groq model list, used to warm clients)
+  POST /hf/feature-extraction           (HuggingFace embeddings)
+
+Run it next to the backend and point main.py at it:
+  python fake_providers.py --port 8100
+  GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:8100 \
+  HUGGINGFACE_EMBEDDINGS_URL=http://127.0.0.1:8100/hf/feature-extraction \
+  uvicorn main:app --port 8000
+
+Latency, token rate and error injection are configured per endpoint with
+FAKE_* environment variables (or the matching CLI flags). Latency specs are
+"fixed:MS", "uniform:LOW,HIGH", "normal:MEAN,STD" or "lognormal:MEDIAN,SIGMA".
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIM = 768
+
+CANNED_TRANSCRIPTS = [
+    "Not at all, I have been feeling mostly fine.",
+    "Several days, maybe two or three times a week.",
+    "More than half the days, it has been pretty hard lately.",
+    "Nearly every day, I feel like this almost all the time.",
+    "I would rate it about a five out of ten, some days are better than others.",
+    "My sleep has been poor, I wake up a lot during the night and feel tired.",
+    "My appetite has gone down and I skip meals quite often.",
+    "Work has been very stressful since I changed teams and moved to a new city.",
+]
+
+CHAT_SENTENCES = [
+    "It sounds like you have been carrying a lot recently, and it makes sense that you feel this way.",
+    "Many people notice changes in sleep and energy when they are under ongoing stress.",
+    "Small routines, like a short walk or a regular bedtime, can make a real difference over time.",
+    "Talking to someone you trust about how you feel is often a helpful first step.",
+    "If these feelings persist, a mental health professional can help you explore them further.",
+    "Would you like to tell me a bit more about what has been on your mind?",
+]
+
+REPORT_SECTIONS = [
+    "Executive Summary",
+    "Chat Analysis",
+    "Assessment Results",
+    "Risk Assessment",
+    "Key Findings",
+    "Recommendations",
+    "Professional Resources",
+    "Self-Care Strategies",
+]
+
+
+@dataclass
+class LatencyDistribution:
+    kind: str = "fixed"
+    params: List[float] = field(default_factory=lambda: [0.0])
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, raw = spec.partition(":")
+        params = [float(p) for p in raw.split(",") if p.strip()] or [0.0]
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        return cls(kind=kind, params=params)
+
+    def sample_ms(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1] if len(p) > 1 else p[0])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1] if len(p) > 1 else 0.0))
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(max(p[0], 1e-3)), p[1] if len(p) > 1 else 0.0)
+        return p[0]
+
+
+@dataclass
+class EndpointProfile:
+    latency: LatencyDistribution
+    error_rate: float = 0.0
+    error_status: int = 503
+    # Requests served at once, like a vendor-side concurrency limit (0 = unlimited)
+    concurrency: int = 0
+
+
+@dataclass
+class FakeProviderConfig:
+    seed: int = 0
+    chat: EndpointProfile = field(default_factory=lambda: EndpointProfile(LatencyDistribution("lognormal", [300, 0.4])))
+    transcription: EndpointProfile = field(default_factory=lambda: EndpointProfile(LatencyDistribution("lognormal", [500, 0.3])))
+    embeddings: EndpointProfile = field(default_factory=lambda: EndpointProfile(LatencyDistribution("fixed", [40])))
+    # Output tokens per second once the first token has been produced
+    token_rate: float = 250.0
+    chat_tokens: int = 120
+    report_tokens: int = 900
+    # Extra embedding cost per input text, so batched calls are cheaper per item
+    embed_per_item_ms: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> "FakeProviderConfig":
+        def profile(prefix: str, default: EndpointProfile) -> EndpointProfile:
+            latency = os.getenv(f"FAKE_{prefix}_LATENCY")
+            return EndpointProfile(
+                latency=LatencyDistribution.parse(latency) if latency else default.latency,
+                error_rate=float(os.getenv(f"FAKE_{prefix}_ERROR_RATE", default.error_rate)),
+                error_status=int(os.getenv(f"FAKE_{prefix}_ERROR_STATUS", default.error_status)),
+                concurrency=int(os.getenv(f"FAKE_{prefix}_CONCURRENCY", default.concurrency)),
+            )
+
+        base = cls()
+        return cls(
+            seed=int(os.getenv("FAKE_SEED", base.seed)),
+            chat=profile("CHAT", base.chat),
+            transcription=profile("TRANSCRIPTION", base.transcription),
+            embeddings=profile("EMBEDDINGS", base.embeddings),
+            token_rate=float(os.getenv("FAKE_TOKEN_RATE", base.token_rate)),
+            chat_tokens=int(os.getenv("FAKE_CHAT_TOKENS", base.chat_tokens)),
+            report_tokens=int(os.getenv("FAKE_REPORT_TOKENS", base.report_tokens)),
+            embed_per_item_ms=float(os.getenv("FAKE_EMBED_PER_ITEM_MS", base.embed_per_item_ms)),
+        )
+
+
+class FakeProviderState:
+    """Seeded randomness and call counters shared by all fake endpoints"""
+
+    def __init__(self, config: FakeProviderConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.slots: Dict[int, asyncio.Semaphore] = {}
+        self.stats: Dict[str, int] = {
+            "chat_calls": 0,
+            "chat_stream_calls": 0,
+            "transcription_calls": 0,
+            "embedding_calls": 0,
+            "embedded_texts": 0,
+            "injected_errors": 0,
+        }
+
+    def count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def sample_latency_s(self, profile: EndpointProfile) -> float:
+        with self.lock:
+            return profile.latency.sample_ms(self.rng) / 1000.0
+
+    def slot(self, profile: EndpointProfile):
+        """Semaphore enforcing the endpoint's concurrency limit (a no-op context when unlimited)"""
+        if profile.concurrency <= 0:
+            return contextlib.nullcontext()
+        key = id(profile)
+        if key not in self.slots:
+            self.slots[key] = asyncio.Semaphore(profile.concurrency)
+        return self.slots[key]
+
+    def should_fail(self, profile: EndpointProfile) -> bool:
+        if profile.error_rate <= 0:
+            return False
+        with self.lock:
+            failed = self.rng.random() < profile.error_rate
+            if failed:
+                self.stats["injected_errors"] += 1
+        return failed
+
+
+def _digest(data: bytes) -> int:
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+
+
+def _error_response(profile: EndpointProfile) -> JSONResponse:
+    headers = {"Retry-After": "1"} if profile.error_status == 429 else None
+    return JSONResponse(
+        status_code=profile.error_status,
+        content={"error": {"message": "Injected failure from fake provider", "type": "fake_provider_error"}},
+        headers=headers,
+    )
+
+
+def _tokenize_words(text: str) -> List[str]:
+    return [w for w in "".join(c.lower() if c.isalnum() else " " for c in text).split() if w]
+
+
+def _word_vector(word: str) -> np.ndarray:
+    return np.random.default_rng(zlib.crc32(word.encode("utf-8"))).standard_normal(EMBEDDING_DIM)
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Bag-of-words hash embedding, so texts sharing words land close together"""
+    words = _tokenize_words(text) or ["<empty>"]
+    vector = np.zeros(EMBEDDING_DIM)
+    for word in words:
+        vector += _word_vector(word)
+    vector /= np.linalg.norm(vector) or 1.0
+    return vector.astype("float32").tolist()
+
+
+def fake_completion_text(messages: List[Dict], max_words: int, json_mode: bool = False) -> str:
+    """Deterministic reply derived from the prompt text; reports come back as
+    one JSON field per section when the request asked for JSON mode"""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    seed = _digest(prompt.encode("utf-8"))
+    if "Mental Health Assessment Report" in prompt:
+        per_section = max(1, max_words // len(REPORT_SECTIONS))
+        sections = {}
+        for i, section in enumerate(REPORT_SECTIONS):
+            sentences = []
+            while sum(len(s.split()) for s in sentences) < per_section:
+                sentences.append(CHAT_SENTENCES[(seed + i + len(sentences)) % len(CHAT_SENTENCES)])
+            sections[section] = " ".join(sentences)
+        if json_mode:
+            report = {section.lower().replace("-", "_").replace(" ", "_"): text for section, text in sections.items()}
+            report["risk_level"] = ("Low", "Medium", "High")[seed % 3]
+            return json.dumps(report)
+        parts = ["# Mental Health Assessment Report"]
+        parts.extend(f"## {section}\n{text}" for section, text in sections.items())
+        return "\n\n".join(parts)
+    words: List[str] = []
+    i = 0
+    while len(words) < max_words:
+        words.extend(CHAT_SENTENCES[(seed + i) % len(CHAT_SENTENCES)].split())
+        i += 1
+    return " ".join(words[:max_words])
+
+
+def create_app(config: Optional[FakeProviderConfig] = None) -> FastAPI:
+    state = FakeProviderState(config or FakeProviderConfig.from_env())
+    fake_app = FastAPI(title="Fake Groq/HuggingFace providers")
+    fake_app.state.provider_state = state
+
+    def completion_chunk(completion_id: str, model: str, delta: Dict, finish_reason=None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    @fake_app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        cfg = state.config
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        messages = body.get("messages", [])
+        prompt_text = "\n".join(str(m.get("content", "")) for m in messages)
+        is_report = "Mental Health Assessment Report" in prompt_text
+        max_words = cfg.report_tokens if is_report else cfg.chat_tokens
+        if body.get("max_tokens"):
+            max_words = min(max_words, int(body["max_tokens"]))
+
+        if state.should_fail(cfg.chat):
+            return _error_response(cfg.chat)
+
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        content = fake_completion_text(messages, max_words, json_mode=json_mode)
+        tokens = content.split(" ")
+        first_token_delay = state.sample_latency_s(cfg.chat)
+        per_token_delay = 1.0 / cfg.token_rate if cfg.token_rate > 0 else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {
+            "prompt_tokens": len(prompt_text.split()),
+            "completion_tokens": len(tokens),
+            "total_tokens": len(prompt_text.split()) + len(tokens),
+        }
+
+        if body.get("stream"):
+            state.count("chat_stream_calls")
+
+            async def event_stream():
+                await asyncio.sleep(first_token_delay)
+                yield completion_chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for i, token in enumerate(tokens):
+                    piece = token if i == 0 else " " + token
+                    yield completion_chunk(completion_id, model, {"content": piece})
+                    await asyncio.sleep(per_token_delay)
+                yield completion_chunk(completion_id, model, {}, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        state.count("chat_calls")
+        async with state.slot(cfg.chat):
+            await asyncio.sleep(first_token_delay + per_token_delay * len(tokens))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    @fake_app.post("/openai/v1/audio/transcriptions")
+    async def audio_transcriptions(file: UploadFile = File(...), model: str = Form("whisper-large-v3")):
+        cfg = state.config
+        audio_bytes = await file.read()
+        state.count("transcription_calls")
+        if state.should_fail(cfg.transcription):
+            return _error_response(cfg.transcription)
+        async with state.slot(cfg.transcription):
+            await asyncio.sleep(state.sample_latency_s(cfg.transcription))
+        if not audio_bytes:
+            return {"text": ""}
+        return {"text": CANNED_TRANSCRIPTS[_digest(audio_bytes) % len(CANNED_TRANSCRIPTS)]}
+
+    @fake_app.get("/openai/v1/models")
+    async def list_models():
+        return {
+            "object": "list",
+            "data": [{"id": name, "object": "model", "owned_by": "fake"}
+                     for name in ("llama-3.3-70b-versatile", "llama-3.1-8b-instant", "whisper-large-v3")],
+        }
+
+    @fake_app.post("/hf/feature-extraction")
+    async def feature_extraction(request: Request):
+        cfg = state.config
+        body = await request.json()
+        inputs = body.get("inputs", "")
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        state.count("embedding_calls")
+        state.count("embedded_texts", len(texts))
+        if state.should_fail(cfg.embeddings):
+            return _error_response(cfg.embeddings)
+        async with state.slot(cfg.embeddings):
+            await asyncio.sleep(state.sample_latency_s(cfg.embeddings) + cfg.embed_per_item_ms * len(texts) / 1000.0)
+        return [fake_embedding(text) for text in texts]
+
+    @fake_app.get("/_stats")
+    async def provider_stats():
+        with state.lock:
+            return dict(state.stats)
+
+    @fake_app.post("/_reset")
+    async def reset_stats():
+        with state.lock:
+            state.rng = random.Random(state.config.seed)
+            for key in state.stats:
+                state.stats[key] = 0
+        return {"status": "reset"}
+
+    return fake_app
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 8100,
+                    config: Optional[FakeProviderConfig] = None) -> uvicorn.Server:
+    """Run the fake providers in a background thread (used by the benchmarks)"""
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Fake provider server did not start")
+        time.sleep(0.02)
+    return server
+
+
+def provider_env(host: str = "127.0.0.1", port: int = 8100) -> Dict[str, str]:
+    """Environment variables that point main.py at a running fake provider server"""
+    base_url = f"http://{host}:{port}"
+    return {
+        "GROQ_API_KEY": os.getenv("GROQ_API_KEY") or "fake-groq-key",
+        "HUGGINGFACE_API_KEY": os.getenv("HUGGINGFACE_API_KEY") or "fake-hf-key",
+        "GROQ_BASE_URL": base_url,
+        "HUGGINGFACE_EMBEDDINGS_URL": f"{base_url}/hf/feature-extraction",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fake Groq/HuggingFace provider endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--chat-latency", help="e.g. lognormal:300,0.4")
+    parser.add_argument("--transcription-latency", help="e.g. lognormal:500,0.3")
+    parser.add_argument("--embeddings-latency", help="e.g. fixed:40")
+    parser.add_argument("--token-rate", type=float, help="Output tokens per second")
+    parser.add_argument("--error-rate", type=float, help="Error rate applied to every endpoint")
+    parser.add_argument("--error-status", type=int, help="HTTP status used for injected errors")
+    args = parser.parse_args()
+
+    provider_config = FakeProviderConfig.from_env()
+    if args.seed is not None:
+        provider_config.seed = args.seed
+    if args.token_rate is not None:
+        provider_config.token_rate = args.token_rate
+    for name, spec in (("chat", args.chat_latency),
+                       ("transcription", args.transcription_latency),
+                       ("embeddings", args.embeddings_latency)):
+        if spec:
+            getattr(provider_config, name).latency = LatencyDistribution.parse(spec)
+    for name in ("chat", "transcription", "embeddings"):
+        if args.error_rate is not None:
+            getattr(provider_config, name).error_rate = args.error_rate
+        if args.error_status is not None:
+            getattr(provider_config, name).error_status = args.error_status
+
+    uvicorn.run(create_app(provider_config), host=args.host, port=args.port)
@@ -2,12 +2,20 @@ import streamlit as st
 import requests
 import json
 import io
+import os
 import time
 from audio_recorder_streamlit import audio_recorder
 import uuid
+from collections import deque
 
 # Configuration
-API_BASE_URL = "https://mental-health-backend-08bz.onrender.com"  # Change this to your Docker container URL if needed
+API_BASE_URL = os.getenv("API_BASE_URL", "https://mental-health-backend-08bz.onrender.com")  # e.g. http://localhost:8000
+# Exchanges rendered before "Load earlier messages" (0 = whole conversation)
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+# Backend calls kept for the sidebar "API Timings" panel
+API_CALL_BUFFER = int(os.getenv("API_CALL_BUFFER", "200"))
+# Default of the "Answer all, then submit" toggle on the assessment page
+ASSESSMENT_BATCH_SUBMIT = os.getenv("ASSESSMENT_BATCH_SUBMIT", "false").lower() == "true"
 HEADERS = {"Content-Type": "application/json"}
 
 # Initialize session state
@@ -15,14 +23,14 @@ if 'user_id' not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
-if 'assessment_mode' not in st.session_state:
-    st.session_state.assessment_mode = False
+if 'stage' not in st.session_state:
+    st.session_state.stage = "chat"
 if 'current_question' not in st.session_state:
     st.session_state.current_question = 0
 if 'questions' not in st.session_state:
     st.session_state.questions = []
-if 'assessment_complete' not in st.session_state:
-    st.session_state.assessment_complete = False
+if 'prefetched_questions' not in st.session_state:
+    st.session_state.prefetched_questions = []
 if 'show_assessment_prompt' not in st.session_state:
     st.session_state.show_assessment_prompt = False
 if 'assessment_declined' not in st.session_state:
@@ -35,8 +43,14 @@ if 'streaming_new_message' not in st.session_state:
     st.session_state.streaming_new_message = False
 if 'generated_report' not in st.session_state:
     st.session_state.generated_report = None
-if 'report_generation_in_progress' not in st.session_state:
-    st.session_state.report_generation_in_progress = False
+if 'pending_toasts' not in st.session_state:
+    st.session_state.pending_toasts = []
+if 'api_calls' not in st.session_state:
+    st.session_state.api_calls = deque(maxlen=API_CALL_BUFFER)
+if 'history_window' not in st.session_state:
+    st.session_state.history_window = CHAT_HISTORY_WINDOW
+if 'rerun_timings' not in st.session_state:
+    st.session_state.rerun_timings = []
 
 # Page configuration
 st.set_page_config(
@@ -169,24 +183,202 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Page flow: (stage, event) -> next stage. Transitions only change state;
+# buttons apply them in on_click callbacks, which run before the next script
+# run, so no st.rerun() or sleep is needed to show the new stage
+STAGE_TRANSITIONS = {
+    ("chat", "accept_assessment"): "assessment",
+    ("assessment", "finish_assessment"): "report",
+    ("assessment", "back_to_chat"): "chat",
+    ("report", "back_to_assessment"): "assessment",
+    ("report", "back_to_chat"): "chat",
+}
+
+def transition(event):
+    next_stage = STAGE_TRANSITIONS.get((st.session_state.stage, event))
+    if next_stage is None:
+        return False
+    st.session_state.stage = next_stage
+    return True
+
+def notify(message, icon=None):
+    """Queue a toast for the next script run, so it survives st.rerun()"""
+    st.session_state.setdefault("pending_toasts", []).append((message, icon))
+
+def show_pending_toasts():
+    for message, icon in st.session_state.pending_toasts:
+        st.toast(message, icon=icon)
+    st.session_state.pending_toasts = []
+
+def previous_question():
+    st.session_state.current_question -= 1
+    st.session_state.current_answer_submitted = False
+    st.session_state.last_transcription = ""
+
+def next_question():
+    st.session_state.current_question += 1
+    st.session_state.current_answer_submitted = False
+    st.session_state.last_transcription = ""
+
+def reopen_last_question():
+    st.session_state.current_question = max(0, len(st.session_state.questions) - 1)
+
+def discard_report():
+    st.session_state.generated_report = None
+    notify("Report cleared. You can now generate a new one.")
+
+# Upper bound on the typing effect, however long the reply
+STREAM_EFFECT_MAX_S = 1.5
+
 def stream_response(text):
-    """Display text with typing effect"""
+    """Display text with a short typing effect, word by word"""
     placeholder = st.empty()
-    displayed_text = ""
+    words = text.split(" ")
+    delay = min(0.02, STREAM_EFFECT_MAX_S / max(1, len(words)))
     
-    for char in text:
-        displayed_text += char
-        placeholder.markdown(f'<div class="chat-message assistant-message"><strong>Assistant:</strong> {displayed_text}</div>', 
+    for i in range(1, len(words) + 1):
+        placeholder.markdown(f'<div class="chat-message assistant-message"><strong>Assistant:</strong> {" ".join(words[:i])}</div>', 
                            unsafe_allow_html=True)
-        time.sleep(0.02)  # Adjust speed as needed
+        time.sleep(delay)
     
-    return displayed_text
+    return text
+
+def exchange_html(user, assistant):
+    """HTML of one exchange; built once when the exchange is added and cached on it"""
+    return (f'<div class="chat-message user-message"><strong>You:</strong> {user}</div>'
+            f'<div class="chat-message assistant-message"><strong>Assistant:</strong> {assistant}</div>')
+
+def add_chat_exchange(user, assistant):
+    st.session_state.chat_history.append({
+        "user": user,
+        "assistant": assistant,
+        "html": exchange_html(user, assistant)
+    })
+
+def load_earlier_messages():
+    st.session_state.history_window += CHAT_HISTORY_WINDOW
+
+def render_earlier_history():
+    """Window of exchanges before the latest one, as a single markdown element"""
+    earlier = st.session_state.chat_history[:-1]
+    if CHAT_HISTORY_WINDOW > 0 and len(earlier) > st.session_state.history_window:
+        hidden = len(earlier) - st.session_state.history_window
+        earlier = earlier[hidden:]
+        st.button(f"Load earlier messages ({hidden} hidden)", key="load_earlier_messages",
+                  on_click=load_earlier_messages)
+    if earlier:
+        st.markdown("".join(m.get("html") or exchange_html(m["user"], m["assistant"]) for m in earlier),
+                    unsafe_allow_html=True)
+
+def record_rerun_time(started, render_ms):
+    """Keep the last 50 script run times, with the conversation length at the time"""
+    # The session state may have just been cleared
+    timings = st.session_state.setdefault("rerun_timings", [])
+    timings.append({
+        "exchanges": len(st.session_state.get("chat_history", [])),
+        "history_render_ms": round(render_ms, 2),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1)
+    })
+    del timings[:-50]
 
 # API Helper Functions
+def api_request(method, path, **kwargs):
+    """requests.request against the backend, recording latency, sizes and status.
+    Exceptions are recorded and re-raised for the caller to handle as before"""
+    record = {
+        "endpoint": f"{method} /{path.lstrip('/').split('/')[0]}",
+        "started_at": round(time.time(), 3),
+        "status": None,
+        "ms": None,
+        "request_bytes": 0,
+        "response_bytes": 0,
+        "wire_bytes": 0,
+        "error": None
+    }
+    start = time.perf_counter()
+    try:
+        response = requests.request(method, f"{API_BASE_URL}{path}", **kwargs)
+    except requests.exceptions.RequestException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        st.session_state.setdefault("api_calls", deque(maxlen=API_CALL_BUFFER)).append(record)
+    body = response.request.body
+    record["status"] = response.status_code
+    record["request_bytes"] = len(body) if body else 0
+    if response.status_code >= 400:
+        record["error"] = response.text[:200]
+    if kwargs.get("stream") and response.status_code < 400:
+        # Latency and sizes are completed by iter_ndjson() once the body is read
+        response.api_record, response.api_started = record, start
+        return response
+    record["response_bytes"] = len(response.content)
+    # Content-Length is the compressed size when the backend compressed the body
+    record["wire_bytes"] = int(response.headers.get("content-length", record["response_bytes"]))
+    return response
+
+def iter_ndjson(response):
+    """Objects of a streamed (stream=True) NDJSON api_request response as they arrive"""
+    record = response.api_record
+    received = 0
+    try:
+        for line in response.iter_lines():
+            received += len(line) + 1
+            if line:
+                yield json.loads(line)
+    finally:
+        record["ms"] = round((time.perf_counter() - response.api_started) * 1000, 1)
+        record["response_bytes"] = received
+        # Bytes read off the socket, i.e. before decompression
+        record["wire_bytes"] = response.raw.tell()
+        response.close()
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(1, -(-len(ordered) * pct // 100)) - 1]
+
+def api_call_summary(calls):
+    """Per-endpoint call count, latency percentiles, errors and average response size"""
+    by_endpoint = {}
+    for call in calls:
+        by_endpoint.setdefault(call["endpoint"], []).append(call)
+    rows = []
+    for endpoint, endpoint_calls in sorted(by_endpoint.items()):
+        latencies = [c["ms"] for c in endpoint_calls]
+        rows.append({
+            "endpoint": endpoint,
+            "calls": len(endpoint_calls),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "max_ms": max(latencies),
+            "errors": sum(1 for c in endpoint_calls if c["error"]),
+            "avg_kb": round(sum(c["wire_bytes"] for c in endpoint_calls) / len(endpoint_calls) / 1024, 1)
+        })
+    return rows
+
+def render_api_timings_panel():
+    calls = list(st.session_state.api_calls)
+    if not calls:
+        st.caption("No backend calls recorded yet.")
+        return
+    st.caption(f"Last {len(calls)} backend calls")
+    st.dataframe(api_call_summary(calls), hide_index=True)
+    with st.expander("Recent calls"):
+        st.dataframe(calls[-20:][::-1], hide_index=True)
+    st.download_button(
+        label="Export JSON",
+        data=json.dumps({"user_id": st.session_state.user_id, "api_calls": calls,
+                         "rerun_timings": st.session_state.rerun_timings}, indent=2),
+        file_name=f"api_timings_{st.session_state.user_id[:8]}.json",
+        mime="application/json",
+        key="export_api_timings"
+    )
+
 def test_api_connection():
     """Test API connection"""
     try:
-        response = requests.get(f"{API_BASE_URL}/session_status/{st.session_state.user_id}", timeout=5)
+        response = api_request("GET", f"/session_status/{st.session_state.user_id}", timeout=5)
         return response.status_code == 200
     except:
         return False
@@ -194,7 +386,7 @@ def test_api_connection():
 def get_session_status():
     """Get current session status"""
     try:
-        response = requests.get(f"{API_BASE_URL}/session_status/{st.session_state.user_id}")
+        response = api_request("GET", f"/session_status/{st.session_state.user_id}")
         if response.status_code == 200:
             return response.json()
         return {"exists": False}
@@ -205,7 +397,7 @@ def get_session_status():
 def debug_session():
     """Debug session data"""
     try:
-        response = requests.get(f"{API_BASE_URL}/debug_session/{st.session_state.user_id}")
+        response = api_request("GET", f"/debug_session/{st.session_state.user_id}")
         if response.status_code == 200:
             return response.json()
         return {"error": f"Debug failed: {response.status_code}", "response_text": response.text}
@@ -219,7 +411,7 @@ def send_chat_message(message):
             "user_id": st.session_state.user_id,
             "message": message
         }
-        response = requests.post(f"{API_BASE_URL}/chat", json=payload, headers=HEADERS, timeout=30)
+        response = api_request("POST", "/chat", json=payload, headers=HEADERS, timeout=30)
         if response.status_code == 200:
             return response.json()
         else:
@@ -236,7 +428,7 @@ def send_assessment_response(accept_assessment):
             "user_id": st.session_state.user_id,
             "accept_assessment": accept_assessment
         }
-        response = requests.post(f"{API_BASE_URL}/assessment_response", json=payload, headers=HEADERS)
+        response = api_request("POST", "/assessment_response", json=payload, headers=HEADERS)
         if response.status_code == 200:
             return response.json()
         else:
@@ -249,7 +441,7 @@ def send_assessment_response(accept_assessment):
 def get_assessment_questions():
     """Get assessment questions from API"""
     try:
-        response = requests.get(f"{API_BASE_URL}/get_questions/{st.session_state.user_id}")
+        response = api_request("GET", f"/get_questions/{st.session_state.user_id}")
         if response.status_code == 200:
             return response.json()["questions"]
         return []
@@ -263,10 +455,6 @@ def submit_audio_answer(question_id, audio_bytes):
         if not audio_bytes:
             st.error("No audio data received")
             return None
-            
-        # Debug logging
-        st.write(f"DEBUG: Submitting audio for question {question_id}")
-        st.write(f"DEBUG: Audio bytes length: {len(audio_bytes) if audio_bytes else 0}")
         
         files = {
             "audio_file": ("audio.wav", io.BytesIO(audio_bytes), "audio/wav")
@@ -276,59 +464,109 @@ def submit_audio_answer(question_id, audio_bytes):
             "question_id": question_id
         }
         
-        st.write(f"DEBUG: Making request to {API_BASE_URL}/submit_answer")
-        
-        response = requests.post(
-            f"{API_BASE_URL}/submit_answer", 
-            files=files, 
-            data=data, 
-            timeout=30
-        )
-        
-        st.write(f"DEBUG: Response status: {response.status_code}")
+        # Status, latency and error text are recorded in the API Timings panel
+        response = api_request("POST", "/submit_answer", files=files, data=data, timeout=30)
         
         if response.status_code == 200:
-            result = response.json()
-            st.write(f"DEBUG: Response data: {result}")
-            return result
+            return response.json()
         else:
-            error_text = response.text
             st.error(f"Error submitting answer: {response.status_code}")
-            st.write(f"DEBUG: Error response: {error_text}")
-            try:
-                error_json = response.json()
-                st.write(f"DEBUG: Error details: {error_json}")
-            except:
-                pass
             return None
             
-    except requests.exceptions.ConnectionError as e:
+    except requests.exceptions.ConnectionError:
         st.error("Cannot connect to the backend API. Please ensure the server is running.")
-        st.write(f"DEBUG: Connection error: {str(e)}")
         return None
-    except requests.exceptions.Timeout as e:
+    except requests.exceptions.Timeout:
         st.error("Request timed out. Please try again.")
-        st.write(f"DEBUG: Timeout error: {str(e)}")
         return None
     except requests.exceptions.RequestException as e:
         st.error(f"Network error: {str(e)}")
-        st.write(f"DEBUG: Request exception: {str(e)}")
         return None
     except Exception as e:
         st.error(f"Unexpected error: {str(e)}")
-        st.write(f"DEBUG: Unexpected error: {str(e)}")
-        import traceback
-        st.write("DEBUG: Full traceback:")
-        st.code(traceback.format_exc())
         return None
 
+def recorded_answers():
+    """Recordings not transcribed yet, by question index"""
+    return {int(key.rsplit("_", 1)[1]): st.session_state[key]
+            for key in st.session_state if key.startswith("temp_audio_")}
+
+def submit_audio_answers(recordings):
+    """Submit several recorded answers in one request, showing each result as it is transcribed.
+    Transcribed recordings are removed from the session; returns the number that failed, or None"""
+    question_ids = sorted(recordings)
+    files = [("audio_files", (f"answer_{q}.wav", io.BytesIO(recordings[q]), "audio/wav")) for q in question_ids]
+    data = {"user_id": st.session_state.user_id, "question_ids": question_ids}
+    progress = st.progress(0.0, text=f"Transcribing {len(question_ids)} answers...")
+    try:
+        response = api_request("POST", "/submit_answers", files=files, data=data, timeout=60, stream=True)
+        if response.status_code != 200:
+            st.error(f"Error submitting answers: {response.status_code}")
+            return None
+        
+        done = 0
+        failed = len(question_ids)
+        for result in iter_ndjson(response):
+            if result["status"] == "complete":
+                failed = result["failed"]
+                continue
+            done += 1
+            question_number = result["question_id"] + 1
+            if result["status"] == "success":
+                del st.session_state[f"temp_audio_{result['question_id']}"]
+                st.markdown(f'<div class="success-message"><strong>Question {question_number}:</strong> '
+                            f'{result["transcribed_text"]}</div>', unsafe_allow_html=True)
+            else:
+                st.error(f"Question {question_number}: {result.get('detail', 'Failed to process audio')}")
+            progress.progress(done / len(question_ids), text=f"{done} of {len(question_ids)} answers transcribed")
+        return failed
+    
+    except requests.exceptions.ConnectionError:
+        st.error("Cannot connect to the backend API. Please ensure the server is running.")
+        return None
+    except requests.exceptions.Timeout:
+        st.error("Request timed out. Please try again.")
+        return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Network error: {str(e)}")
+        return None
+
+def report_as_markdown(report_data):
+    """Markdown text of a report, whether it came back as sections or as one document"""
+    sections = report_data.get("sections")
+    if not sections:
+        return report_data.get("report") or ""
+    parts = ["# Mental Health Assessment Report"]
+    for section in sections:
+        content = section["content"]
+        if section["key"] == "risk_assessment" and report_data.get("risk_level"):
+            content = f"**Risk level: {report_data['risk_level']}**\n\n{content}"
+        parts.append(f"## {section['title']}\n{content}")
+    return "\n\n".join(parts)
+
+def render_scores(scores):
+    """Category subtotals scored locally by the backend, one metric per category"""
+    categories = (scores or {}).get("categories") or {}
+    if not categories:
+        return
+    st.markdown("#### Questionnaire Scores")
+    columns = st.columns(len(categories) + 1)
+    for column, (name, category) in zip(columns, categories.items()):
+        column.metric(name.replace("_", " ").title(), f"{category['score']}/{category['max']}", category["band"],
+                      delta_color="off")
+    columns[-1].metric("Total", f"{scores['total']}/{scores['max_total']}", scores["band"], delta_color="off")
+    st.caption("Scored from your frequency and rating answers (0-3 each, higher is more severe). "
+               "An indication only, not a diagnosis.")
+
 def generate_report():
     """Generate comprehensive report"""
     try:
-        payload = {"user_id": st.session_state.user_id}
+        # Sections are validated against the report schema by the backend
+        payload = {"user_id": st.session_state.user_id, "format": "structured"}
         
-        response = requests.post(
-            f"{API_BASE_URL}/generate_report", 
+        response = api_request(
+            "POST",
+            "/generate_report", 
             json=payload, 
             headers=HEADERS, 
             timeout=120  # Increased timeout for report generation
@@ -337,16 +575,10 @@ def generate_report():
         if response.status_code == 200:
             report_data = response.json()
             
-            # Validate report data
-            if "report" in report_data and report_data["report"]:
-                if len(str(report_data["report"]).strip()) > 50:
-                    return report_data
-                else:
-                    st.error("Generated report is too short or empty")
-                    return None
-            else:
-                st.error("Report data missing 'report' field")
-                return None
+            if report_data.get("sections") or report_data.get("report"):
+                return report_data
+            st.error("Report data missing 'sections' and 'report' fields")
+            return None
         else:
             error_msg = f"Error generating report: HTTP {response.status_code}"
             try:
@@ -398,7 +630,7 @@ def validate_report_data():
 def clear_session():
     """Clear user session"""
     try:
-        response = requests.delete(f"{API_BASE_URL}/clear_session/{st.session_state.user_id}")
+        response = api_request("DELETE", f"/clear_session/{st.session_state.user_id}")
         return response.status_code == 200
     except requests.exceptions.RequestException:
         return False
@@ -417,6 +649,7 @@ def is_assessment_complete():
 # Main App
 def main():
     st.markdown('<h1 class="main-header">Mental Health Assessment Platform</h1>', unsafe_allow_html=True)
+    show_pending_toasts()
     
     # API Connection Check
     if not test_api_connection():
@@ -454,18 +687,29 @@ def main():
             with col2:
                 if st.button("API Status", key="api_status_btn"):
                     try:
-                        response = requests.get(f"{API_BASE_URL}/")
+                        response = api_request("GET", "/")
                         st.success(f"API Online: {response.status_code}")
                     except:
                         st.error("API Offline")
             
             st.write("**Session State:**")
             st.write(f"User ID: {st.session_state.user_id[:8]}...")
-            st.write(f"Assessment Mode: {st.session_state.assessment_mode}")
-            st.write(f"Assessment Complete: {st.session_state.assessment_complete}")
+            st.write(f"Stage: {st.session_state.stage}")
             st.write(f"Current Question: {st.session_state.current_question}")
             st.write(f"Questions Loaded: {len(st.session_state.questions)}")
             st.write(f"Report Generated: {st.session_state.generated_report is not None}")
+            
+            if st.session_state.rerun_timings:
+                last = st.session_state.rerun_timings[-1]
+                st.write("**Last Rerun:**")
+                st.write(f"{last['total_ms']} ms total, history {last['history_render_ms']} ms "
+                         f"({last['exchanges']} exchanges)")
+        
+        # Filled at the end of the run, so it includes this run's backend calls
+        timings_panel = None
+        if st.toggle("Show API Timings", key="show_api_timings",
+                     value=os.getenv("SHOW_API_TIMINGS", "false").lower() == "true"):
+            timings_panel = st.container()
         
         st.divider()
         
@@ -473,8 +717,7 @@ def main():
             with st.spinner("Clearing session..."):
                 if clear_session():
                     st.session_state.clear()
-                    st.success("Session cleared!")
-                    time.sleep(1)
+                    notify("Session cleared!")
                     st.rerun()
                 else:
                     st.error("Failed to clear session")
@@ -490,17 +733,14 @@ def main():
         """)
 
     # Main Content Area
-    if not st.session_state.assessment_mode and not st.session_state.assessment_complete:
+    if st.session_state.stage == "chat":
         # Chat Mode
         st.header("AI Assistant Chat")
         
-        # Display chat history
-        for message in st.session_state.chat_history[:-1]:  # All messages except the last one
-            with st.container():
-                st.markdown(f'<div class="chat-message user-message"><strong>You:</strong> {message["user"]}</div>', 
-                           unsafe_allow_html=True)
-                st.markdown(f'<div class="chat-message assistant-message"><strong>Assistant:</strong> {message["assistant"]}</div>', 
-                           unsafe_allow_html=True)
+        # Display chat history (all messages except the last one)
+        render_start = time.perf_counter()
+        render_earlier_history()
+        st.session_state.last_history_render_ms = (time.perf_counter() - render_start) * 1000
         
         # Handle the latest message separately
         if st.session_state.chat_history and st.session_state.streaming_new_message:
@@ -535,10 +775,13 @@ def main():
                         response = send_assessment_response(True)
                         if response:
                             st.session_state.show_assessment_prompt = False
-                            st.session_state.assessment_mode = True
-                            st.session_state.questions = get_assessment_questions()
-                            st.success("Assessment will begin!")
-                            time.sleep(1)
+                            # Questions came with the suggestion (or the accept response);
+                            # only fetch them when neither had them
+                            st.session_state.questions = (st.session_state.prefetched_questions
+                                                          or response.get("questions")
+                                                          or get_assessment_questions())
+                            transition("accept_assessment")
+                            notify("Assessment will begin!")
                             st.rerun()
             
             with col2:
@@ -547,10 +790,7 @@ def main():
                     if response:
                         st.session_state.show_assessment_prompt = False
                         st.session_state.assessment_declined = True
-                        st.markdown(f'<div class="declined-message">'
-                                  f'No problem! We can continue our conversation. The assessment option won\'t be offered again.'
-                                  f'</div>', unsafe_allow_html=True)
-                        time.sleep(2)
+                        notify("No problem! We can continue our conversation. The assessment option won't be offered again.")
                         st.rerun()
         
         # Chat input
@@ -562,10 +802,7 @@ def main():
                 
                 if response:
                     # Add to chat history
-                    st.session_state.chat_history.append({
-                        "user": user_input,
-                        "assistant": response["response"]
-                    })
+                    add_chat_exchange(user_input, response["response"])
                     
                     # Set flag to stream the new message
                     st.session_state.streaming_new_message = True
@@ -573,16 +810,20 @@ def main():
                     # Check if assessment should be triggered
                     if response.get("assessment_triggered", False) and not st.session_state.assessment_declined:
                         st.session_state.show_assessment_prompt = True
+                        st.session_state.prefetched_questions = response.get("questions") or []
                     
                     st.rerun()
     
-    elif st.session_state.assessment_mode:
+    elif st.session_state.stage == "assessment":
         # Assessment Mode
         st.header("Mental Health Assessment")
         
         if not st.session_state.questions:
             st.session_state.questions = get_assessment_questions()
         
+        # Recordings are kept in the session and transcribed together after the last question
+        batch_submit = st.toggle("Answer all, then submit", key="batch_submit", value=ASSESSMENT_BATCH_SUBMIT)
+        
         if st.session_state.questions:
             current_q = st.session_state.current_question
             total_q = len(st.session_state.questions)
@@ -618,7 +859,12 @@ def main():
                               f'</div>', unsafe_allow_html=True)
                 
                 # Handle audio submission - Fixed logic
-                if audio_bytes is not None and not st.session_state.current_answer_submitted:
+                if batch_submit:
+                    if audio_bytes is not None:
+                        st.session_state[f"temp_audio_{current_q}"] = audio_bytes
+                    if f"temp_audio_{current_q}" in st.session_state:
+                        st.success("Answer recorded. It will be transcribed when you submit all answers.")
+                elif audio_bytes is not None and not st.session_state.current_answer_submitted:
                     # Store the audio bytes immediately to prevent loss on rerun
                     st.session_state[f"temp_audio_{current_q}"] = audio_bytes
                     
@@ -629,7 +875,7 @@ def main():
                             if result and "transcribed_text" in result:
                                 st.session_state.current_answer_submitted = True
                                 st.session_state.last_transcription = result.get("transcribed_text", "")
-                                st.success(f"Answer recorded for question {current_q + 1}")
+                                notify(f"Answer recorded for question {current_q + 1}")
                                 # Clean up temp audio
                                 if f"temp_audio_{current_q}" in st.session_state:
                                     del st.session_state[f"temp_audio_{current_q}"]
@@ -640,7 +886,8 @@ def main():
                             st.error(f"Error processing audio: {str(e)}")
 
                 # Alternative: Manual retry button if audio processing fails
-                if not st.session_state.current_answer_submitted and f"temp_audio_{current_q}" in st.session_state:
+                if (not batch_submit and not st.session_state.current_answer_submitted
+                        and f"temp_audio_{current_q}" in st.session_state):
                     if st.button("Retry Audio Processing", key=f"retry_audio_{current_q}"):
                         with st.spinner("Retrying audio processing..."):
                             try:
@@ -650,7 +897,7 @@ def main():
                                 if result and "transcribed_text" in result:
                                     st.session_state.current_answer_submitted = True
                                     st.session_state.last_transcription = result.get("transcribed_text", "")
-                                    st.success(f"Answer recorded for question {current_q + 1}")
+                                    notify(f"Answer recorded for question {current_q + 1}")
                                     del st.session_state[f"temp_audio_{current_q}"]
                                     st.rerun()
                                 else:
@@ -664,26 +911,33 @@ def main():
                 with col1:
                     # Previous question button (only show if not on first question)
                     if current_q > 0:
-                        if st.button("Previous", key=f"prev_btn_{current_q}"):
-                            st.session_state.current_question -= 1
-                            st.session_state.current_answer_submitted = False
-                            st.session_state.last_transcription = ""
-                            st.rerun()
+                        st.button("Previous", key=f"prev_btn_{current_q}", on_click=previous_question)
                 
                 with col3:
                     # Next question button
-                    next_disabled = not (st.session_state.current_answer_submitted or st.session_state.last_transcription)
+                    next_disabled = not (st.session_state.current_answer_submitted or st.session_state.last_transcription
+                                         or (batch_submit and f"temp_audio_{current_q}" in st.session_state))
                     next_button_type = "primary" if not next_disabled else "secondary"
                     
-                    if st.button("Next", key=f"next_btn_{current_q}", 
-                                type=next_button_type, disabled=next_disabled):
-                        if st.session_state.current_answer_submitted or st.session_state.last_transcription:
-                            st.session_state.current_question += 1
-                            st.session_state.current_answer_submitted = False
-                            st.session_state.last_transcription = ""
+                    st.button("Next", key=f"next_btn_{current_q}", type=next_button_type,
+                              disabled=next_disabled, on_click=next_question)
+            elif batch_submit and recorded_answers():
+                # Recordings held back by "Answer all, then submit" (a failed one-by-one
+                # upload also leaves its recording behind, which must not open this screen)
+                pending = recorded_answers()
+                st.info(f"{len(pending)} recorded answers are ready to submit.")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("Submit All Answers", type="primary", key="submit_all_answers"):
+                        failed = submit_audio_answers(pending)
+                        if failed == 0:
+                            notify(f"{len(pending)} answers recorded")
                             st.rerun()
-                        else:
-                            st.warning("Please record an answer before proceeding to the next question.")
+                        elif failed:
+                            st.warning(f"{failed} answers could not be processed. Submit again or record them again.")
+                with col2:
+                    st.button("Go Back", key="go_back_from_submit", on_click=reopen_last_question)
             else:
                 # All questions completed - validate before showing completion
                 session_status = get_session_status()
@@ -700,21 +954,18 @@ def main():
                     
                     col1, col2, col3 = st.columns([1, 2, 1])
                     with col2:
-                        if st.button("Generate My Report", type="primary", key="generate_report_btn"):
-                            st.session_state.assessment_complete = True
-                            st.rerun()
+                        st.button("Generate My Report", type="primary", key="generate_report_btn",
+                                  on_click=transition, args=("finish_assessment",))
                 else:
                     st.warning(f"Assessment Incomplete: {assessment_count}/{total_q} responses recorded")
                     st.info("Please ensure all questions have been answered before generating the report.")
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button("Refresh Status", key="refresh_assessment_status"):
-                            st.rerun()
+                        # Any button click reruns the script, which re-reads the status
+                        st.button("Refresh Status", key="refresh_assessment_status")
                     with col2:
-                        if st.button("Go Back", key="go_back_to_questions"):
-                            st.session_state.current_question = max(0, total_q - 1)
-                            st.rerun()
+                        st.button("Go Back", key="go_back_to_questions", on_click=reopen_last_question)
         else:
             st.error("Could not load assessment questions. Please try refreshing.")
             col1, col2 = st.columns(2)
@@ -723,28 +974,12 @@ def main():
                     st.session_state.questions = get_assessment_questions()
                     st.rerun()
             with col2:
-                if st.button("Back to Chat"):
-                    st.session_state.assessment_mode = False
-                    st.rerun()
+                st.button("Back to Chat", on_click=transition, args=("back_to_chat",))
     
-    elif st.session_state.assessment_complete:
+    elif st.session_state.stage == "report":
         # Report Generation and Display Mode
         st.header("Your Mental Health Report")
         
-        # Check if report generation is in progress
-        if st.session_state.report_generation_in_progress:
-            st.info("Report generation is in progress. Please wait...")
-            progress_bar = st.progress(0, text="Generating your comprehensive report...")
-            
-            # Simulate progress updates (you could make this more sophisticated)
-            for i in range(1, 101, 10):
-                progress_bar.progress(i, text=f"Processing... {i}%")
-                time.sleep(0.1)
-            
-            progress_bar.empty()
-            st.session_state.report_generation_in_progress = False
-            st.rerun()
-        
         # Check if we have a generated report
         if st.session_state.generated_report is None:
             st.info("Ready to generate your comprehensive mental health report.")
@@ -764,45 +999,37 @@ def main():
                 col1, col2, col3 = st.columns([1, 2, 1])
                 with col2:
                     if st.button("Generate Report", type="primary", key="start_report_generation", use_container_width=True):
-                        st.session_state.report_generation_in_progress = True
-                        
                         with st.spinner("Generating your report... This may take up to 2 minutes."):
                             try:
                                 report_data = generate_report()
                                 
-                                if report_data and "report" in report_data:
+                                if report_data:
                                     st.session_state.generated_report = report_data
-                                    st.session_state.report_generation_in_progress = False
-                                    st.success("Report generated successfully!")
+                                    notify("Report generated successfully!")
                                     st.rerun()
                                 else:
-                                    st.session_state.report_generation_in_progress = False
                                     st.error("Failed to generate report. Please try again.")
                                     
                             except Exception as e:
-                                st.session_state.report_generation_in_progress = False
                                 st.error(f"Error generating report: {str(e)}")
                 
                 # Additional options while waiting for report generation
                 st.markdown("---")
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button("Back to Assessment", key="back_to_assessment_from_report"):
-                        st.session_state.assessment_complete = False
-                        st.rerun()
+                    st.button("Back to Assessment", key="back_to_assessment_from_report",
+                              on_click=transition, args=("back_to_assessment",))
                 with col2:
                     if st.button("Start New Session", key="new_session_from_report"):
                         if clear_session():
                             st.session_state.clear()
-                            st.success("Starting new session...")
+                            notify("Starting new session...")
                             st.rerun()
             else:
                 st.error("Cannot generate report due to insufficient data.")
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button("Back to Assessment"):
-                        st.session_state.assessment_complete = False
-                        st.rerun()
+                    st.button("Back to Assessment", on_click=transition, args=("back_to_assessment",))
                 with col2:
                     if st.button("Start New Session"):
                         if clear_session():
@@ -814,7 +1041,7 @@ def main():
             
             # Get report data
             report_data = st.session_state.generated_report
-            report_content = report_data.get("report", "No report content available")
+            report_content = report_as_markdown(report_data) or "No report content available"
             
             # Display report in a nice container
             st.markdown("---")
@@ -822,7 +1049,15 @@ def main():
             
             with st.container():
                 st.markdown('<div class="report-container">', unsafe_allow_html=True)
-                st.markdown(report_content)
+                if report_data.get("sections"):
+                    if report_data.get("risk_level"):
+                        st.metric("Overall Risk Level", report_data["risk_level"])
+                    render_scores(report_data.get("scores"))
+                    for section in report_data["sections"]:
+                        st.markdown(f"#### {section['title']}")
+                        st.markdown(section["content"])
+                else:
+                    st.markdown(report_content)
                 st.markdown('</div>', unsafe_allow_html=True)
             
             # Display session statistics
@@ -860,25 +1095,19 @@ def main():
                 )
             
             with col2:
-                if st.button("Regenerate Report", type="secondary"):
-                    st.session_state.generated_report = None
-                    st.info("Report cleared. You can now generate a new one.")
-                    st.rerun()
+                st.button("Regenerate Report", type="secondary", on_click=discard_report)
             
             with col3:
                 if st.button("Start New Session", type="secondary"):
                     if clear_session():
                         st.session_state.clear()
-                        st.success("Starting new session...")
+                        notify("Starting new session...")
                         st.rerun()
                     else:
                         st.error("Failed to clear session")
             
             with col4:
-                if st.button("Back to Chat", type="secondary"):
-                    st.session_state.assessment_complete = False
-                    st.session_state.assessment_mode = False
-                    st.rerun()
+                st.button("Back to Chat", type="secondary", on_click=transition, args=("back_to_chat",))
             
             # Additional information and help
             st.markdown("---")
@@ -945,7 +1174,16 @@ def main():
                 if st.button("Submit Feedback", key="submit_feedback"):
                     st.success("Thank you for your feedback!")
                     st.balloons()
+    
+    if timings_panel is not None:
+        with timings_panel:
+            render_api_timings_panel()
 
 if __name__ == "__main__":
-
-    main()
+    run_started = time.perf_counter()
+    st.session_state.last_history_render_ms = 0.0
+    try:
+        main()
+    finally:
+        # Also runs when st.rerun() or st.stop() ends the script early
+        record_rerun_time(run_started, st.session_state.get("last_history_render_ms", 0.0))
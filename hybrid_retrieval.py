@@ -0,0 +1,132 @@
+"""
+Hybrid lexical + dense retrieval over the mhguide_db docstore.
+
+A local BM25 inverted index (unigrams plus bigrams, so exact clinical
+phrases such as "panic attack" score as a unit) is built from the chunks in
+index.pkl at startup. Its ranking is fused with the FAISS ranking by
+reciprocal rank fusion. RETRIEVAL_MODE selects:
+  dense   - FAISS only (the original behaviour, and the default)
+  hybrid  - BM25 and FAISS fused with RRF; opt-in until
+            benchmarks/retrieval_benchmark.py shows it is at least as good
+  lexical - BM25 only, no embedding call (fast mode for a slow/down backend)
+Dense failures in hybrid mode fall back to the lexical ranking.
+"""
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RETRIEVAL_MODES = ("dense", "hybrid", "lexical")
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can could did do does for from had has have he her his how i if in
+into is it its me my no not of on or our she so than that the their them then there these they this
+to was we were what when where which who will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased content words plus adjacent-word bigrams"""
+    words = [w for w in _WORD_PATTERN.findall(text.lower()) if w not in _STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class BM25Index:
+    """In-memory BM25 inverted index over a fixed list of texts"""
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths = np.zeros(len(texts), dtype="float32")
+        for doc_index, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            self.doc_lengths[doc_index] = sum(terms.values())
+            for term, tf in terms.items():
+                self.postings[term].append((doc_index, tf))
+        self.num_docs = len(texts)
+        self.avg_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (self.num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Return (doc_index, score) pairs for the k best matching documents"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_index, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_length)
+                scores[doc_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int, rrf_k: int = 60) -> List[int]:
+    """Fuse several rankings of doc indices; documents ranked well by any list rise to the top"""
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_index in enumerate(ranking):
+            fused[doc_index] += 1.0 / (rrf_k + rank + 1)
+    return [doc_index for doc_index, _ in sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]]
+
+
+class HybridRetriever:
+    """BM25 + FAISS retrieval over a langchain FAISS store"""
+
+    def __init__(self, vector_store, mode: Optional[str] = None, candidates: Optional[int] = None,
+                 rrf_k: Optional[int] = None):
+        self.vector_store = vector_store
+        self.mode = (mode or os.getenv("RETRIEVAL_MODE", "dense")).lower()
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown RETRIEVAL_MODE '{self.mode}', expected one of {RETRIEVAL_MODES}")
+        self.candidates = candidates or int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+        self.rrf_k = rrf_k or int(os.getenv("RRF_K", "60"))
+        # Positions follow the FAISS index order, so both rankings share doc indices
+        self.doc_ids = [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+        self.texts = [vector_store.docstore.search(doc_id).page_content for doc_id in self.doc_ids]
+        self.bm25 = BM25Index(self.texts)
+
+    def lexical_ranking(self, query: str, n: int) -> List[int]:
+        return [doc_index for doc_index, _ in self.bm25.search(query, n)]
+
+    def dense_ranking_by_vector(self, vector: Sequence[float], n: int) -> List[int]:
+        query = np.array([vector], dtype="float32")
+        _, indices = self.vector_store.index.search(query, n)
+        return [int(i) for i in indices[0] if i != -1]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.vector_store.embedding_function.embed_query(query)
+
+    @property
+    def needs_embedding(self) -> bool:
+        return self.mode != "lexical"
+
+    def rank(self, query: str, k: int, vector: Optional[Sequence[float]] = None,
+             mode: Optional[str] = None) -> List[int]:
+        """Doc indices for a query; pass a precomputed vector to skip the embedding call"""
+        mode = mode or self.mode
+        if mode == "lexical":
+            return self.lexical_ranking(query, k)
+        if mode == "dense":
+            return self.dense_ranking_by_vector(vector if vector is not None else self.embed_query(query), k)
+        lexical = self.lexical_ranking(query, self.candidates)
+        try:
+            dense = self.dense_ranking_by_vector(
+                vector if vector is not None else self.embed_query(query), self.candidates)
+        except Exception as e:
+            print(f"Dense retrieval failed, using lexical results only: {e}")
+            return lexical[:k]
+        return reciprocal_rank_fusion([dense, lexical], k, self.rrf_k)
+
+    def search(self, query: str, k: int = 3, vector: Optional[Sequence[float]] = None,
+               mode: Optional[str] = None) -> List[str]:
+        return [self.texts[i] for i in self.rank(query, k, vector, mode)]
@@ -0,0 +1,221 @@
+"""
+Offline ingestion pipeline for the mhguide_db FAISS store.
+
+Chunks source documents (.txt, .md, and .pdf when pypdf is installed), embeds
+new chunks in batches on a bounded thread pool and writes the index. Chunks
+are keyed by a hash of their content in mhguide_db/manifest.json, so
+unchanged chunks are never re-embedded. On the first run the manifest is
+bootstrapped from the existing index.
+
+  python ingest.py docs/                    # add new/changed chunks from docs/
+  python ingest.py docs/ --prune            # also drop chunks not found in docs/
+  python ingest.py --delete-source old.pdf  # remove every chunk of one source
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from dotenv import load_dotenv
+from langchain.schema import Document
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+load_dotenv()
+
+MANIFEST_FILE = "manifest.json"
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_embeddings() -> HuggingFaceEndpointEmbeddings:
+    """Same embedding backend as MentalHealthChatbot"""
+    return HuggingFaceEndpointEmbeddings(
+        model=os.getenv("HUGGINGFACE_EMBEDDINGS_URL", 'sentence-transformers/all-mpnet-base-v2'),
+        task="feature-extraction",
+        huggingfacehub_api_token=os.getenv('HUGGINGFACE_API_KEY'))
+
+
+def iter_source_files(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(SUPPORTED_EXTENSIONS))
+        elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+            files.append(path)
+        else:
+            print(f"Skipping unsupported file: {path}")
+    return sorted(files)
+
+
+def load_source(path: str) -> List[Document]:
+    """Load one source file as page documents, tagged with its file name"""
+    source = os.path.basename(path)
+    if path.lower().endswith(".pdf"):
+        try:
+            from langchain_community.document_loaders import PyPDFLoader
+            pages = PyPDFLoader(path).load()
+        except ImportError:
+            print(f"Skipping {path}: install pypdf to ingest PDF files")
+            return []
+        for page in pages:
+            page.metadata["source"] = source
+        return pages
+    with open(path, "r", encoding="utf-8") as f:
+        return [Document(page_content=f.read(), metadata={"source": source})]
+
+
+def chunk_sources(files: List[str], chunk_size: int, chunk_overlap: int) -> Dict[str, Document]:
+    """Split every source into chunks keyed by content hash (duplicates collapse)"""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks: Dict[str, Document] = {}
+    for path in files:
+        for chunk in splitter.split_documents(load_source(path)):
+            chunks.setdefault(content_hash(chunk.page_content), chunk)
+    return chunks
+
+
+def load_manifest(db_path: str, store) -> Dict:
+    """Read the manifest, or bootstrap it by hashing the chunks already in the store"""
+    manifest_path = os.path.join(db_path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    manifest = {"chunks": {}}
+    if store is not None:
+        for doc_id in store.index_to_docstore_id.values():
+            doc = store.docstore.search(doc_id)
+            # Prebuilt stores can hold the same text more than once
+            entry = manifest["chunks"].setdefault(content_hash(doc.page_content), {
+                "ids": [],
+                "source": doc.metadata.get("source", ""),
+            })
+            entry["ids"].append(doc_id)
+        print(f"Bootstrapped manifest from {len(manifest['chunks'])} existing chunks")
+    return manifest
+
+
+def embed_in_batches(embeddings, texts: List[str], batch_size: int, workers: int,
+                     retries: int = 3) -> List[List[float]]:
+    """Embed texts in batches on a bounded thread pool, preserving order"""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def embed_batch(batch: List[str]) -> List[List[float]]:
+        for attempt in range(retries):
+            try:
+                return embeddings.embed_documents(batch)
+            except Exception as e:
+                if attempt == retries - 1:
+                    raise
+                wait = 2 ** attempt
+                print(f"Embedding batch failed ({e}), retrying in {wait}s")
+                time.sleep(wait)
+        return []
+
+    vectors: List[List[float]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for done, result in enumerate(pool.map(embed_batch, batches), start=1):
+            vectors.extend(result)
+            print(f"Embedded batch {done}/{len(batches)}")
+    return vectors
+
+
+def save_store(store, manifest: Dict, db_path: str):
+    """Write index, docstore and manifest to a temp dir, then swap them in"""
+    tmp_path = f"{db_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    store.save_local(tmp_path)
+    with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.makedirs(db_path, exist_ok=True)
+    for name in os.listdir(tmp_path):
+        os.replace(os.path.join(tmp_path, name), os.path.join(db_path, name))
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def plan_changes(manifest: Dict, chunks: Dict[str, Document], processed_sources: set,
+                 prune: bool, delete_sources: set) -> Tuple[List[str], List[str]]:
+    """Return (hashes to embed, hashes to delete)"""
+    known = manifest["chunks"]
+    to_add = [h for h in chunks if h not in known]
+    to_delete = []
+    for h, entry in known.items():
+        if h in chunks:
+            continue
+        source = entry.get("source", "")
+        if prune or source in delete_sources or source in processed_sources:
+            to_delete.append(h)
+    return to_add, to_delete
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAISS knowledge base")
+    parser.add_argument("sources", nargs="*", help="Files or directories to ingest")
+    parser.add_argument("--db", default="mhguide_db", help="FAISS store directory")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=64, help="Texts per embedding call")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent embedding calls")
+    parser.add_argument("--prune", action="store_true", help="Delete chunks not present in the given sources")
+    parser.add_argument("--delete-source", action="append", default=[], help="Remove all chunks of a source file name")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would change")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    embeddings = build_embeddings()
+    store = None
+    if os.path.exists(os.path.join(args.db, "index.faiss")):
+        store = FAISS.load_local(args.db, embeddings, allow_dangerous_deserialization=True)
+    manifest = load_manifest(args.db, store)
+
+    files = iter_source_files(args.sources)
+    chunks = chunk_sources(files, args.chunk_size, args.chunk_overlap)
+    processed_sources = {os.path.basename(f) for f in files}
+    to_add, to_delete = plan_changes(manifest, chunks, processed_sources, args.prune, set(args.delete_source))
+    unchanged = len(chunks) - len(to_add)
+    print(f"Sources: {len(files)} files, {len(chunks)} chunks "
+          f"({unchanged} unchanged, {len(to_add)} new, {len(to_delete)} to delete)")
+
+    if args.dry_run or (not to_add and not to_delete):
+        print("Nothing written" if args.dry_run else "Index is up to date")
+        return
+
+    embed_seconds = 0.0
+    if to_add:
+        texts = [chunks[h].page_content for h in to_add]
+        embed_start = time.perf_counter()
+        vectors = embed_in_batches(embeddings, texts, args.batch_size, args.workers)
+        embed_seconds = time.perf_counter() - embed_start
+        metadatas = [chunks[h].metadata for h in to_add]
+        if store is None:
+            store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas, ids=to_add)
+        else:
+            store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=to_add)
+        for h in to_add:
+            manifest["chunks"][h] = {"ids": [h], "source": chunks[h].metadata.get("source", "")}
+
+    if to_delete and store is not None:
+        store.delete([doc_id for h in to_delete for doc_id in manifest["chunks"][h]["ids"]])
+        for h in to_delete:
+            del manifest["chunks"][h]
+
+    save_store(store, manifest, args.db)
+
+    total_seconds = time.perf_counter() - start
+    rate = len(to_add) / embed_seconds if embed_seconds else 0.0
+    print(f"Embedded {len(to_add)} chunks in {embed_seconds:.2f}s ({rate:.1f} chunks/sec), "
+          f"deleted {len(to_delete)}, index now holds {store.index.ntotal} vectors")
+    print(f"Total ingestion time: {total_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Hedged chat completions to cut tail latency.
+
+The primary model is streamed; if it has not produced a first token within
+LLM_HEDGE_AFTER_MS (or fails before then), a backup request is sent to a
+different model (per task, see ModelRouter.backup_for) and whichever
+completes first wins. The loser is cancelled. A primary that already is the
+backup model is not hedged: a second request to the same model would only
+double its load. The whole call is bounded by LLM_DEADLINE_S, after
+which a fallback message is returned instead of letting the frontend time out.
+"""
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+DEFAULT_FALLBACK_MESSAGE = (
+    "I'm sorry, I'm taking longer than usual to respond right now. "
+    "Could you give me a moment and send your message again?"
+)
+
+
+class HedgedChat:
+    def __init__(self, primary, backup=None, hedge_after_ms: Optional[float] = None,
+                 deadline_s: Optional[float] = None, fallback_message: Optional[str] = None):
+        self.primary = primary
+        self.backup = backup
+        self.hedge_after_s = (hedge_after_ms if hedge_after_ms is not None else float(os.getenv("LLM_HEDGE_AFTER_MS", "1500"))) / 1000.0
+        self.deadline_s = deadline_s if deadline_s is not None else float(os.getenv("LLM_DEADLINE_S", "25"))
+        self.fallback_message = fallback_message or os.getenv("LLM_FALLBACK_MESSAGE", DEFAULT_FALLBACK_MESSAGE)
+        self.enabled = os.getenv("LLM_HEDGING", "true").lower() != "false"
+        self.stats = {"requests": 0, "hedged": 0, "not_hedged_same_model": 0, "primary_wins": 0, "backup_wins": 0,
+                      "deadline_fallbacks": 0}
+
+    async def ainvoke(self, messages, primary=None, deadline_s: Optional[float] = None, backup=None) -> str:
+        """Return the completion text, hedging slow primaries and enforcing the hard deadline.
+        primary and backup override the default models for this call (see model_routing.py)."""
+        text, _ = await self.acomplete(messages, primary, deadline_s, backup)
+        return text
+
+    async def acomplete(self, messages, primary=None, deadline_s: Optional[float] = None,
+                        backup=None) -> Tuple[str, bool]:
+        """Like ainvoke, but also reports whether the fallback message was used.
+        deadline_s can only shorten the configured deadline."""
+        self.stats["requests"] += 1
+        deadline = self.deadline_s if self.deadline_s > 0 else None
+        if deadline_s is not None:
+            deadline = deadline_s if deadline is None else min(deadline, deadline_s)
+        try:
+            race = self._race(messages, primary or self.primary, backup or self.backup)
+            if deadline is None:
+                return await race, False
+            if deadline <= 0:
+                race.close()
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(race, deadline), False
+        except asyncio.TimeoutError:
+            self.stats["deadline_fallbacks"] += 1
+            return self.fallback_message, True
+
+    async def _race(self, messages, primary_llm, backup_llm) -> str:
+        first_token = asyncio.Event()
+        primary = asyncio.ensure_future(self._collect(primary_llm, messages, first_token))
+        tasks = {primary: "primary"}
+        try:
+            if self.enabled and backup_llm is not None and self._same_model(primary_llm, backup_llm):
+                self.stats["not_hedged_same_model"] += 1
+            elif self.enabled and backup_llm is not None:
+                waiter = asyncio.ensure_future(first_token.wait())
+                await asyncio.wait({primary, waiter}, timeout=self.hedge_after_s,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                primary_failed = primary.done() and primary.exception() is not None
+                if primary_failed or not (first_token.is_set() or primary.done()):
+                    self.stats["hedged"] += 1
+                    tasks[asyncio.ensure_future(self._collect(backup_llm, messages, None))] = "backup"
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.stats[f"{tasks[task]}_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _same_model(llm, other) -> bool:
+        model = getattr(llm, "model_name", None)
+        return llm is other or (model is not None and model == getattr(other, "model_name", None))
+
+    @staticmethod
+    async def _collect(llm, messages, first_token: Optional[asyncio.Event]) -> str:
+        parts = []
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                if first_token is not None:
+                    first_token.set()
+                parts.append(chunk.content)
+        return "".join(parts)
+
+    def snapshot(self) -> Dict:
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "hedge_rate": round(self.stats["hedged"] / requests, 4) if requests else 0.0,
+        }
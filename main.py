@@ -1,25 +1,66 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException , Form
+from fastapi import FastAPI, UploadFile, File, HTTPException , Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import json
 import os
+import secrets
+import time
 import uvicorn
 from dotenv import load_dotenv
 
 # Langchain imports
-from langchain_groq import ChatGroq
 from langchain_huggingface import HuggingFaceEndpointEmbeddings
 from langchain_community.vectorstores.faiss import FAISS
-from langchain.prompts import PromptTemplate
 from langchain.schema import HumanMessage, AIMessage
 
+from prompts import CHAT_PROMPT, REPORT_PROMPT, STRUCTURED_REPORT_PROMPT
+from prompt_budget import PromptAssembler
+from vector_index import load_or_build_index
+from hybrid_retrieval import HybridRetriever
+from embedding_batcher import EmbeddingMicroBatcher
+from singleflight import SingleFlight, content_key
+from transcript_cache import TranscriptCache
+from admission import AdmissionController
+from llm_hedging import HedgedChat
+from model_routing import ModelRouter, build_groq_llm
+from deadlines import DeadlineBudget, ContextCache
+from sessions import Session
+from session_store import SessionEventLog
+from report_schema import ReportValidationError, parse_structured_report, report_sections
+from compression import CompressionMiddleware
+from scoring import load_questionnaire, score_answer, score_assessment
+from warmup import FirstRequestTimer, WarmupState, run_warmup
+from session_transfer import MEDIA_TYPES, RecordDecoder, TransferFormatError, check_format, iter_export_chunks, parse_record
+
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Mental Health Assessment Chatbot", version="1.0.0")
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """Renders dict responses with orjson when it is installed. Endpoints with a
+    response_model (/chat) keep FastAPI's own pydantic serialization"""
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
 
-# Global variables for session management
-user_sessions = {}
+app = FastAPI(title="Mental Health Assessment Chatbot", version="1.0.0", default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+# Start-up warm-up progress and first-request latency per endpoint (see warmup.py)
+warmup_state = WarmupState()
+app.add_middleware(FirstRequestTimer, state=warmup_state)
+
+# Global variables for session management (user_id -> sessions.Session)
+user_sessions: Dict[str, Session] = {}
+# Persists session mutations when SESSION_LOG_DIR is set (see session_store.py)
+session_log = SessionEventLog(user_sessions)
+session_log.recover()
 
 # Pydantic models
 class ChatMessage(BaseModel):
@@ -31,6 +72,8 @@ class ChatResponse(BaseModel):
     chat_count: int
     assessment_triggered: bool = False
     assessment_suggestion_count: int = 0
+    # Sent along with an assessment suggestion so accepting needs no extra round-trip
+    questions: Optional[List[Dict[str, Any]]] = None
 
 class AssessmentAnswer(BaseModel):
     user_id: str
@@ -39,6 +82,8 @@ class AssessmentAnswer(BaseModel):
 
 class ReportRequest(BaseModel):
     user_id: str
+    # "markdown" or "structured" (JSON sections validated against report_schema); default REPORT_FORMAT
+    format: Optional[str] = None
 
 class AssessmentResponse(BaseModel):
     user_id: str
@@ -47,16 +92,17 @@ class AssessmentResponse(BaseModel):
 # Initialize components
 class MentalHealthChatbot:
     def __init__(self):
-        # Initialize Groq LLM
-        self.llm = ChatGroq(
-            model_name="llama-3.3-70b-versatile",
-            groq_api_key=os.getenv("GROQ_API_KEY"),
-            temperature=0.7
-        )
-        
+        # GROQ_BASE_URL / HUGGINGFACE_EMBEDDINGS_URL point the clients at a
+        # stand-in provider (see fake_providers.py) for local and load testing
+        # Initialize Groq LLMs, one per task model config (see model_routing.py)
+        self.router = ModelRouter(build_groq_llm)
+        self.llm = self.router.llm_for("report")
+        # Slow chat turns are raced against their route's backup model (see llm_hedging.py)
+        self.chat_llm = HedgedChat(self.llm, self.router.backup_for("report"))
+
         # Initialize embeddings
         self.embeddings = HuggingFaceEndpointEmbeddings(
-            model='sentence-transformers/all-mpnet-base-v2',
+            model=os.getenv("HUGGINGFACE_EMBEDDINGS_URL", 'sentence-transformers/all-mpnet-base-v2'),
             task="feature-extraction",
             huggingfacehub_api_token=os.getenv('HUGGINGFACE_API_KEY'))
         
@@ -67,113 +113,151 @@ class MentalHealthChatbot:
             self.embeddings,
             allow_dangerous_deserialization=True
         )
+        # Swap in an HNSW / IVF-PQ index when VECTOR_INDEX_TYPE asks for one
+        self.vector_store.index = load_or_build_index("mhguide_db", self.vector_store.index)
+        # BM25 over the docstore fused with FAISS (RETRIEVAL_MODE=dense|hybrid|lexical)
+        self.retriever = HybridRetriever(self.vector_store)
+        # Coalesces concurrent query embeddings into batched calls
+        self.embedding_batcher = EmbeddingMicroBatcher(self.embeddings)
         
         # Load assessment questions
-        with open('questionnaire.json', 'r') as f:
-            self.questions = json.load(f)
-        
-        # Chat prompt template (only last 3 conversations)
-        self.chat_prompt = PromptTemplate(
-            input_variables=["context", "chat_history", "user_message", "chat_count", "assessment_declined"],
-            template="""
-            You are a compassionate mental health assistant. Use the following context to provide helpful, supportive responses.
-            
-            Context from knowledge base:
-            {context}
-            
-            Previous conversation (last 3 exchanges):
-            {chat_history}
-            
-            Current chat count: {chat_count}
-            Assessment previously declined: {assessment_declined}
-            
-            User message: {user_message}
-            
-            Guidelines:
-            1. Provide a supportive, informative response that is conversational and empathetic.
-            2. If this is the 3rd or 4th interaction AND assessment hasn't been declined, gently suggest taking a mental health assessment to get more personalized insights.
-            3. If the user has already declined the assessment, continue with regular supportive conversation without mentioning assessment again.
-            4. Keep your response natural and don't force the assessment suggestion.
-            5. The assessment suggestion should feel organic to the conversation flow.
-            6. Keep your responses consize and medium to short sized.
-            
-            Response:"""
-        )
-        
-        # Report generation prompt (full history)
-        self.report_prompt = PromptTemplate(
-            input_variables=["full_chat_history", "assessment_responses"],
-            template="""
-            Generate a comprehensive mental health assessment report based on the following information:
-            
-            Complete Chat History:
-            {full_chat_history}
-            
-            Assessment Responses:
-            {assessment_responses}
-            
-            Please provide a structured report with the following sections:
-            
-            # Mental Health Assessment Report
-            
-            ## Executive Summary
-            Brief overview of the assessment findings and overall mental health status
-            
-            ## Chat Analysis
-            Analysis of conversation patterns, concerns expressed, and emotional themes throughout the entire conversation
-            
-            ## Assessment Results
-            Detailed analysis of questionnaire responses with specific insights
-            
-            ## Risk Assessment
-            Evaluation of potential mental health risks (Low/Medium/High) with specific reasoning
-            
-            ## Key Findings
-            Most significant observations and patterns identified
-            
-            ## Recommendations
-            Specific, actionable recommendations for mental health support and self-care
-            
-            ## Professional Resources
-            Suggested professional resources, therapy options, and next steps
-            
-            ## Self-Care Strategies
-            Practical daily strategies and coping mechanisms
-            
-            Keep the tone professional yet compassionate. Focus on providing actionable insights and hope.
-            """
-        )
+        self.questions = load_questionnaire()
+        
+        # Prompt templates live in prompts.py so offline tools can reuse them
+        self.chat_prompt = CHAT_PROMPT
+        self.report_prompt = REPORT_PROMPT
+        self.structured_report_prompt = STRUCTURED_REPORT_PROMPT
+        self.report_format = os.getenv("REPORT_FORMAT", "markdown")
+        # LLM calls allowed per structured report before giving up on a reply that fails validation
+        self.structured_report_attempts = int(os.getenv("STRUCTURED_REPORT_ATTEMPTS", "2"))
 
-    def get_relevant_context(self, query: str) -> str:
-        """Retrieve relevant context from vector store"""
+        # Packs retrieved context and history into per-prompt token budgets
+        self.prompt_assembler = PromptAssembler()
+
+        self.transcription_model = "whisper-large-v3"
+        self._transcription_client = None
+        # Transcriptions run at once for one /submit_answers request
+        self.batch_transcription_concurrency = int(os.getenv("BATCH_TRANSCRIPTION_CONCURRENCY", "8"))
+
+        # Identical concurrent retrievals / transcriptions share one execution
+        self.retrieval_flights = SingleFlight()
+        self.transcription_flights = SingleFlight()
+        # Resubmitted recordings are answered from cache instead of Whisper
+        self.transcript_cache = TranscriptCache()
+
+        # Retrieval's slice of the /chat deadline budget, and the last context
+        # per query to fall back on when retrieval overruns it
+        self.retrieval_budget_s = float(os.getenv("CHAT_RETRIEVAL_BUDGET_MS", "2000")) / 1000.0
+        self.context_cache = ContextCache()
+        self.degradation_stats = {
+            "chat_requests": 0,
+            "degraded_responses": 0,
+            "retrieval_timeouts": 0,
+            "cached_context": 0,
+            "lexical_context": 0,
+            "no_context": 0,
+            "generation_timeouts": 0,
+        }
+
+    def get_relevant_documents(self, query: str) -> List[str]:
+        """Retrieve relevant document chunks from vector store, best match first"""
         try:
-            docs = self.vector_store.similarity_search(query, k=3)
-            context = "\n".join([doc.page_content for doc in docs])
-            return context
+            return self.retriever.search(query, k=3)
         except Exception as e:
             print(f"Error retrieving context: {e}")
-            return ""
+            return []
 
-    def process_audio_to_text(self, audio_file: UploadFile) -> str:
-        """Convert audio to text using Groq Whisper"""
+    async def aget_relevant_documents(self, query: str) -> List[str]:
+        """Async retrieval; identical in-flight queries are coalesced"""
+        key = content_key(self.retriever.mode, query)
+        return await self.retrieval_flights.do(key, lambda: self._aretrieve(query, key))
+
+    async def aget_relevant_documents_within(self, query: str, timeout_s: float) -> Tuple[List[str], Optional[str]]:
+        """Retrieval bounded by timeout_s; returns (docs, degradation) where degradation names
+        the fallback used (cached_context, lexical_context, no_context) or is None"""
         try:
-            # Save uploaded audio temporarily
-            temp_path = f"temp_audio_{audio_file.filename}"
-            with open(temp_path, "wb") as buffer:
-                buffer.write(audio_file.file.read())
-            
-            # Initialize Groq client for Whisper
+            return await asyncio.wait_for(self.aget_relevant_documents(query), timeout_s), None
+        except asyncio.TimeoutError:
+            # The shared retrieval keeps running and fills the context cache for later turns
+            self.degradation_stats["retrieval_timeouts"] += 1
+        cached = self.context_cache.get(content_key(self.retriever.mode, query))
+        if cached is not None:
+            return cached, "cached_context"
+        if self.retriever.mode != "dense":
+            return self.retriever.search(query, k=3, mode="lexical"), "lexical_context"
+        return [], "no_context"
+
+    def record_chat_degradation(self, retrieval: Optional[str], generation_timed_out: bool):
+        self.degradation_stats["chat_requests"] += 1
+        if retrieval:
+            self.degradation_stats[retrieval] += 1
+        if generation_timed_out:
+            self.degradation_stats["generation_timeouts"] += 1
+        if retrieval or generation_timed_out:
+            self.degradation_stats["degraded_responses"] += 1
+            print(f"Degraded chat response: retrieval={retrieval or 'ok'}, generation_timed_out={generation_timed_out}")
+
+    async def _aretrieve(self, query: str, cache_key: str) -> List[str]:
+        """Retrieve with the query embedding going through the micro-batcher"""
+        try:
+            vector = None
+            if self.retriever.needs_embedding:
+                try:
+                    vector = await self.embedding_batcher.embed(query)
+                except Exception as e:
+                    if self.retriever.mode == "dense":
+                        raise
+                    print(f"Dense retrieval failed, using lexical results only: {e}")
+                    return self.retriever.search(query, k=3, mode="lexical")
+            docs = self.retriever.search(query, k=3, vector=vector)
+            self.context_cache.put(cache_key, docs)
+            return docs
+        except Exception as e:
+            print(f"Error retrieving context: {e}")
+            return []
+
+    def get_relevant_context(self, query: str) -> str:
+        """Retrieve relevant context from vector store"""
+        return "\n".join(self.get_relevant_documents(query))
+
+    def transcription_client(self):
+        """Shared Groq client for Whisper, so uploads reuse its connection pool"""
+        if self._transcription_client is None:
             from groq import Groq
-            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            
-            with open(temp_path, "rb") as audio:
-                transcription = client.audio.transcriptions.create(
-                    file=audio,
-                    model="whisper-large-v3"
-                )
+            self._transcription_client = Groq(api_key=os.getenv("GROQ_API_KEY"), base_url=os.getenv("GROQ_BASE_URL"))
+        return self._transcription_client
+
+    async def agenerate_structured_report(self, prompt: str):
+        """Report in JSON mode, validated against StructuredReport; retried when the reply is invalid"""
+        llm = self.router.route("report").bind(response_format={"type": "json_object"})
+        error = None
+        for attempt in range(self.structured_report_attempts):
+            reply = (await llm.ainvoke([HumanMessage(content=prompt)])).content
+            try:
+                return parse_structured_report(reply)
+            except ReportValidationError as e:
+                error = e
+                print(f"Structured report attempt {attempt + 1} failed validation: {e}")
+        raise error
+
+    def warm_transcription_client(self):
+        """Import and build the Whisper client and open a connection before the first upload"""
+        try:
+            self.transcription_client().models.list()
+        except Exception as e:
+            print(f"Transcription client warm-up failed: {e}")
+
+    def transcribe_audio_bytes(self, audio_bytes: bytes, filename: str) -> str:
+        """Convert audio bytes to text using Groq Whisper"""
+        try:
+            client = self.transcription_client()
             
-            # Clean up temp file
-            os.remove(temp_path)
+            # Sent from memory: no temp file that concurrent uploads with the
+            # same filename could overwrite
+            transcription = client.audio.transcriptions.create(
+                file=(filename or "audio.wav", audio_bytes),
+                model=self.transcription_model
+            )
             
             return transcription.text
             
@@ -181,80 +265,115 @@ class MentalHealthChatbot:
             print(f"Error processing audio: {e}")
             return ""
 
+    def process_audio_to_text(self, audio_file: UploadFile) -> str:
+        """Convert audio to text using Groq Whisper"""
+        return self.transcribe_audio_bytes(audio_file.file.read(), audio_file.filename)
+
+    async def aprocess_audio_to_text(self, audio_file: UploadFile) -> str:
+        """Async transcription; cached or identical in-flight audio is not transcribed again"""
+        audio_bytes = await audio_file.read()
+        key = TranscriptCache.key(self.transcription_model, audio_bytes)
+        cached = await self.transcript_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def transcribe() -> str:
+            text = await asyncio.to_thread(self.transcribe_audio_bytes, audio_bytes, audio_file.filename)
+            await self.transcript_cache.put(key, text)
+            return text
+
+        return await self.transcription_flights.do(key, transcribe)
+
 # Initialize chatbot
 chatbot = MentalHealthChatbot()
+admission = AdmissionController()
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(message: ChatMessage):
+async def chat_endpoint(message: ChatMessage, http_request: Request):
     """Main chat endpoint"""
+    # Split across retrieval and generation so the turn finishes before the frontend gives up
+    budget = DeadlineBudget()
+    ticket = await admission.acquire("chat", message.user_id, http_request)
+    retrieval = None
     try:
         user_id = message.user_id
         user_message = message.message
         
+        # Retrieval only needs the message: start it now (sleep(0) lets it reach
+        # the embedding batcher) and do session bookkeeping and routing meanwhile
+        retrieval = asyncio.ensure_future(chatbot.aget_relevant_documents_within(
+            user_message, budget.slice(chatbot.retrieval_budget_s)))
+        await asyncio.sleep(0)
+        
         # Initialize user session if not exists
         if user_id not in user_sessions:
-            user_sessions[user_id] = {
-                "chat_history": [],
-                "chat_count": 0,
-                "assessment_responses": [],
-                "assessment_declined": False,
-                "assessment_suggestion_count": 0,
-                "assessment_offered": False
-            }
+            user_sessions[user_id] = Session()
         
         session = user_sessions[user_id]
-        session["chat_count"] += 1
-        
-        # Get relevant context
-        context = chatbot.get_relevant_context(user_message)
-        
-        # Prepare chat history string (only last 3 exchanges for system prompt)
-        recent_chat_history = "\n".join([
-            f"User: {msg['user']}\nAssistant: {msg['assistant']}" 
-            for msg in session["chat_history"][-3:]
-        ])
+        session.chat_count += 1
+        session_log.append("count", user_id)
         
         # Check if we should suggest assessment (3-4 chats, not declined, not already offered)
         should_suggest_assessment = (
-            session["chat_count"] >= 3 and 
-            session["chat_count"] <= 4 and 
-            not session["assessment_declined"] and
-            not session["assessment_offered"]
+            session.chat_count >= 3 and 
+            session.chat_count <= 4 and 
+            not session.assessment_declined and
+            not session.assessment_offered
         )
-        
-        # Generate response
-        prompt = chatbot.chat_prompt.format(
-            context=context,
-            chat_history=recent_chat_history,
+        if should_suggest_assessment:
+            # Voice answers may follow shortly: get the Whisper client ready in the background
+            asyncio.get_running_loop().run_in_executor(None, chatbot.warm_transcription_client)
+        
+        # Fast model for ordinary turns, large model for the assessment offer
+        # and for long or risk-flagged messages
+        route, route_llm = chatbot.router.route_chat(user_message, should_suggest_assessment)
+        
+        # Context retrieved within retrieval's slice of the deadline budget
+        context_docs, retrieval_degraded = await retrieval
+        
+        # Generate response (context and last 3 exchanges packed into the token budget)
+        prompt, _ = chatbot.prompt_assembler.build_chat_prompt(
+            chatbot.chat_prompt,
+            docs=context_docs,
+            recent_exchanges=session.recent,
             user_message=user_message,
-            chat_count=session["chat_count"],
-            assessment_declined=session["assessment_declined"]
+            chat_count=session.chat_count,
+            assessment_declined=session.assessment_declined
         )
         
-        response = chatbot.llm.invoke([HumanMessage(content=prompt)])
-        assistant_response = response.content
+        assistant_response, generation_timed_out = await chatbot.chat_llm.acomplete(
+            [HumanMessage(content=prompt)], primary=route_llm, deadline_s=budget.remaining(),
+            backup=chatbot.router.backup_for(route))
+        chatbot.record_chat_degradation(retrieval_degraded, generation_timed_out)
         
-        # Update chat history
-        session["chat_history"].append({
-            "user": user_message,
-            "assistant": assistant_response
-        })
+        # Update chat history (the timeout apology is not part of the conversation)
+        if not generation_timed_out:
+            session.add_exchange(user_message, assistant_response)
+            session_log.append("exchange", user_id, user_message, assistant_response)
         
         # Determine if assessment should be triggered
         assessment_triggered = should_suggest_assessment
         if assessment_triggered:
-            session["assessment_offered"] = True
-            session["assessment_suggestion_count"] += 1
+            session.assessment_offered = True
+            session.assessment_suggestion_count += 1
+            session_log.append("offered", user_id)
         
         return ChatResponse(
             response=assistant_response,
-            chat_count=session["chat_count"],
+            chat_count=session.chat_count,
             assessment_triggered=assessment_triggered,
-            assessment_suggestion_count=session["assessment_suggestion_count"]
+            assessment_suggestion_count=session.assessment_suggestion_count,
+            questions=chatbot.questions if assessment_triggered else None
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # The turn failed before it awaited retrieval: do not leave the task orphaned
+        # (a shared retrieval it joined keeps running for the other callers)
+        if retrieval is not None and not retrieval.done():
+            retrieval.cancel()
+        admission.release(ticket)
 
 @app.post("/assessment_response")
 async def handle_assessment_response(response: AssessmentResponse):
@@ -268,11 +387,16 @@ async def handle_assessment_response(response: AssessmentResponse):
         session = user_sessions[user_id]
         
         if response.accept_assessment:
-            # User accepted assessment
-            return {"status": "assessment_accepted", "message": "Great! Let's proceed with the assessment."}
+            # User accepted assessment; start from a clean set of answers, the
+            # questions were already sent with the suggestion
+            session.assessment_responses = []
+            session_log.append("answers_reset", user_id)
+            return {"status": "assessment_accepted", "message": "Great! Let's proceed with the assessment.",
+                    "questions": chatbot.questions}
         else:
             # User declined assessment
-            session["assessment_declined"] = True
+            session.assessment_declined = True
+            session_log.append("declined", user_id)
             return {"status": "assessment_declined", "message": "No problem! We can continue our conversation. I'm here to help whenever you need support."}
     
     except Exception as e:
@@ -286,7 +410,8 @@ async def get_assessment_questions(user_id: str):
             raise HTTPException(status_code=404, detail="User session not found")
         
         # Reset assessment responses for new attempt
-        user_sessions[user_id]["assessment_responses"] = []
+        user_sessions[user_id].assessment_responses = []
+        session_log.append("answers_reset", user_id)
         
         return {"questions": chatbot.questions}
     
@@ -296,8 +421,9 @@ async def get_assessment_questions(user_id: str):
 
 # 1. Enhanced report generation endpoint with better error handling
 @app.post("/generate_report")
-async def generate_comprehensive_report(request: ReportRequest):
+async def generate_comprehensive_report(request: ReportRequest, http_request: Request):
     """Generate final mental health assessment report"""
+    ticket = await admission.acquire("report", request.user_id, http_request)
     try:
         user_id = request.user_id
         
@@ -311,46 +437,61 @@ async def generate_comprehensive_report(request: ReportRequest):
         
         session = user_sessions[user_id]
         
-        print(f"Session found - chat_count: {session['chat_count']}, assessment_responses: {len(session['assessment_responses'])}")
-        print(f"Chat history length: {len(session['chat_history'])}")
+        print(f"Session found - chat_count: {session.chat_count}, assessment_responses: {len(session.assessment_responses)}")
+        print(f"Chat history length: {len(session.history)}")
         
         # Validate we have data to generate report from
-        if not session["chat_history"] and not session["assessment_responses"]:
+        if not session.history and not session.assessment_responses:
             print("ERROR: No conversation or assessment data found")
             raise HTTPException(status_code=400, detail="No conversation or assessment data found")
         
-        # Prepare FULL chat history for report
-        full_chat_history_str = "\n".join([
-            f"User: {msg['user']}\nAssistant: {msg['assistant']}" 
-            for msg in session["chat_history"]
-        ])
-        
-        # Prepare assessment responses
-        assessment_str = "\n".join([
-            f"Q{resp['question_id'] + 1}: {resp['question']}\nAnswer: {resp['answer']}\n"
-            for resp in session["assessment_responses"]
-        ])
-        
-        print(f"Full chat history length: {len(full_chat_history_str)}")
-        print(f"Assessment responses length: {len(assessment_str)}")
-        
-        # Handle case where no assessment was taken
-        if not assessment_str:
-            assessment_str = "No formal assessment was completed. Analysis based on chat conversation only."
-        
-        # Generate comprehensive report using full history
-        report_prompt = chatbot.report_prompt.format(
-            full_chat_history=full_chat_history_str,
-            assessment_responses=assessment_str
+        report_format = request.format or chatbot.report_format
+        if report_format not in ("markdown", "structured"):
+            raise HTTPException(status_code=400, detail="format must be 'markdown' or 'structured'")
+        structured = report_format == "structured"
+        
+        # Frequency and rating answers are scored locally and sent as scores
+        scores = score_assessment(chatbot.questions, session.assessment_responses)
+        
+        # Generate comprehensive report, keeping all answers and the newest
+        # chat turns that fit the report token budget
+        report_prompt, _ = chatbot.prompt_assembler.build_report_prompt(
+            chatbot.structured_report_prompt if structured else chatbot.report_prompt,
+            chat_history=session.history,
+            assessment_responses=session.assessment_responses,
+            scores=scores
         )
         
-        print("Calling LLM for report generation...")
+        print(f"Calling LLM for {report_format} report generation...")
         print(f"Prompt length: {len(report_prompt)}")
         
+        # Structured reports are sent as sections only, without a markdown copy
+        comprehensive_report = None
+        sections = None
+        risk_level = None
+        structured_fallback = None
         try:
-            report_response = chatbot.llm.invoke([HumanMessage(content=report_prompt)])
-            comprehensive_report = report_response.content
-            print(f"Report generated successfully. Length: {len(comprehensive_report)}")
+            if structured:
+                try:
+                    structured_report = await chatbot.agenerate_structured_report(report_prompt)
+                    sections = report_sections(structured_report)
+                    risk_level = structured_report.risk_level
+                    print(f"Structured report generated successfully. Risk level: {risk_level}")
+                except ReportValidationError as validation_error:
+                    # The user still gets a report: the markdown one, flagged in the response
+                    print(f"Structured report invalid, falling back to markdown: {str(validation_error)}")
+                    structured_fallback = str(validation_error)
+                    report_format = "markdown"
+                    report_prompt, _ = chatbot.prompt_assembler.build_report_prompt(
+                        chatbot.report_prompt,
+                        chat_history=session.history,
+                        assessment_responses=session.assessment_responses,
+                        scores=scores
+                    )
+            if report_format == "markdown":
+                report_response = await chatbot.router.route("report").ainvoke([HumanMessage(content=report_prompt)])
+                comprehensive_report = report_response.content
+                print(f"Report generated successfully. Length: {len(comprehensive_report)}")
         except Exception as llm_error:
             print(f"LLM Error: {str(llm_error)}")
             raise HTTPException(status_code=500, detail=f"LLM processing failed: {str(llm_error)}")
@@ -358,13 +499,18 @@ async def generate_comprehensive_report(request: ReportRequest):
         response_data = {
             "user_id": user_id,
             "report": comprehensive_report,
-            "chat_count": session["chat_count"],
-            "assessment_completed": len(session["assessment_responses"]),
-            "total_chat_exchanges": len(session["chat_history"]),
+            "format": report_format,
+            "structured_fallback": structured_fallback,
+            "sections": sections,
+            "risk_level": risk_level,
+            "scores": scores.to_dict(),
+            "chat_count": session.chat_count,
+            "assessment_completed": len(session.assessment_responses),
+            "total_chat_exchanges": len(session.history),
             "status": "success"
         }
         
-        print(f"Response data prepared. Report length: {len(comprehensive_report)}")
+        print(f"Response data prepared. Format: {report_format}")
         print(f"=== REPORT GENERATION COMPLETED ===")
         
         return response_data
@@ -377,6 +523,8 @@ async def generate_comprehensive_report(request: ReportRequest):
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
+    finally:
+        admission.release(ticket)
 
 # 2. Add a debug endpoint to check session data
 @app.get("/debug_session/{user_id}")
@@ -388,23 +536,53 @@ async def debug_session(user_id: str):
     session = user_sessions[user_id]
     return {
         "user_id": user_id,
-        "chat_count": session["chat_count"],
-        "chat_history_count": len(session["chat_history"]),
-        "assessment_responses_count": len(session["assessment_responses"]),
-        "assessment_declined": session.get("assessment_declined", False),
-        "assessment_offered": session.get("assessment_offered", False),
-        "sample_chat": session["chat_history"][-1] if session["chat_history"] else None,
-        "sample_assessment": session["assessment_responses"][-1] if session["assessment_responses"] else None
+        "chat_count": session.chat_count,
+        "chat_history_count": len(session.history),
+        "assessment_responses_count": len(session.assessment_responses),
+        "assessment_declined": session.assessment_declined,
+        "assessment_offered": session.assessment_offered,
+        "sample_chat": session.history[-1].to_dict() if session.history else None,
+        "sample_assessment": session.assessment_responses[-1] if session.assessment_responses else None
+    }
+
+def record_answer(user_id: str, question_id: int, answer_text: str) -> Dict[str, Any]:
+    """Store a transcribed answer in the session and the event log; returns the answer's result"""
+    session = user_sessions[user_id]
+    
+    answer_data = {
+        "question_id": question_id,
+        "question": chatbot.questions[question_id]["question"],
+        "answer": answer_text
+    }
+    
+    # Replaces an earlier answer to the same question
+    replaced = session.set_answer(answer_data)
+    session_log.append("answer", user_id, answer_data)
+    if replaced:
+        print(f"Updated existing answer for question {question_id}")
+    else:
+        print(f"Added new answer for question {question_id}")
+    
+    print(f"Total assessment responses: {len(session.assessment_responses)}")
+    
+    return {
+        "status": "success",
+        "transcribed_text": answer_text,
+        "question_id": question_id,
+        "score": score_answer(chatbot.questions[question_id], answer_text).score,
+        "total_responses": len(session.assessment_responses)
     }
 
 # 3. Enhanced submit_answer endpoint with better validation
 @app.post("/submit_answer")
 async def submit_audio_answer(
+    http_request: Request,
     user_id: str = Form(...),
     question_id: int = Form(...),
     audio_file: UploadFile = File(...)
 ):
     """Submit audio answer for assessment question"""
+    ticket = await admission.acquire("transcription", user_id, http_request)
     try:
         print(f"Submitting answer for user {user_id}, question {question_id}")
         
@@ -416,48 +594,112 @@ async def submit_audio_answer(
             raise HTTPException(status_code=400, detail="Invalid question ID")
         
         # Convert audio to text
-        answer_text = chatbot.process_audio_to_text(audio_file)
+        answer_text = await chatbot.aprocess_audio_to_text(audio_file)
         
         if not answer_text or answer_text.strip() == "":
             raise HTTPException(status_code=400, detail="Failed to process audio or audio was empty")
         
         # Store the response
-        session = user_sessions[user_id]
-        
-        # Check if answer already exists for this question and update it
-        existing_answer = None
-        for i, resp in enumerate(session["assessment_responses"]):
-            if resp["question_id"] == question_id:
-                existing_answer = i
-                break
-        
-        answer_data = {
-            "question_id": question_id,
-            "question": chatbot.questions[question_id]["question"],
-            "answer": answer_text.strip()
-        }
-        
-        if existing_answer is not None:
-            session["assessment_responses"][existing_answer] = answer_data
-            print(f"Updated existing answer for question {question_id}")
-        else:
-            session["assessment_responses"].append(answer_data)
-            print(f"Added new answer for question {question_id}")
-        
-        print(f"Total assessment responses: {len(session['assessment_responses'])}")
-        
-        return {
-            "status": "success",
-            "transcribed_text": answer_text.strip(),
-            "question_id": question_id,
-            "total_responses": len(session["assessment_responses"])
-        }
+        return record_answer(user_id, question_id, answer_text.strip())
         
     except Exception as e:
         print(f"Error in submit_answer: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission.release(ticket)
+
+@app.post("/submit_answers")
+async def submit_audio_answers(
+    http_request: Request,
+    user_id: str = Form(...),
+    question_ids: List[int] = Form(...),
+    audio_files: List[UploadFile] = File(...)
+):
+    """Submit several audio answers in one request, paired by order. They are transcribed
+    concurrently and each result is streamed back as an NDJSON line as soon as it is stored"""
+    if user_id not in user_sessions:
+        raise HTTPException(status_code=404, detail="User session not found")
+    if len(question_ids) != len(audio_files):
+        raise HTTPException(status_code=400, detail="question_ids and audio_files must have the same length")
+    if len(set(question_ids)) != len(question_ids):
+        raise HTTPException(status_code=400, detail="Duplicate question ID")
+    if any(question_id < 0 or question_id >= len(chatbot.questions) for question_id in question_ids):
+        raise HTTPException(status_code=400, detail="Invalid question ID")
+    # Every recording is one Whisper call: it costs one rate-limit token and
+    # takes its own transcription slot while it runs. Only valid batches are charged.
+    admission.check_rate("transcription", user_id, http_request, cost=len(audio_files))
+    
+    print(f"Submitting {len(question_ids)} answers for user {user_id}")
+    semaphore = asyncio.Semaphore(chatbot.batch_transcription_concurrency)
+    
+    async def transcribe(question_id: int, audio_file: UploadFile) -> Dict[str, Any]:
+        try:
+            async with semaphore:
+                ticket = await admission.acquire_slot("transcription")
+                try:
+                    answer_text = (await chatbot.aprocess_audio_to_text(audio_file)).strip()
+                finally:
+                    admission.release(ticket)
+            if not answer_text:
+                return {"status": "error", "question_id": question_id,
+                        "detail": "Failed to process audio or audio was empty"}
+            if user_id not in user_sessions:
+                return {"status": "error", "question_id": question_id, "detail": "User session not found"}
+            return record_answer(user_id, question_id, answer_text)
+        except HTTPException as e:
+            return {"status": "error", "question_id": question_id, "detail": e.detail}
+        except Exception as e:
+            print(f"Error in submit_answers for question {question_id}: {str(e)}")
+            return {"status": "error", "question_id": question_id, "detail": str(e)}
+    
+    async def results():
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(transcribe(q, f)) for q, f in zip(question_ids, audio_files)]
+        failed = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                failed += result["status"] != "success"
+                yield json.dumps(result) + "\n"
+            session = user_sessions.get(user_id)
+            yield json.dumps({
+                "status": "complete",
+                "submitted": len(tasks),
+                "failed": failed,
+                "total_responses": len(session.assessment_responses) if session else 0,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+            }) + "\n"
+        finally:
+            # Client went away: stop transcriptions that have not finished
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Runtime counters for coalescing, batching, caching and admission control"""
+    return {
+        "admission": admission.snapshot(),
+        "llm_hedging": chatbot.chat_llm.snapshot(),
+        "model_routing": chatbot.router.snapshot(),
+        "session_log": dict(session_log.stats),
+        "chat_degradation": {**chatbot.degradation_stats, "context_cache_entries": len(chatbot.context_cache)},
+        "singleflight": {
+            "retrieval": dict(chatbot.retrieval_flights.stats),
+            "transcription": dict(chatbot.transcription_flights.stats),
+        },
+        "embedding_batcher": chatbot.embedding_batcher.snapshot(),
+        "transcript_cache": dict(chatbot.transcript_cache.stats),
+        "warmup": warmup_state.snapshot(),
+    }
+
+@app.get("/ready")
+async def get_readiness():
+    """503 until the start-up warm-up has finished, then 200"""
+    return FastJSONResponse(warmup_state.snapshot(), status_code=200 if warmup_state.ready else 503)
 
 @app.get("/session_status/{user_id}")
 async def get_session_status(user_id: str):
@@ -468,20 +710,97 @@ async def get_session_status(user_id: str):
     session = user_sessions[user_id]
     return {
         "exists": True,
-        "chat_count": session["chat_count"],
-        "assessment_responses_count": len(session["assessment_responses"]),
-        "ready_for_assessment": session["chat_count"] >= 3 and not session["assessment_declined"],
-        "assessment_declined": session.get("assessment_declined", False),
-        "assessment_offered": session.get("assessment_offered", False)
+        "chat_count": session.chat_count,
+        "assessment_responses_count": len(session.assessment_responses),
+        "ready_for_assessment": session.chat_count >= 3 and not session.assessment_declined,
+        "assessment_declined": session.assessment_declined,
+        "assessment_offered": session.assessment_offered
     }
 
+@app.get("/assessment_scores/{user_id}")
+async def get_assessment_scores(user_id: str):
+    """Locally computed scores of the frequency and rating answers (no LLM call)"""
+    if user_id not in user_sessions:
+        raise HTTPException(status_code=404, detail="User session not found")
+    return score_assessment(chatbot.questions, user_sessions[user_id].assessment_responses).to_dict()
+
 @app.delete("/clear_session/{user_id}")
 async def clear_user_session(user_id: str):
     """Clear user session data"""
     if user_id in user_sessions:
         del user_sessions[user_id]
+        session_log.append("clear", user_id)
         return {"status": "session cleared"}
     return {"status": "session not found"}
 
+def require_admin(http_request: Request):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is set, and then need it in X-Admin-Token"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(http_request.headers.get("x-admin-token", ""), token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/sessions/export")
+async def export_sessions(http_request: Request, format: str = "jsonl.gz"):
+    """Stream every session as gzip JSONL, JSONL or msgpack frames (see session_transfer.py)"""
+    require_admin(http_request)
+    try:
+        check_format(format)
+    except TransferFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def chunks():
+        for chunk in iter_export_chunks(user_sessions, format):
+            yield chunk
+            # Let chat requests run between chunks of a large export
+            await asyncio.sleep(0)
+
+    return StreamingResponse(chunks(), media_type=MEDIA_TYPES[format], headers={
+        "Content-Disposition": f'attachment; filename="sessions.{format}"',
+        "X-Session-Count": str(len(user_sessions)),
+    })
+
+@app.post("/admin/sessions/import")
+async def import_sessions(http_request: Request, format: str = "jsonl.gz", on_conflict: str = "replace"):
+    """Load sessions from a streamed export; on_conflict=skip keeps sessions that already exist"""
+    require_admin(http_request)
+    if on_conflict not in ("replace", "skip"):
+        raise HTTPException(status_code=400, detail="on_conflict must be 'replace' or 'skip'")
+    imported = skipped = 0
+
+    def apply(records):
+        nonlocal imported, skipped
+        for record in records:
+            user_id, session = parse_record(record)
+            if on_conflict == "skip" and user_id in user_sessions:
+                skipped += 1
+                continue
+            user_sessions[user_id] = session
+            session_log.append("restore", user_id, session.to_dict())
+            imported += 1
+
+    try:
+        decoder = RecordDecoder(format)
+        async for chunk in http_request.stream():
+            apply(decoder.feed(chunk))
+        apply(decoder.close())
+    except TransferFormatError as e:
+        # Records before the bad one stay imported
+        raise HTTPException(status_code=400, detail=f"{e} (after {imported} imported, {skipped} skipped)")
+    print(f"Imported {imported} sessions, skipped {skipped}")
+    return {"imported": imported, "skipped": skipped, "total_sessions": len(user_sessions)}
+
+@app.on_event("startup")
+async def start_warmup():
+    """Warm provider connections, indexes and caches in the background; /ready reports when done"""
+    if warmup_state.enabled:
+        warmup_state.task = asyncio.ensure_future(run_warmup(chatbot, warmup_state))
+
+@app.on_event("shutdown")
+def flush_session_log():
+    """Make every logged session mutation durable before exit"""
+    session_log.close()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
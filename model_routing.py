@@ -0,0 +1,151 @@
+"""
+Model routing per task type.
+
+Each task has its own model config, overridable with ROUTE_{TASK}_MODEL,
+ROUTE_{TASK}_TEMPERATURE and ROUTE_{TASK}_MAX_TOKENS:
+  chat                   - ordinary conversational turns, fast 8B model
+  assessment_suggestion  - the turn that offers the assessment, large model
+  report                 - the final report, large model
+  escalated              - chat turns matched by an escalation rule, large model
+Chat turns escalate when the message is long (ROUTING_ESCALATE_MIN_CHARS) or
+mentions a risk keyword (ROUTING_RISK_KEYWORDS), so sensitive conversations
+never get the small model.
+
+Each task also has a backup model for hedged completions (llm_hedging.py),
+overridable with ROUTE_{TASK}_BACKUP_MODEL: the large model backs up chat, and
+the fast model (LLM_BACKUP_MODEL) backs up the large-model tasks. A backup
+that is the task's own model is dropped, so that task is not hedged.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+LARGE_MODEL = "llama-3.3-70b-versatile"
+FAST_MODEL = "llama-3.1-8b-instant"
+
+DEFAULT_RISK_KEYWORDS = (
+    "suicide", "suicidal", "kill myself", "end my life", "want to die", "better off dead",
+    "no reason to live", "self-harm", "self harm", "hurt myself", "cutting myself",
+    "overdose", "abuse", "abused", "hopeless", "can't go on",
+)
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    model: str
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, task: str, default: "ModelConfig") -> "ModelConfig":
+        prefix = f"ROUTE_{task.upper()}_"
+        max_tokens = os.getenv(prefix + "MAX_TOKENS")
+        return cls(
+            model=os.getenv(prefix + "MODEL", default.model),
+            temperature=float(os.getenv(prefix + "TEMPERATURE", str(default.temperature))),
+            max_tokens=int(max_tokens) if max_tokens else default.max_tokens,
+        )
+
+
+def build_groq_llm(config: ModelConfig, **kwargs):
+    """ChatGroq client for a model config (GROQ_BASE_URL points it at a stand-in provider).
+    Every chat client is built here so they share the request timeout and retry settings;
+    kwargs override them."""
+    from langchain_groq import ChatGroq
+
+    settings = {
+        "request_timeout": float(os.getenv("LLM_REQUEST_TIMEOUT_S", "30")),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "2")),
+        **kwargs,
+    }
+    return ChatGroq(
+        model_name=config.model,
+        groq_api_key=os.getenv("GROQ_API_KEY"),
+        groq_api_base=os.getenv("GROQ_BASE_URL"),
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        **settings
+    )
+
+
+DEFAULT_ROUTES = {
+    "chat": ModelConfig(FAST_MODEL),
+    "assessment_suggestion": ModelConfig(LARGE_MODEL),
+    "report": ModelConfig(LARGE_MODEL),
+    "escalated": ModelConfig(LARGE_MODEL),
+}
+
+# Backup model per task; None means LLM_BACKUP_MODEL (the fast model by default)
+DEFAULT_BACKUPS = {
+    "chat": LARGE_MODEL,
+    "assessment_suggestion": None,
+    "report": None,
+    "escalated": None,
+}
+
+
+class ModelRouter:
+    def __init__(self, build_llm: Callable[[ModelConfig], object]):
+        self.build_llm = build_llm
+        self.routes = {task: ModelConfig.from_env(task, default) for task, default in DEFAULT_ROUTES.items()}
+        fast_backup = os.getenv("LLM_BACKUP_MODEL", FAST_MODEL)
+        self.backups: Dict[str, Optional[ModelConfig]] = {}
+        for task, config in self.routes.items():
+            model = os.getenv(f"ROUTE_{task.upper()}_BACKUP_MODEL", DEFAULT_BACKUPS[task] or fast_backup)
+            # The backup answers the same prompt, so it keeps the task's sampling settings
+            self.backups[task] = ModelConfig(model, config.temperature, config.max_tokens) if model != config.model else None
+        self.escalation_enabled = os.getenv("ROUTING_ESCALATION", "true").lower() != "false"
+        self.escalate_min_chars = int(os.getenv("ROUTING_ESCALATE_MIN_CHARS", "600"))
+        keywords = os.getenv("ROUTING_RISK_KEYWORDS")
+        keywords = [k.strip() for k in keywords.split(",") if k.strip()] if keywords else DEFAULT_RISK_KEYWORDS
+        self.risk_pattern = re.compile(r"\b(" + "|".join(re.escape(k.lower()) for k in keywords) + r")\b")
+        self._llms: Dict[ModelConfig, object] = {}
+        self.stats = {task: 0 for task in self.routes}
+        self.stats.update({"escalated_long_message": 0, "escalated_risk_keyword": 0})
+
+    def _llm(self, config: ModelConfig):
+        llm = self._llms.get(config)
+        if llm is None:
+            llm = self._llms[config] = self.build_llm(config)
+        return llm
+
+    def llm_for(self, task: str):
+        """Client for a task's model config; tasks sharing a config share the client"""
+        return self._llm(self.routes[task])
+
+    def backup_for(self, task: str):
+        """Client for a task's backup model, or None when the task is not hedged"""
+        config = self.backups[task]
+        return self._llm(config) if config is not None else None
+
+    def escalation_reason(self, message: str) -> Optional[str]:
+        if not self.escalation_enabled:
+            return None
+        if len(message) >= self.escalate_min_chars:
+            return "long_message"
+        if self.risk_pattern.search(message.lower()):
+            return "risk_keyword"
+        return None
+
+    def route_chat(self, message: str, suggest_assessment: bool) -> Tuple[str, object]:
+        """Pick the task route for a chat turn; returns (route name, llm client)"""
+        reason = self.escalation_reason(message)
+        if reason is not None:
+            task = "escalated"
+            self.stats[f"escalated_{reason}"] += 1
+        else:
+            task = "assessment_suggestion" if suggest_assessment else "chat"
+        self.stats[task] += 1
+        return task, self.llm_for(task)
+
+    def route(self, task: str):
+        self.stats[task] += 1
+        return self.llm_for(task)
+
+    def snapshot(self) -> Dict:
+        return {
+            "routes": {task: config.model for task, config in self.routes.items()},
+            "backups": {task: config.model if config else None for task, config in self.backups.items()},
+            "counts": dict(self.stats),
+        }
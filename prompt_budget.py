@@ -0,0 +1,259 @@
+"""
+Token-budgeted prompt assembly for the chat and report prompts.
+
+Prompts are packed into a fixed token budget with these priority rules:
+  * the template itself and the user message are always kept
+  * chat prompt: retrieved documents are truncated first (lowest ranked doc
+    first), then the oldest of the recent exchanges are dropped
+  * report prompt: assessment answers are kept, then the newest chat turns;
+    older turns are dropped and replaced with an omission note. Answers the
+    local scorer (scoring.py) could score keep their transcript and get a
+    score line, after one compact JSON line of category and total scores
+
+Tokens are counted locally: with tiktoken when it is installed and its
+encoding is available offline, otherwise with a regex approximation of BPE.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scoring import AssessmentScores
+
+CHAT_PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "2048"))
+REPORT_PROMPT_TOKEN_BUDGET = int(os.getenv("REPORT_PROMPT_TOKEN_BUDGET", "6000"))
+# Context tokens protected from being squeezed out by long history
+CHAT_CONTEXT_RESERVE_TOKENS = int(os.getenv("CHAT_CONTEXT_RESERVE_TOKENS", "384"))
+PROMPT_TOKENIZER_ENCODING = os.getenv("PROMPT_TOKENIZER_ENCODING", "cl100k_base")
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+class TokenCounter:
+    """Counts and truncates text in tokens without calling any remote service"""
+
+    def __init__(self, encoding_name: str = PROMPT_TOKENIZER_ENCODING):
+        self.encoding = None
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception:
+            # tiktoken missing or its encoding file not cached locally
+            self.encoding = None
+        self.name = f"tiktoken:{encoding_name}" if self.encoding else "regex-approx"
+
+    @staticmethod
+    def _approx_pieces(text: str) -> List[Tuple[int, int]]:
+        """Approximate BPE pieces as (start, end) spans; long words cost ~1 token per 4 chars"""
+        pieces = []
+        for match in _TOKEN_PATTERN.finditer(text):
+            start, end = match.span()
+            while end - start > 6:
+                pieces.append((start, start + 4))
+                start += 4
+            pieces.append((start, end))
+        return pieces
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(self._approx_pieces(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens, including the trailing ellipsis marker"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            if max_tokens <= 2:
+                return ""
+            return self.encoding.decode(tokens[:max_tokens - 2]).rstrip() + " ..."
+        pieces = self._approx_pieces(text)
+        if len(pieces) <= max_tokens:
+            return text
+        if max_tokens <= 3:
+            return ""
+        return text[:pieces[max_tokens - 4][1]].rstrip() + " ..."
+
+
+def format_exchange(exchange: Dict) -> str:
+    return f"User: {exchange['user']}\nAssistant: {exchange['assistant']}"
+
+
+def format_assessment_responses(responses: List[Dict], scores: Optional[AssessmentScores] = None) -> str:
+    item_scores = {a.question_id: a.score for a in scores.answers if a.score is not None} if scores else {}
+    lines = []
+    for resp in responses:
+        line = f"Q{resp['question_id'] + 1}: {resp['question']}\nAnswer: {resp['answer']}\n"
+        if resp["question_id"] in item_scores:
+            line += f"Local score: {item_scores[resp['question_id']]}/3\n"
+        lines.append(line)
+    if item_scores:
+        lines.insert(0, f"Local scores (0-3 per item, higher is more severe): {scores.prompt_json()}\n")
+    return "\n".join(lines)
+
+
+class PromptAssembler:
+    """Packs context, history and assessment answers into a token budget"""
+
+    def __init__(self, counter: Optional[TokenCounter] = None,
+                 chat_budget: int = CHAT_PROMPT_TOKEN_BUDGET,
+                 report_budget: int = REPORT_PROMPT_TOKEN_BUDGET,
+                 context_reserve: int = CHAT_CONTEXT_RESERVE_TOKENS,
+                 verbose: bool = True):
+        self.counter = counter or TokenCounter()
+        self.chat_budget = chat_budget
+        self.report_budget = report_budget
+        self.context_reserve = context_reserve
+        # Print a stats line per prompt (batch tools turn this off)
+        self.verbose = verbose
+
+    def _history_items(self, exchanges) -> Tuple[List[str], List[int]]:
+        """Rendered exchanges and their token costs. Session records (sessions.Exchange)
+        are rendered once and cache their count; plain dicts are formatted here."""
+        items: List[str] = []
+        costs: List[int] = []
+        for exchange in exchanges:
+            if isinstance(exchange, dict):
+                text = format_exchange(exchange)
+                tokens = self.counter.count(text)
+            else:
+                text = exchange.rendered
+                if exchange.tokens is None:
+                    exchange.tokens = self.counter.count(text)
+                tokens = exchange.tokens
+            items.append(text)
+            costs.append(tokens + 1)
+        return items, costs
+
+    def _pack_newest(self, items: List[str], budget: int,
+                     costs: Optional[List[int]] = None) -> Tuple[List[str], int]:
+        """Keep the newest items that fit; the newest one is truncated rather than dropped"""
+        kept: List[str] = []
+        used = 0
+        for index in range(len(items) - 1, -1, -1):
+            item = items[index]
+            cost = costs[index] if costs is not None else self.counter.count(item) + 1
+            if used + cost <= budget:
+                kept.append(item)
+                used += cost
+            elif not kept and budget > 0:
+                kept.append(self.counter.truncate(item, budget - 1))
+                used = budget
+                break
+            else:
+                break
+        kept.reverse()
+        return kept, used
+
+    def _pack_ranked(self, docs: List[str], budget: int) -> Tuple[List[str], int]:
+        """Keep documents in rank order, truncating the first one that overflows"""
+        kept: List[str] = []
+        cut = 0
+        remaining = budget
+        for doc in docs:
+            cost = self.counter.count(doc) + 1
+            if cost <= remaining:
+                kept.append(doc)
+                remaining -= cost
+                continue
+            # Anything not kept whole counts as truncated, dropped docs included
+            cut += 1
+            if remaining > 16:
+                kept.append(self.counter.truncate(doc, remaining - 1))
+            remaining = 0
+        return kept, cut
+
+    def build_chat_prompt(self, template, docs: List[str], recent_exchanges: Sequence,
+                          user_message: str, chat_count: int, assessment_declined: bool) -> Tuple[str, Dict]:
+        """Format the chat prompt within the chat token budget"""
+        fixed_prompt = template.format(
+            context="", chat_history="", user_message=user_message,
+            chat_count=chat_count, assessment_declined=assessment_declined,
+        )
+        fixed_tokens = self.counter.count(fixed_prompt)
+        if fixed_tokens > self.chat_budget:
+            # A pathological user message: keep its head so the template still fits
+            overflow = fixed_tokens - self.chat_budget
+            user_message = self.counter.truncate(user_message, max(self.counter.count(user_message) - overflow, 64))
+            fixed_tokens = self.counter.count(template.format(
+                context="", chat_history="", user_message=user_message,
+                chat_count=chat_count, assessment_declined=assessment_declined,
+            ))
+        available = max(self.chat_budget - fixed_tokens, 0)
+
+        doc_tokens = sum(self.counter.count(doc) + 1 for doc in docs)
+        history_items, history_costs = self._history_items(recent_exchanges)
+        history_budget = max(available - min(self.context_reserve, doc_tokens), 0)
+        history, history_used = self._pack_newest(history_items, history_budget, history_costs)
+
+        kept_docs, truncated_docs = self._pack_ranked(docs, available - history_used)
+
+        prompt = template.format(
+            context="\n".join(kept_docs),
+            chat_history="\n".join(history),
+            user_message=user_message,
+            chat_count=chat_count,
+            assessment_declined=assessment_declined,
+        )
+        stats = {
+            "prompt_tokens": self.counter.count(prompt),
+            "budget": self.chat_budget,
+            "context_budget_tokens": available - history_used,
+            "docs_kept": len(kept_docs),
+            "docs_total": len(docs),
+            "docs_truncated": truncated_docs,
+            "history_turns_kept": len(history),
+            "history_turns_total": len(history_items),
+        }
+        if self.verbose:
+            print(f"Chat prompt: {stats['prompt_tokens']}/{self.chat_budget} tokens ({self.counter.name}), "
+                  f"docs {len(kept_docs)}/{len(docs)} (truncated {truncated_docs}), "
+                  f"history {len(history)}/{len(history_items)} turns")
+        return prompt, stats
+
+    def build_report_prompt(self, template, chat_history: Sequence,
+                            assessment_responses: List[Dict],
+                            scores: Optional[AssessmentScores] = None) -> Tuple[str, Dict]:
+        """Format the report prompt within the report token budget"""
+        assessment_str = format_assessment_responses(assessment_responses, scores)
+        if not assessment_str:
+            assessment_str = "No formal assessment was completed. Analysis based on chat conversation only."
+
+        fixed_tokens = self.counter.count(template.format(full_chat_history="", assessment_responses=""))
+        available = max(self.report_budget - fixed_tokens, 0)
+
+        # Answers are short and the core of the report; only cap them if they
+        # would leave less than half the budget for the conversation
+        assessment_tokens = self.counter.count(assessment_str)
+        if assessment_tokens > available // 2 and chat_history:
+            assessment_str = self.counter.truncate(assessment_str, available // 2)
+            assessment_tokens = self.counter.count(assessment_str)
+
+        history_items, history_costs = self._history_items(chat_history)
+        # Leave room for the omission note
+        history, _ = self._pack_newest(history_items, max(available - assessment_tokens - 16, 0), history_costs)
+        omitted = len(history_items) - len(history)
+        if omitted:
+            history.insert(0, f"[{omitted} earlier exchanges omitted for length]")
+
+        prompt = template.format(
+            full_chat_history="\n".join(history),
+            assessment_responses=assessment_str,
+        )
+        stats = {
+            "prompt_tokens": self.counter.count(prompt),
+            "budget": self.report_budget,
+            "assessment_tokens": assessment_tokens,
+            "scored_answers": len(scores.scored_ids) if scores is not None else 0,
+            "history_turns_kept": len(history_items) - omitted,
+            "history_turns_total": len(history_items),
+        }
+        if self.verbose:
+            print(f"Report prompt: {stats['prompt_tokens']}/{self.report_budget} tokens ({self.counter.name}), "
+                  f"history {stats['history_turns_kept']}/{len(history_items)} turns, "
+                  f"assessment {assessment_tokens} tokens")
+        return prompt, stats
@@ -0,0 +1,105 @@
+"""
+Prompt templates shared by the API (main.py) and the offline tools.
+
+The template text is sent to the LLM verbatim, so edits here change every
+generated chat reply and report; batch_reports.py records a hash of
+REPORT_PROMPT with each report it writes.
+STRUCTURED_REPORT_PROMPT embeds the JSON schema from report_schema.py.
+"""
+from langchain.prompts import PromptTemplate
+
+from report_schema import REPORT_JSON_SCHEMA
+
+# Chat prompt template (only last 3 conversations)
+CHAT_PROMPT = PromptTemplate(
+    input_variables=["context", "chat_history", "user_message", "chat_count", "assessment_declined"],
+    template="""
+            You are a compassionate mental health assistant. Use the following context to provide helpful, supportive responses.
+            
+            Context from knowledge base:
+            {context}
+            
+            Previous conversation (last 3 exchanges):
+            {chat_history}
+            
+            Current chat count: {chat_count}
+            Assessment previously declined: {assessment_declined}
+            
+            User message: {user_message}
+            
+            Guidelines:
+            1. Provide a supportive, informative response that is conversational and empathetic.
+            2. If this is the 3rd or 4th interaction AND assessment hasn't been declined, gently suggest taking a mental health assessment to get more personalized insights.
+            3. If the user has already declined the assessment, continue with regular supportive conversation without mentioning assessment again.
+            4. Keep your response natural and don't force the assessment suggestion.
+            5. The assessment suggestion should feel organic to the conversation flow.
+            6. Keep your responses consize and medium to short sized.
+            
+            Response:"""
+)
+
+# Report generation prompt (full history)
+REPORT_PROMPT = PromptTemplate(
+    input_variables=["full_chat_history", "assessment_responses"],
+    template="""
+            Generate a comprehensive mental health assessment report based on the following information:
+            
+            Complete Chat History:
+            {full_chat_history}
+            
+            Assessment Responses:
+            {assessment_responses}
+            
+            Please provide a structured report with the following sections:
+            
+            # Mental Health Assessment Report
+            
+            ## Executive Summary
+            Brief overview of the assessment findings and overall mental health status
+            
+            ## Chat Analysis
+            Analysis of conversation patterns, concerns expressed, and emotional themes throughout the entire conversation
+            
+            ## Assessment Results
+            Detailed analysis of questionnaire responses with specific insights
+            
+            ## Risk Assessment
+            Evaluation of potential mental health risks (Low/Medium/High) with specific reasoning
+            
+            ## Key Findings
+            Most significant observations and patterns identified
+            
+            ## Recommendations
+            Specific, actionable recommendations for mental health support and self-care
+            
+            ## Professional Resources
+            Suggested professional resources, therapy options, and next steps
+            
+            ## Self-Care Strategies
+            Practical daily strategies and coping mechanisms
+            
+            Keep the tone professional yet compassionate. Focus on providing actionable insights and hope.
+            """
+)
+
+# Structured report mode: same sections, returned as JSON matching report_schema.StructuredReport
+STRUCTURED_REPORT_PROMPT = PromptTemplate(
+    input_variables=["full_chat_history", "assessment_responses"],
+    partial_variables={"json_schema": REPORT_JSON_SCHEMA},
+    template="""
+            Generate a comprehensive Mental Health Assessment Report based on the following information:
+            
+            Complete Chat History:
+            {full_chat_history}
+            
+            Assessment Responses:
+            {assessment_responses}
+            
+            Reply with a single JSON object and nothing else. It must match this JSON schema:
+            {json_schema}
+            
+            Write each section as markdown text (paragraphs or bullet lists, no headings). risk_level is the overall risk (Low, Medium or High) and risk_assessment gives the specific reasoning for it.
+            
+            Keep the tone professional yet compassionate. Focus on providing actionable insights and hope.
+            """
+)
@@ -0,0 +1,63 @@
+"""
+Structured (JSON) form of the assessment report.
+
+In structured mode the report LLM is put in JSON mode and given the schema
+of StructuredReport, one string per report section plus a machine-readable
+risk level. The reply is validated here before it is returned, and the
+client receives the sections as a list instead of one markdown document.
+"""
+import json
+from typing import Dict, List, Literal, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+# (field, heading) in report order; headings match REPORT_PROMPT
+REPORT_SECTIONS: List[Tuple[str, str]] = [
+    ("executive_summary", "Executive Summary"),
+    ("chat_analysis", "Chat Analysis"),
+    ("assessment_results", "Assessment Results"),
+    ("risk_assessment", "Risk Assessment"),
+    ("key_findings", "Key Findings"),
+    ("recommendations", "Recommendations"),
+    ("professional_resources", "Professional Resources"),
+    ("self_care_strategies", "Self-Care Strategies"),
+]
+
+
+class StructuredReport(BaseModel):
+    executive_summary: str = Field(min_length=1, description="Brief overview of the assessment findings and overall mental health status")
+    chat_analysis: str = Field(min_length=1, description="Conversation patterns, concerns expressed and emotional themes")
+    assessment_results: str = Field(min_length=1, description="Analysis of the questionnaire responses with specific insights")
+    risk_level: Literal["Low", "Medium", "High"] = Field(description="Overall risk level")
+    risk_assessment: str = Field(min_length=1, description="Reasoning behind the risk level")
+    key_findings: str = Field(min_length=1, description="Most significant observations and patterns")
+    recommendations: str = Field(min_length=1, description="Specific, actionable recommendations for support and self-care")
+    professional_resources: str = Field(min_length=1, description="Professional resources, therapy options and next steps")
+    self_care_strategies: str = Field(min_length=1, description="Practical daily strategies and coping mechanisms")
+
+
+# Compact schema text embedded in STRUCTURED_REPORT_PROMPT
+REPORT_JSON_SCHEMA = json.dumps(StructuredReport.model_json_schema(), separators=(",", ":"))
+
+
+class ReportValidationError(ValueError):
+    """The LLM reply is not a valid StructuredReport"""
+
+
+def parse_structured_report(text: str) -> StructuredReport:
+    # Tolerate a markdown code fence around the JSON object
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ReportValidationError("Reply contains no JSON object")
+    try:
+        return StructuredReport.model_validate_json(text[start:end + 1])
+    except ValidationError as e:
+        first = e.errors()[0]
+        location = ".".join(str(part) for part in first["loc"]) or "reply"
+        raise ReportValidationError(f"{e.error_count()} schema errors, first at {location}: {first['msg']}")
+
+
+def report_sections(report: StructuredReport) -> List[Dict[str, str]]:
+    """Sections in report order, as {"key", "title", "content"} dicts for the frontend"""
+    return [{"key": key, "title": title, "content": getattr(report, key)} for key, title in REPORT_SECTIONS]
+
@@ -0,0 +1,256 @@
+"""
+Local, deterministic scoring of frequency and rating answers.
+
+Transcribed answers to "frequency" questions are mapped onto the PHQ/GAD item
+scale (0 not at all, 1 several days, 2 more than half the days, 3 nearly
+every day) and "rating" answers onto the same 0-3 severity scale, from
+keyword cues and explicit numbers ("five out of ten", "3 days a week").
+
+Every cue in an answer counts. A cue preceded by a negator in the same clause
+("not all the time", "I don't feel down very often") narrows the score to a
+range instead of naming it, and the answer's score is what all its cues agree
+on. Answers whose cues contradict each other, descriptive and open-ended
+answers, and answers with no cue stay unscored and are left to the LLM.
+
+Category and overall results are banded on the mean item score, using the
+PHQ-9 cut-points (GAD-7 for anxiety) divided by the number of items. The
+scores are indicative screening data, not a diagnosis.
+"""
+import json
+import re
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple
+
+QUESTIONNAIRE_PATH = "questionnaire.json"
+# Bump when the rules or bands change, so batch_reports regenerates old reports
+SCORING_VERSION = "3"
+SCORED_TYPES = ("frequency", "rating")
+ITEM_MAX = 3
+
+_NUMBER_WORDS = {"zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                 "seven": 7, "eight": 8, "nine": 9, "ten": 10, "once": 1, "twice": 2}
+_NUMBER = r"(\d+(?:\.\d+)?|" + "|".join(_NUMBER_WORDS) + r")"
+
+# Cues are found in table order and cannot overlap, so longer phrases come
+# before the words inside them ("hardly ever" before "ever", "never stop"
+# before "never"). A score of None is computed from the match (day counts).
+_FREQUENCY_CUES: List[Tuple[Optional[int], Pattern]] = [(score, re.compile(pattern)) for score, pattern in [
+    (0, r"\bnot at all\b|\bnone of the time\b|\bnot really\b"),
+    (3, r"\bnever (?:stops?|ends?|goes away|lets up)\b|\bnot a day goes by\b"),
+    (1, r"\b(?:hardly|barely|almost) ever\b|\balmost never\b|\brarely\b|\bseldom\b"),
+    (2, r"\bmore than half\b|\b(?:about |around |roughly )?half (?:of )?the (?:time|days)\b"
+        r"|\bevery other day\b|\bmost (?:of the )?days\b|\bmost of the time\b"),
+    (3, r"\b(?:nearly|almost) (?:every ?day|always|all the time|daily)\b|\bevery ?day\b|\ball the time\b"
+        r"|\bconstant(?:ly)?\b|\balways\b|\bdaily\b"),
+    (2, r"\boften\b|\bfrequently\b|\ba lot\b|\bregularly\b"),
+    (1, r"\bseveral days\b|\bsome days\b|\bsometimes\b|\boccasionally\b|\bonce or twice\b"
+        r"|\ba (?:few|couple of) (?:days|times)\b"),
+    (0, r"\bnever\b"),
+    (None, _NUMBER + r"(?:\s*(?:or|to|-)\s*" + _NUMBER + r")?\s*(?:days?|times?)"
+           r"(?:\s*(?:a|per|each|every)\s*(week))?"),
+]]
+
+# "Not at all" answers "how well ...?" only as a clause of its own: followed by a
+# word ("not at all tired", "I'm not at all worried") it negates that word instead
+_RATING_CUES: List[Tuple[Optional[int], Pattern]] = [(score, re.compile(pattern)) for score, pattern in [
+    (3, r"\b(?:very|extremely|really) (?:low|poor(?:ly)?|bad(?:ly)?)\b|\bterrible\b|\bawful\b|\bno energy\b"
+        r"|\bexhausted\b|\bcan(?:no|')?t (?:concentrate|focus)\b"
+        r"|(?:^|(?<=[,.;:!?]))\s*not at all(?=\s*(?:$|[,.;:!?]))"),
+    (1, r"\bcould be better\b"),
+    (2, r"\blow\b|\bpoor(?:ly)?\b|\bbad(?:ly)?\b|\bbelow average\b|\bstruggl\w*|\bhard\b|\bdifficult\w*"),
+    (1, r"\bokay\b|\bok\b|\baverage\b|\bmoderate\w*|\bso-so\b|\bfair(?:ly)?\b|\bdecent\b|\bmixed\b"),
+    (0, r"\bgood\b|\bwell\b|\bgreat\b|\bexcellent\b|\bhigh\b|\bfine\b|\bnormal\b"),
+]]
+
+# A negated cue allows a range of scores, and names one when it is the only
+# cue: "not often" is 1, while "not every day" alone could be 1 or 2
+_NEGATED_FREQUENCY = {0: ({1, 2, 3}, None), 1: ({0}, 0), 2: ({0, 1}, 1), 3: ({0, 1, 2}, None)}
+_NEGATED_RATING = {0: ({1, 2}, 2), 1: ({2, 3}, 2), 2: ({0, 1}, 1), 3: ({0, 1, 2}, None)}
+
+# A negator negates a cue within the next few words of the same clause
+_NEGATOR = re.compile(r"not|no|never|hardly|barely|cannot|\w+n't|(?:do|does|did|is|are|was|were|has|have|had|ca|wo|could|would)nt")
+_CLAUSE_BREAK = re.compile(r"[,.;:!?]|\b(?:but|though|although|and|just)\b")
+NEGATION_WINDOW_WORDS = 4
+
+_RATING_NUMBER = re.compile(_NUMBER + r"\s*(?:out of|/)\s*" + _NUMBER)
+
+# (upper bound of the mean item score, band); anything higher is the last band
+_BANDS = {
+    "phq": [(5 / 9, "minimal"), (10 / 9, "mild"), (15 / 9, "moderate"), (20 / 9, "moderately severe"), (None, "severe")],
+    "gad": [(5 / 7, "minimal"), (10 / 7, "mild"), (15 / 7, "moderate"), (None, "severe")],
+}
+_CATEGORY_SCALES = {"anxiety": "gad"}
+
+
+@dataclass(frozen=True)
+class AnswerScore:
+    question_id: int
+    category: str
+    type: str
+    score: Optional[int]
+    evidence: Optional[str] = None
+
+
+@dataclass
+class AssessmentScores:
+    answers: List[AnswerScore]
+    categories: Dict[str, Dict]
+    total: int
+    max_total: int
+    band: Optional[str]
+
+    @property
+    def scored_ids(self) -> set:
+        return {a.question_id for a in self.answers if a.score is not None}
+
+    def to_dict(self) -> Dict:
+        return {
+            "answers": [asdict(a) for a in self.answers],
+            "categories": self.categories,
+            "total": self.total,
+            "max_total": self.max_total,
+            "band": self.band,
+        }
+
+    def prompt_json(self) -> str:
+        """Compact summary for the report prompt: category subtotals and total"""
+        summary = {
+            "categories": {name: f"{c['score']}/{c['max']} {c['band']}" for name, c in self.categories.items()},
+            "total": f"{self.total}/{self.max_total} {self.band}",
+        }
+        return json.dumps(summary, separators=(",", ":"))
+
+
+def _number(token: str) -> float:
+    return float(_NUMBER_WORDS.get(token, token))
+
+
+def _days_to_item_score(days: float) -> int:
+    """Days out of the last two weeks onto the PHQ item scale"""
+    if days < 1:
+        return 0
+    if days < 7:
+        return 1
+    if days < 12:
+        return 2
+    return 3
+
+
+def _negator_start(text: str, cue_start: int) -> Optional[int]:
+    """Where the negator of the cue starting at cue_start begins, if it is negated"""
+    clause_start = 0
+    for brk in _CLAUSE_BREAK.finditer(text, 0, cue_start):
+        clause_start = brk.end()
+    words = list(re.finditer(r"\S+", text[clause_start:cue_start]))[-NEGATION_WINDOW_WORDS:]
+    for word in words:
+        if _NEGATOR.fullmatch(word.group(0).strip("\"'")):
+            return clause_start + word.start()
+    return None
+
+
+def _frequency_cue_score(match) -> int:
+    low = _number(match.group(1))
+    high = _number(match.group(2)) if match.group(2) else low
+    days = (low + high) / 2
+    if match.group(3):  # per week, over the two weeks asked about
+        days *= 2
+    return _days_to_item_score(min(days, 14))
+
+
+def _resolve_cues(cues: List[Tuple[Optional[int], Pattern]], negated: Dict[int, Tuple[set, Optional[int]]],
+                  text: str, cue_score=None) -> Tuple[Optional[int], Optional[str]]:
+    """The score every cue in text agrees on, with the cues as evidence; None when they conflict"""
+    found = []
+    for score, pattern in cues:
+        for match in pattern.finditer(text):
+            if any(match.start() < end and start < match.end() for start, end, _, _ in found):
+                continue
+            found.append((match.start(), match.end(), cue_score(match) if score is None else score,
+                          _negator_start(text, match.start())))
+    if not found:
+        return None, None
+
+    allowed, defaults, evidence = set(range(ITEM_MAX + 1)), set(), []
+    for start, end, score, negator in sorted(found):
+        if negator is None:
+            allowed &= {score}
+            evidence.append(text[start:end].strip())
+        else:
+            scores, default = negated[score]
+            allowed &= scores
+            if default is not None:
+                defaults.add(default)
+            evidence.append(text[negator:end])
+    if len(allowed) != 1:
+        # Only negated cues left several scores open: take their single shared default
+        allowed &= defaults
+    if len(allowed) != 1:
+        return None, None
+    return allowed.pop(), "; ".join(evidence)
+
+
+def score_frequency(text: str) -> Tuple[Optional[int], Optional[str]]:
+    return _resolve_cues(_FREQUENCY_CUES, _NEGATED_FREQUENCY, text, _frequency_cue_score)
+
+
+def score_rating(text: str, higher_is_better: bool = True) -> Tuple[Optional[int], Optional[str]]:
+    match = _RATING_NUMBER.search(text)
+    if match:
+        value, scale = _number(match.group(1)), _number(match.group(2))
+        if scale > 0 and 0 <= value <= scale:
+            ratio = value / scale if higher_is_better else 1 - value / scale
+            score = 0 if ratio >= 0.8 else 1 if ratio >= 0.6 else 2 if ratio >= 0.3 else 3
+            return score, match.group(0)
+    score, evidence = _resolve_cues(_RATING_CUES, _NEGATED_RATING, text)
+    if score is not None and not higher_is_better:
+        score = ITEM_MAX - score
+    return score, evidence
+
+
+def score_answer(question: Dict, answer: str) -> AnswerScore:
+    kind = question.get("type", "")
+    text = answer.lower()
+    if kind == "frequency":
+        score, evidence = score_frequency(text)
+    elif kind == "rating":
+        score, evidence = score_rating(text, question.get("higher_is_better", True))
+    else:
+        score, evidence = None, None
+    return AnswerScore(question["question_id"], question.get("category", "other"), kind, score, evidence)
+
+
+def band_for(mean_item_score: float, scale: str = "phq") -> str:
+    for upper, band in _BANDS[scale]:
+        if upper is None or mean_item_score < upper:
+            return band
+    return _BANDS[scale][-1][1]
+
+
+def score_assessment(questions: Sequence[Dict], responses: Sequence[Dict]) -> AssessmentScores:
+    """Score every answer to a frequency or rating question, with category subtotals"""
+    by_id = {q["question_id"]: q for q in questions}
+    answers = [score_answer(by_id[r["question_id"]], r["answer"]) for r in responses
+               if r["question_id"] in by_id and by_id[r["question_id"]].get("type") in SCORED_TYPES]
+
+    subtotals: Dict[str, List[int]] = {}
+    for answer in answers:
+        if answer.score is not None:
+            subtotals.setdefault(answer.category, []).append(answer.score)
+    categories = {
+        name: {"score": sum(scores), "max": ITEM_MAX * len(scores),
+               "band": band_for(sum(scores) / len(scores), _CATEGORY_SCALES.get(name, "phq"))}
+        for name, scores in subtotals.items()
+    }
+    all_scores = [score for scores in subtotals.values() for score in scores]
+    return AssessmentScores(
+        answers=answers,
+        categories=categories,
+        total=sum(all_scores),
+        max_total=ITEM_MAX * len(all_scores),
+        band=band_for(sum(all_scores) / len(all_scores)) if all_scores else None,
+    )
+
+
+def load_questionnaire(path: str = QUESTIONNAIRE_PATH) -> List[Dict]:
+    with open(path, "r") as f:
+        return json.load(f)
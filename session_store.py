@@ -0,0 +1,275 @@
+"""
+Append-only event log of session mutations, with snapshots and compaction.
+
+Enabled by SESSION_LOG_DIR. Every mutation main.py makes to a session is
+appended as one JSON line ([op, user_id, *args]) to the current segment
+(events.<seq>.jsonl); a background thread flushes and fsyncs the segment at
+most every SESSION_LOG_FSYNC_MS, so a burst of requests shares one fsync.
+The lock append() takes only covers buffer writes, flushes and segment
+swaps; fsyncs run outside it, so the event loop never waits on the disk.
+
+After SESSION_SNAPSHOT_EVERY events the log rotates to a new segment and the
+state as of that point is written to snapshot.<seq>.jsonl in the background;
+older segments and snapshots are then deleted. Startup loads the newest
+snapshot and replays only the segments after it. A torn last line from a
+crash is skipped.
+"""
+import glob
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sessions import Session
+
+_SEGMENT_RE = re.compile(r"events\.(\d+)\.jsonl$")
+_SNAPSHOT_RE = re.compile(r"snapshot\.(\d+)\.jsonl$")
+
+
+def apply_event(sessions: Dict[str, Session], event: List):
+    """Replay one logged mutation onto the session map"""
+    op, user_id = event[0], event[1]
+    if op == "clear":
+        sessions.pop(user_id, None)
+        return
+    if op == "restore":
+        # Whole session replaced by an import
+        sessions[user_id] = Session.from_dict(event[2])
+        return
+    session = sessions.get(user_id)
+    if session is None:
+        session = sessions[user_id] = Session()
+    if op == "count":
+        session.chat_count += 1
+    elif op == "exchange":
+        session.add_exchange(event[2], event[3])
+    elif op == "offered":
+        session.assessment_offered = True
+        session.assessment_suggestion_count += 1
+    elif op == "declined":
+        session.assessment_declined = True
+    elif op == "answers_reset":
+        session.assessment_responses = []
+    elif op == "answer":
+        session.set_answer(event[2])
+    else:
+        raise ValueError(f"Unknown session event: {op}")
+
+
+def _capture(session: Session) -> Tuple:
+    """Cheap point-in-time copy; exchanges and answers are never mutated in place"""
+    return (session.chat_count, session.assessment_declined, session.assessment_offered,
+            session.assessment_suggestion_count, list(session.assessment_responses), list(session.history))
+
+
+def _snapshot_record(user_id: str, captured: Tuple) -> Dict:
+    chat_count, declined, offered, suggestion_count, responses, history = captured
+    return {
+        "user_id": user_id,
+        "chat_history": [exchange.to_dict() for exchange in history],
+        "chat_count": chat_count,
+        "assessment_responses": responses,
+        "assessment_declined": declined,
+        "assessment_suggestion_count": suggestion_count,
+        "assessment_offered": offered,
+    }
+
+
+def _files(directory: str, pattern: "re.Pattern") -> List[Tuple[int, str]]:
+    found = []
+    for path in glob.glob(os.path.join(directory, "*.jsonl")):
+        match = pattern.search(os.path.basename(path))
+        if match:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def _read_lines(path: str):
+    """JSON lines of a file, stopping at a torn or corrupt line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+class SessionEventLog:
+    def __init__(self, sessions: Dict[str, Session], directory: Optional[str] = None,
+                 fsync_ms: Optional[float] = None, snapshot_every: Optional[int] = None):
+        self.sessions = sessions
+        self.directory = directory if directory is not None else os.getenv("SESSION_LOG_DIR") or None
+        self.enabled = self.directory is not None
+        self.fsync_s = (fsync_ms if fsync_ms is not None else float(os.getenv("SESSION_LOG_FSYNC_MS", "50"))) / 1000.0
+        self.snapshot_every = snapshot_every or int(os.getenv("SESSION_SNAPSHOT_EVERY", "50000"))
+        self.stats = {"events": 0, "fsyncs": 0, "snapshots": 0, "segments_compacted": 0,
+                      "recovered_sessions": 0, "replayed_events": 0, "recovery_s": 0.0}
+        self._lock = threading.Lock()
+        self._segment_seq = 0
+        self._file = None
+        self._dirty = False
+        self._events_since_snapshot = 0
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def recover(self) -> Dict[str, Session]:
+        """Load the newest snapshot and replay later segments into self.sessions, then open the log"""
+        if not self.enabled:
+            return self.sessions
+        os.makedirs(self.directory, exist_ok=True)
+        start = time.perf_counter()
+        snapshots = _files(self.directory, _SNAPSHOT_RE)
+        snapshot_seq = 0
+        if snapshots:
+            snapshot_seq, path = snapshots[-1]
+            for record in _read_lines(path):
+                user_id = record.pop("user_id")
+                self.sessions[user_id] = Session.from_dict(record)
+        replayed = 0
+        segments = [(seq, path) for seq, path in _files(self.directory, _SEGMENT_RE) if seq >= snapshot_seq]
+        for _, path in segments:
+            for event in _read_lines(path):
+                apply_event(self.sessions, event)
+                replayed += 1
+        self.stats["recovery_s"] = round(time.perf_counter() - start, 3)
+        self.stats["recovered_sessions"] = len(self.sessions)
+        self.stats["replayed_events"] = replayed
+        # Never append after a possibly torn line: start a fresh segment
+        self._segment_seq = max([snapshot_seq] + [seq for seq, _ in segments]) + 1
+        self._events_since_snapshot = replayed
+        self._open_segment()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-log-fsync", daemon=True)
+        self._flusher.start()
+        print(f"Recovered {len(self.sessions)} sessions ({replayed} events replayed) in {self.stats['recovery_s']}s")
+        return self.sessions
+
+    def append(self, op: str, user_id: str, *args):
+        """Log one mutation, after it has been applied to the session (a snapshot
+        triggered here must already contain it); durable within SESSION_LOG_FSYNC_MS"""
+        if not self.enabled:
+            return
+        line = json.dumps([op, user_id, *args], ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._dirty = True
+        self.stats["events"] += 1
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self, wait: bool = False):
+        """Rotate the log and write the current state in the background, then compact"""
+        if not self.enabled or (self._snapshot_thread is not None and self._snapshot_thread.is_alive()):
+            return
+        with self._lock:
+            old_segment = self._file
+            if old_segment is not None:
+                old_segment.flush()
+            self._dirty = False
+            self._segment_seq += 1
+            self._open_segment()
+            seq = self._segment_seq
+        # Captured on the caller's thread, before any later mutation can run
+        captured = [(user_id, _capture(session)) for user_id, session in self.sessions.items()]
+        self._events_since_snapshot = 0
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot, args=(seq, captured, old_segment), name="session-snapshot", daemon=True)
+        self._snapshot_thread.start()
+        if wait:
+            self._snapshot_thread.join()
+
+    def _write_snapshot(self, seq: int, captured: List[Tuple[str, Tuple]], old_segment=None):
+        path = os.path.join(self.directory, f"snapshot.{seq:08d}.jsonl")
+        tmp_path = path + ".tmp"
+        try:
+            if old_segment is not None:
+                # The rotated segment stays the recovery source until the snapshot lands
+                os.fsync(old_segment.fileno())
+                old_segment.close()
+                self.stats["fsyncs"] += 1
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for user_id, state in captured:
+                    f.write(json.dumps(_snapshot_record(user_id, state), ensure_ascii=False,
+                                       separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._fsync_directory()
+        except OSError as e:
+            print(f"Session snapshot failed: {e}")
+            return
+        self.stats["snapshots"] += 1
+        for pattern in (_SEGMENT_RE, _SNAPSHOT_RE):
+            for old_seq, old_path in _files(self.directory, pattern):
+                if old_seq >= seq:
+                    continue
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    continue
+                if pattern is _SEGMENT_RE:
+                    self.stats["segments_compacted"] += 1
+
+    def close(self):
+        """Flush, fsync and stop the background threads"""
+        if not self.enabled or self._closed.is_set():
+            return
+        self._closed.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        with self._lock:
+            self._close_segment()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"events.{self._segment_seq:08d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._sync_locked()
+            self._file.close()
+            self._file = None
+
+    def _sync_locked(self):
+        if self._dirty and self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self.stats["fsyncs"] += 1
+
+    def _sync(self):
+        """Flush the buffer under the lock, then fsync a duplicate of the fd outside it,
+        so the segment can be swapped and closed while the fsync runs"""
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            self._file.flush()
+            self._dirty = False
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+            self.stats["fsyncs"] += 1
+        finally:
+            os.close(fd)
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.fsync_s):
+            try:
+                self._sync()
+            except OSError as e:
+                print(f"Session log fsync failed: {e}")
+
+    def _fsync_directory(self):
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
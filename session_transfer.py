@@ -0,0 +1,255 @@
+"""
+Streaming export and import of all sessions.
+
+A session record is {"user_id": ..., **Session.to_dict()}, the same layout
+as a session_store snapshot line. Records are encoded one at a time and
+emitted in ~64 KB chunks, and decoded incrementally from whatever chunk
+sizes arrive, so memory stays flat regardless of how many sessions there
+are. Formats:
+  jsonl.gz  gzip-compressed JSON lines (default)
+  jsonl     plain JSON lines
+  msgpack   frames of a 4-byte big-endian length plus one msgpack record
+            (needs the msgpack package)
+
+The CLI talks to the /admin/sessions endpoints of a running backend
+(ADMIN_TOKEN must be set there and passed with --token):
+
+  python session_transfer.py export http://localhost:8000 sessions.jsonl.gz --token $ADMIN_TOKEN
+  python session_transfer.py import http://localhost:8001 sessions.jsonl.gz --token $ADMIN_TOKEN
+"""
+import argparse
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from sessions import Session
+
+EXPORT_FORMATS = ("jsonl.gz", "jsonl", "msgpack")
+MEDIA_TYPES = {"jsonl.gz": "application/gzip", "jsonl": "application/x-ndjson", "msgpack": "application/x-msgpack"}
+CHUNK_BYTES = 64 * 1024
+# Refuse absurd msgpack frames instead of buffering them
+MAX_RECORD_BYTES = 64 * 1024 * 1024
+
+_FRAME = struct.Struct(">I")
+_GZIP_WBITS = 31
+
+
+class TransferFormatError(ValueError):
+    """The stream is not valid data in the declared format"""
+
+
+def check_format(fmt: str) -> str:
+    if fmt not in EXPORT_FORMATS:
+        raise TransferFormatError(f"Unknown format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "msgpack" and msgpack is None:
+        raise TransferFormatError("The msgpack format needs the msgpack package installed")
+    return fmt
+
+
+def format_for_path(path: str) -> str:
+    for fmt in EXPORT_FORMATS:
+        if path.endswith("." + fmt):
+            return fmt
+    return "jsonl"
+
+
+def session_record(user_id: str, session: Session) -> Dict:
+    return {"user_id": user_id, **session.to_dict()}
+
+
+def encode_record(record: Dict, fmt: str) -> bytes:
+    if fmt == "msgpack":
+        payload = msgpack.packb(record, use_bin_type=True)
+        return _FRAME.pack(len(payload)) + payload
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def iter_export_chunks(sessions: Dict[str, Session], fmt: str = "jsonl.gz") -> Iterator[bytes]:
+    """Encoded chunks of every session; sessions removed mid-export are skipped"""
+    check_format(fmt)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, _GZIP_WBITS) if fmt == "jsonl.gz" else None
+    buffer = bytearray()
+    # Only the keys are copied up front; each session is encoded as it is reached
+    for user_id in list(sessions):
+        session = sessions.get(user_id)
+        if session is None:
+            continue
+        data = encode_record(session_record(user_id, session), fmt)
+        buffer += compressor.compress(data) if compressor else data
+        if len(buffer) >= CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if compressor:
+        buffer += compressor.flush()
+    if buffer:
+        yield bytes(buffer)
+
+
+class RecordDecoder:
+    """Incremental decoder: feed() raw chunks of any size, get back whole records.
+    With yield_errors, a record that does not decode comes back as a TransferFormatError
+    in its place instead of raising; errors in the stream itself (gzip, framing) still raise."""
+
+    def __init__(self, fmt: str = "jsonl.gz", yield_errors: bool = False):
+        self.fmt = check_format(fmt)
+        self.yield_errors = yield_errors
+        self._decompressor = zlib.decompressobj(_GZIP_WBITS) if fmt == "jsonl.gz" else None
+        self._pending = bytearray()
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        if self._decompressor is not None:
+            try:
+                chunk = self._decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise TransferFormatError(f"Invalid gzip data: {e}")
+        return self._decode(chunk)
+
+    def close(self) -> List[Dict]:
+        """Records left at the end of the stream; raises on a truncated one"""
+        records = []
+        if self._decompressor is not None:
+            records = self._decode(self._decompressor.flush())
+            if not self._decompressor.eof:
+                raise TransferFormatError("Truncated gzip stream")
+        if self.fmt != "msgpack" and self._pending.strip():
+            self._pending += b"\n"
+            records.extend(self._lines())
+        if self._pending.strip():
+            raise TransferFormatError("Truncated record at end of stream")
+        return records
+
+    def _decode(self, data: bytes) -> List[Dict]:
+        self._pending += data
+        return self._frames() if self.fmt == "msgpack" else self._lines()
+
+    def _lines(self) -> List[Dict]:
+        end = self._pending.rfind(b"\n")
+        if end < 0:
+            return []
+        complete = bytes(self._pending[:end])
+        del self._pending[:end + 1]
+        records = []
+        for line in complete.split(b"\n"):
+            if line.strip():
+                try:
+                    records.append(json.loads(line))
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    records.append(self._invalid(f"Invalid JSON record: {e}"))
+        return records
+
+    def _frames(self) -> List[Dict]:
+        records = []
+        offset = 0
+        while len(self._pending) - offset >= _FRAME.size:
+            (size,) = _FRAME.unpack_from(self._pending, offset)
+            if size > MAX_RECORD_BYTES:
+                raise TransferFormatError(f"Record of {size} bytes exceeds the {MAX_RECORD_BYTES} byte limit")
+            if len(self._pending) - offset - _FRAME.size < size:
+                break
+            start = offset + _FRAME.size
+            try:
+                records.append(msgpack.unpackb(bytes(self._pending[start:start + size]), raw=False))
+            except Exception as e:
+                records.append(self._invalid(f"Invalid msgpack record: {e}"))
+            offset = start + size
+        del self._pending[:offset]
+        return records
+
+    def _invalid(self, message: str) -> TransferFormatError:
+        error = TransferFormatError(message)
+        if not self.yield_errors:
+            raise error
+        return error
+
+
+def parse_record(record: Dict):
+    """(user_id, Session) from an exported record"""
+    if not isinstance(record, dict) or not isinstance(record.get("user_id"), str):
+        raise TransferFormatError("Record without a user_id")
+    data = dict(record)
+    user_id = data.pop("user_id")
+    try:
+        return user_id, Session.from_dict(data)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise TransferFormatError(f"Invalid session record for {user_id}: {e}")
+
+
+def iter_file_records(path: str, fmt: Optional[str] = None, yield_errors: bool = False) -> Iterator[Dict]:
+    """Stream the records of an export file (see RecordDecoder for yield_errors)"""
+    decoder = RecordDecoder(fmt or format_for_path(path), yield_errors)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def iter_file_chunks(path: str) -> Iterable[bytes]:
+    with open(path, "rb") as f:
+        yield from iter(lambda: f.read(CHUNK_BYTES), b"")
+
+
+def export_to_file(base_url: str, path: str, token: str, fmt: str, timeout: float):
+    import httpx
+
+    start = time.perf_counter()
+    written = 0
+    tmp_path = path + ".tmp"
+    with httpx.stream("GET", f"{base_url}/admin/sessions/export", params={"format": fmt},
+                      headers={"X-Admin-Token": token}, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in response.iter_bytes():
+                f.write(chunk)
+                written += len(chunk)
+    os.replace(tmp_path, path)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {response.headers.get('x-session-count', '?')} sessions to {path} "
+          f"({written / 1024 / 1024:.1f} MB in {elapsed:.1f}s)")
+
+
+def import_from_file(base_url: str, path: str, token: str, fmt: str, on_conflict: str, timeout: float):
+    import httpx
+
+    start = time.perf_counter()
+    response = httpx.post(f"{base_url}/admin/sessions/import", params={"format": fmt, "on_conflict": on_conflict},
+                          headers={"X-Admin-Token": token, "Content-Type": MEDIA_TYPES[fmt]},
+                          content=iter_file_chunks(path), timeout=timeout)
+    if response.status_code != 200:
+        raise SystemExit(f"Import failed ({response.status_code}): {response.text}")
+    result = response.json()
+    print(f"Imported {result['imported']} sessions, skipped {result['skipped']} existing "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import all sessions of a running backend")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("url", help="Backend base URL, e.g. http://localhost:8000")
+    parser.add_argument("path", help="Export file; the format follows the extension (.jsonl.gz, .jsonl, .msgpack)")
+    parser.add_argument("--token", default=os.getenv("ADMIN_TOKEN"), help="Admin token (default: $ADMIN_TOKEN)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Override the format implied by the extension")
+    parser.add_argument("--skip-existing", action="store_true", help="On import, keep sessions the backend already has")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("an admin token is required (--token or ADMIN_TOKEN)")
+    fmt = check_format(args.format or format_for_path(args.path))
+    base_url = args.url.rstrip("/")
+    if args.command == "export":
+        export_to_file(base_url, args.path, args.token, fmt, args.timeout)
+    else:
+        import_from_file(base_url, args.path, args.token, fmt,
+                         "skip" if args.skip_existing else "replace", args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compact per-user session state.
+
+Each chat exchange is stored once, already rendered in the prompt format
+("User: ...\nAssistant: ..."), in a __slots__ record that also caches its
+token count, so neither the chat nor the report prompt re-formats or
+re-counts old turns. The session keeps an append-only list of all
+exchanges (for the report) and a fixed-size ring buffer of the newest ones
+(for the chat prompt).
+"""
+import os
+from collections import deque
+from typing import Dict, List, Optional
+
+SESSION_RECENT_EXCHANGES = int(os.getenv("SESSION_RECENT_EXCHANGES", "3"))
+
+# Same layout as prompt_budget.format_exchange
+_USER_PREFIX = "User: "
+_ASSISTANT_PREFIX = "\nAssistant: "
+
+
+class Exchange:
+    """One user/assistant turn, held as its rendered prompt line"""
+
+    __slots__ = ("rendered", "_split", "tokens")
+
+    def __init__(self, user: str, assistant: str):
+        self.rendered = f"{_USER_PREFIX}{user}{_ASSISTANT_PREFIX}{assistant}"
+        self._split = len(_USER_PREFIX) + len(user)
+        # Filled in by PromptAssembler the first time the turn is packed
+        self.tokens: Optional[int] = None
+
+    @property
+    def user(self) -> str:
+        return self.rendered[len(_USER_PREFIX):self._split]
+
+    @property
+    def assistant(self) -> str:
+        return self.rendered[self._split + len(_ASSISTANT_PREFIX):]
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"user": self.user, "assistant": self.assistant}
+
+
+class Session:
+    __slots__ = ("chat_count", "assessment_declined", "assessment_offered", "assessment_suggestion_count",
+                 "assessment_responses", "history", "recent")
+
+    def __init__(self, recent_size: int = SESSION_RECENT_EXCHANGES):
+        self.chat_count = 0
+        self.assessment_declined = False
+        self.assessment_offered = False
+        self.assessment_suggestion_count = 0
+        self.assessment_responses: List[Dict] = []
+        self.history: List[Exchange] = []
+        self.recent: "deque[Exchange]" = deque(maxlen=recent_size)
+
+    def add_exchange(self, user: str, assistant: str) -> Exchange:
+        exchange = Exchange(user, assistant)
+        self.history.append(exchange)
+        self.recent.append(exchange)
+        return exchange
+
+    def set_answer(self, answer: Dict) -> bool:
+        """Store an assessment answer, replacing one for the same question; True if replaced"""
+        for i, existing in enumerate(self.assessment_responses):
+            if existing["question_id"] == answer["question_id"]:
+                self.assessment_responses[i] = answer
+                return True
+        self.assessment_responses.append(answer)
+        return False
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Session":
+        session = cls()
+        for exchange in data.get("chat_history", []):
+            session.add_exchange(exchange["user"], exchange["assistant"])
+        session.chat_count = data.get("chat_count", 0)
+        session.assessment_responses = list(data.get("assessment_responses", []))
+        session.assessment_declined = data.get("assessment_declined", False)
+        session.assessment_suggestion_count = data.get("assessment_suggestion_count", 0)
+        session.assessment_offered = data.get("assessment_offered", False)
+        return session
+
+    def to_dict(self) -> Dict:
+        return {
+            "chat_history": [exchange.to_dict() for exchange in self.history],
+            "chat_count": self.chat_count,
+            "assessment_responses": list(self.assessment_responses),
+            "assessment_declined": self.assessment_declined,
+            "assessment_suggestion_count": self.assessment_suggestion_count,
+            "assessment_offered": self.assessment_offered,
+        }
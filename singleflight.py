@@ -0,0 +1,46 @@
+"""
+Single-flight coalescing of identical in-flight async calls.
+
+While a call for a key is running, further calls with the same key await
+the same result instead of repeating the work (frontend retries, double
+clicks, rerun loops). Keys are content hashes, so nothing is cached once
+the call finishes.
+"""
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+def content_key(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "in_flight": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn once per key at a time; concurrent callers share its result or exception"""
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.stats["in_flight"] = len(self._inflight)
+            task.add_done_callback(lambda _: self._finish(key))
+        # Shield so one cancelled caller does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str):
+        self._inflight.pop(key, None)
+        self.stats["in_flight"] = len(self._inflight)
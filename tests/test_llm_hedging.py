@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+
+from llm_hedging import HedgedChat
+from model_routing import FAST_MODEL, LARGE_MODEL, ModelRouter
+
+FIRST_TOKEN_DELAY_S = {FAST_MODEL: 0.3, LARGE_MODEL: 0.01}
+
+
+class FakeLLM:
+    def __init__(self, config):
+        self.model_name = config.model
+
+    async def astream(self, messages):
+        await asyncio.sleep(FIRST_TOKEN_DELAY_S[self.model_name])
+        yield SimpleNamespace(content=self.model_name)
+
+
+def test_default_routes_have_a_different_backup_model():
+    router = ModelRouter(FakeLLM)
+    for task in router.routes:
+        assert router.backup_for(task).model_name != router.llm_for(task).model_name
+
+
+def test_slow_default_chat_turn_is_hedged():
+    router = ModelRouter(FakeLLM)
+    chat = HedgedChat(router.llm_for("report"), hedge_after_ms=50, deadline_s=5)
+    task, primary = router.route_chat("I have been feeling a bit down", suggest_assessment=False)
+
+    text = asyncio.run(chat.ainvoke([], primary=primary, backup=router.backup_for(task)))
+
+    assert task == "chat"
+    assert text == LARGE_MODEL
+    assert chat.stats["hedged"] == 1
+    assert chat.stats["backup_wins"] == 1
+    assert chat.stats["not_hedged_same_model"] == 0
+
+
+def test_backup_equal_to_primary_is_not_hedged():
+    llm = FakeLLM(SimpleNamespace(model=FAST_MODEL))
+    chat = HedgedChat(llm, hedge_after_ms=50, deadline_s=5)
+
+    assert asyncio.run(chat.ainvoke([], backup=FakeLLM(SimpleNamespace(model=FAST_MODEL)))) == FAST_MODEL
+    assert chat.stats["hedged"] == 0
+    assert chat.stats["not_hedged_same_model"] == 1
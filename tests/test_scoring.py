@@ -0,0 +1,82 @@
+import pytest
+
+from prompt_budget import format_assessment_responses
+from scoring import score_answer, score_assessment, score_frequency, score_rating
+
+FREQUENCY_CASES = [
+    ("Not at all, I have been feeling mostly fine", 0),
+    ("Never", 0),
+    ("Hardly ever", 1),
+    ("Almost never", 1),
+    ("Several days, maybe two or three times a week", 1),
+    ("Sometimes, not all the time", 1),
+    ("I don't feel down very often", 1),
+    ("I dont feel down very often", 1),
+    ("About half the time", 2),
+    ("Every other day", 2),
+    ("More than half the days, it has been pretty hard lately.", 2),
+    ("Nearly every day, I feel like this almost all the time", 3),
+    ("I never stop worrying, it's constant", 3),
+    ("I want to sleep all the time", 3),
+    ("3 days a week", 1),
+    ("Five days a week", 2),
+    # negated and unnegated cues that disagree stay unscored
+    ("Not often, it's every day really", None),
+    ("Some days, but most days lately", None),
+    # a negated cue alone that does not name a score
+    ("Not every day", None),
+    ("I am not sure how to answer that", None),
+]
+
+RATING_CASES = [
+    ("Good", 0),
+    ("I'm doing well, not struggling", 0),
+    ("I'm not exhausted, it's fine", 0),
+    ("Not too bad", 1),
+    ("It could be better", 1),
+    ("Not too good", 2),
+    ("I'm not great", 2),
+    ("Pretty low, not good", 2),
+    ("I would rate it about a five out of ten", 2),
+    ("Really low, I'm exhausted", 3),
+    ("I can't concentrate at all", 3),
+    # "not at all" alone answers "how well ...?"; followed by a word it is a negation
+    ("Not at all", 3),
+    ("Not at all, my mind keeps wandering", 3),
+    ("Not at all tired", None),
+    ("I'm not at all worried", None),
+    ("I'm not at all exhausted, I feel fine", 0),
+    ("Good, but also really bad", None),
+    ("It depends on the day", None),
+]
+
+
+@pytest.mark.parametrize("text,expected", FREQUENCY_CASES)
+def test_score_frequency(text, expected):
+    assert score_frequency(text.lower())[0] == expected
+
+
+@pytest.mark.parametrize("text,expected", RATING_CASES)
+def test_score_rating(text, expected):
+    assert score_rating(text.lower())[0] == expected
+
+
+@pytest.mark.parametrize("text,expected", [("Very low", 0), ("Not too bad", 2), ("Two out of ten", 0), ("Nine out of ten", 3), ("Good", 3)])
+def test_score_rating_lower_is_better(text, expected):
+    assert score_rating(text.lower(), higher_is_better=False)[0] == expected
+
+
+def test_negated_cue_is_in_evidence():
+    score = score_answer({"question_id": 0, "type": "frequency"}, "Sometimes, not all the time")
+    assert score.score == 1
+    assert score.evidence == "sometimes; not all the time"
+
+
+def test_scored_answers_keep_their_transcript_in_the_prompt():
+    questions = [{"question_id": 0, "type": "frequency", "category": "mood"},
+                 {"question_id": 1, "type": "descriptive", "category": "mood"}]
+    responses = [{"question_id": 0, "question": "How often do you feel down?", "answer": "I don't feel down very often"},
+                 {"question_id": 1, "question": "Describe your week", "answer": "Busy but fine"}]
+    prompt = format_assessment_responses(responses, score_assessment(questions, responses))
+    assert "Answer: I don't feel down very often\nLocal score: 1/3" in prompt
+    assert "Answer: Busy but fine" in prompt
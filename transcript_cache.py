@@ -0,0 +1,140 @@
+"""
+Content-addressed cache of audio transcripts.
+
+Keyed by a hash of the Whisper model name plus the raw audio bytes, so a
+resubmission of the same recording (retry after a timeout, rerun loop)
+returns instantly. The in-memory tier is an LRU bounded by total transcript
+size; an optional on-disk tier (TRANSCRIPT_CACHE_DIR) survives restarts and
+is bounded the same way, evicting the least recently written files.
+
+The disk tier keeps an index of its files and their total size in memory
+(built by one directory scan at start-up), so a write never rescans the
+directory. File reads, writes and evictions run in worker threads via
+asyncio.to_thread, never on the event loop.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from singleflight import content_key
+
+
+class TranscriptCache:
+    def __init__(self, max_bytes: Optional[int] = None, disk_dir: Optional[str] = None,
+                 disk_max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+        self.disk_dir = disk_dir if disk_dir is not None else os.getenv("TRANSCRIPT_CACHE_DIR") or None
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else int(
+            os.getenv("TRANSCRIPT_CACHE_DISK_MAX_BYTES", str(64 * 1024 * 1024)))
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "entries": 0, "bytes": 0,
+                      "disk_evictions": 0, "disk_entries": 0, "disk_bytes": 0}
+        # key -> file size, oldest write first; guarded by _disk_lock as writes run in threads
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._disk_lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def key(model: str, audio_bytes: bytes) -> str:
+        return content_key(model, audio_bytes)
+
+    @staticmethod
+    def _entry_size(key: str, transcript: str) -> int:
+        return len(key) + len(transcript.encode("utf-8"))
+
+    async def get(self, key: str) -> Optional[str]:
+        transcript = self._entries.get(key)
+        if transcript is not None:
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return transcript
+        if key in self._disk_index:
+            transcript = await asyncio.to_thread(self._read_disk, key)
+            if transcript is not None:
+                self.stats["disk_hits"] += 1
+                self._put_memory(key, transcript)
+                return transcript
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, transcript: str):
+        """Store a transcript; empty results (failed transcriptions) are never cached"""
+        if not transcript or not transcript.strip():
+            return
+        self._put_memory(key, transcript)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, transcript)
+
+    def _put_memory(self, key: str, transcript: str):
+        size = self._entry_size(key, transcript)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= self._entry_size(key, previous)
+        self._entries[key] = transcript
+        self._size += size
+        while self._size > self.max_bytes:
+            old_key, old_value = self._entries.popitem(last=False)
+            self._size -= self._entry_size(old_key, old_value)
+            self.stats["evictions"] += 1
+        self.stats["entries"] = len(self._entries)
+        self.stats["bytes"] = self._size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.txt")
+
+    def _scan_disk(self):
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".txt"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(".txt")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_size += size
+        self._update_disk_stats()
+
+    def _update_disk_stats(self):
+        self.stats["disk_entries"] = len(self._disk_index)
+        self.stats["disk_bytes"] = self._disk_size
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, transcript: str):
+        try:
+            tmp_path = self._disk_path(key) + f".{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(transcript)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Could not write transcript cache entry: {e}")
+            return
+        evicted = []
+        with self._disk_lock:
+            self._disk_size -= self._disk_index.pop(key, 0)
+            self._disk_index[key] = len(transcript.encode("utf-8"))
+            self._disk_size += self._disk_index[key]
+            while self._disk_size > self.disk_max_bytes and len(self._disk_index) > 1:
+                old_key, size = self._disk_index.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old_key)
+            self.stats["disk_evictions"] += len(evicted)
+            self._update_disk_stats()
+        for old_key in evicted:
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                continue
@@ -0,0 +1,116 @@
+"""
+Approximate nearest neighbour index types for the FAISS knowledge base.
+
+mhguide_db is stored as an exact flat L2 index. At startup the vectors can
+be re-indexed into HNSW or IVF-PQ, chosen with VECTOR_INDEX_TYPE. Built
+indexes are cached next to the store and reused until the store changes.
+
+Run `python -m benchmarks.ann_benchmark` to compare recall@3, latency and
+memory of the configurations before changing the defaults.
+"""
+import math
+import os
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+
+def index_params_from_env() -> Dict:
+    return {
+        "type": os.getenv("VECTOR_INDEX_TYPE", "flat").lower(),
+        "hnsw_m": int(os.getenv("HNSW_M", "32")),
+        "hnsw_ef_construction": int(os.getenv("HNSW_EF_CONSTRUCTION", "200")),
+        "hnsw_ef_search": int(os.getenv("HNSW_EF_SEARCH", "64")),
+        # 0 picks ~4 * sqrt(n) inverted lists
+        "ivf_nlist": int(os.getenv("IVF_NLIST", "0")),
+        "ivf_nprobe": int(os.getenv("IVF_NPROBE", "8")),
+        "pq_m": int(os.getenv("PQ_M", "48")),
+        "pq_nbits": int(os.getenv("PQ_NBITS", "8")),
+    }
+
+
+def index_signature(params: Dict, ntotal: int) -> str:
+    """File-name friendly description of an index configuration"""
+    kind = params["type"]
+    if kind == "hnsw":
+        return f"hnsw_M{params['hnsw_m']}_efc{params['hnsw_ef_construction']}_n{ntotal}"
+    if kind == "ivfpq":
+        return f"ivfpq_nl{params['ivf_nlist']}_m{params['pq_m']}x{params['pq_nbits']}_n{ntotal}"
+    return f"flat_n{ntotal}"
+
+
+def build_index(vectors: np.ndarray, params: Dict) -> faiss.Index:
+    """Build an L2 index of the configured type over the given vectors"""
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    kind = params["type"]
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown VECTOR_INDEX_TYPE '{kind}', expected one of {INDEX_TYPES}")
+
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"])
+        index.hnsw.efConstruction = params["hnsw_ef_construction"]
+        index.add(vectors)
+    elif kind == "ivfpq":
+        pq_m = params["pq_m"]
+        if dim % pq_m:
+            raise ValueError(f"PQ_M={pq_m} must divide the embedding dimension {dim}")
+        # PQ training needs at least 2**nbits points per sub-quantizer
+        nbits = min(params["pq_nbits"], int(math.log2(max(n, 2))))
+        nlist = params["ivf_nlist"] or max(1, int(4 * math.sqrt(n)))
+        nlist = min(nlist, max(1, n // 39))
+        if nbits < 4:
+            print(f"Corpus of {n} vectors is too small for IVF-PQ, using flat index")
+            return build_index(vectors, {**params, "type": "flat"})
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits)
+        # Small corpora train on fewer points than faiss recommends; accept that quietly
+        index.cp.min_points_per_centroid = 1
+        index.pq.cp.min_points_per_centroid = 1
+        index.train(vectors)
+        index.add(vectors)
+    else:
+        index = faiss.IndexFlatL2(dim)
+        index.add(vectors)
+
+    configure_search(index, params)
+    return index
+
+
+def configure_search(index: faiss.Index, params: Dict):
+    """Apply query-time parameters (efSearch / nprobe)"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = params["hnsw_ef_search"]
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(params["ivf_nprobe"], index.nlist)
+
+
+def flat_vectors(index: faiss.Index) -> np.ndarray:
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def load_or_build_index(store_path: str, flat_index: faiss.Index,
+                        params: Optional[Dict] = None) -> faiss.Index:
+    """Return the configured index for a flat store, reusing a cached build when it is current"""
+    params = params or index_params_from_env()
+    if params["type"] == "flat":
+        return flat_index
+
+    cache_path = os.path.join(store_path, f"index.{index_signature(params, flat_index.ntotal)}.faiss")
+    store_file = os.path.join(store_path, "index.faiss")
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(store_file):
+        index = faiss.read_index(cache_path)
+        configure_search(index, params)
+        print(f"Loaded cached {params['type']} index from {cache_path}")
+        return index
+
+    index = build_index(flat_vectors(flat_index), params)
+    try:
+        faiss.write_index(index, cache_path)
+    except Exception as e:
+        print(f"Could not cache {params['type']} index: {e}")
+    print(f"Built {params['type']} index over {index.ntotal} vectors")
+    return index
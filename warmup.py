@@ -0,0 +1,155 @@
+"""
+Start-up warm-up and readiness.
+
+The backend starts serving at once but reports not ready (GET /ready, 503)
+until run_warmup() has finished:
+  * every routed chat model and backup model gets a 1-token completion,
+    which opens their clients' connections (DNS, TLS); the Whisper client
+    opens its connection with a models list call
+  * WARMUP_QUERIES are embedded in one batch into the query embedding cache
+  * a retrieval runs for each of them, which touches the FAISS / BM25 indexes
+    and fills the context cache
+
+Each step is timed and bounded by WARMUP_STEP_TIMEOUT_S. A failed step is
+recorded and warm-up carries on, so a provider outage delays readiness by
+at most the timeouts. FirstRequestTimer records the latency of the first
+request to each endpoint, and whether it arrived before warm-up finished.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from langchain.schema import HumanMessage
+
+DEFAULT_WARMUP_QUERIES = [
+    "I have been feeling anxious lately",
+    "I feel depressed and have no motivation",
+    "I can't sleep at night",
+    "I am stressed about work",
+    "How can I manage stress?",
+    "I feel lonely and isolated",
+    "I have panic attacks",
+    "Should I see a therapist?",
+]
+# Endpoints whose first request is recorded (first path segment per method)
+MAX_TRACKED_ENDPOINTS = 50
+
+
+class WarmupState:
+    def __init__(self):
+        self.enabled = os.getenv("WARMUP", "true").lower() != "false"
+        self.step_timeout_s = float(os.getenv("WARMUP_STEP_TIMEOUT_S", "20"))
+        queries = os.getenv("WARMUP_QUERIES")
+        self.queries: List[str] = ([q.strip() for q in queries.split("|") if q.strip()]
+                                   if queries else DEFAULT_WARMUP_QUERIES)
+        self.ready = not self.enabled
+        self.started = time.monotonic()
+        self.duration_ms: Optional[float] = None
+        self.steps: Dict[str, Dict] = {}
+        self.first_requests: Dict[str, Dict] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def step(self, name: str, run: Callable[[], Awaitable]):
+        """Run one warm-up step within the step timeout and record its outcome"""
+        start = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(run(), self.step_timeout_s)
+            self.steps[name] = {"status": "ok", "ms": round((time.perf_counter() - start) * 1000, 1)}
+            if detail is not None:
+                self.steps[name]["detail"] = detail
+        except Exception as e:
+            status = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            self.steps[name] = {"status": status, "ms": round((time.perf_counter() - start) * 1000, 1),
+                                "error": str(e) or type(e).__name__}
+        print(f"Warm-up step {name}: {self.steps[name]}")
+
+    def finish(self, duration_s: float):
+        self.duration_ms = round(duration_s * 1000, 1)
+        self.ready = True
+        print(f"Warm-up finished in {self.duration_ms} ms, ready")
+
+    def record_first_request(self, endpoint: str, ms: float, status: Optional[int]):
+        if endpoint in self.first_requests or len(self.first_requests) >= MAX_TRACKED_ENDPOINTS:
+            return
+        self.first_requests[endpoint] = {
+            "ms": round(ms, 1),
+            "status": status,
+            "seconds_after_start": round(time.monotonic() - self.started, 1),
+            "before_ready": not self.ready,
+        }
+
+    def snapshot(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "warmup_enabled": self.enabled,
+            "warmup_ms": self.duration_ms,
+            "steps": self.steps,
+            "first_requests": self.first_requests,
+        }
+
+
+def _chat_models(chatbot) -> List:
+    """Distinct chat models: every routed task and its hedging backup"""
+    router = chatbot.router
+    llms = [router.llm_for(task) for task in router.routes] + [router.backup_for(task) for task in router.routes]
+    return list({id(llm): llm for llm in llms if llm is not None}.values())
+
+
+async def run_warmup(chatbot, state: WarmupState):
+    start = time.perf_counter()
+
+    async def groq_connections():
+        # Chat and reports both go through the async clients
+        llms = _chat_models(chatbot)
+        await asyncio.gather(*[llm.bind(max_tokens=1).ainvoke([HumanMessage(content="ping")]) for llm in llms])
+        return f"{len(llms)} models"
+
+    async def transcription_client():
+        await asyncio.to_thread(lambda: chatbot.transcription_client().models.list())
+
+    async def embed_queries():
+        if not chatbot.retriever.needs_embedding:
+            return "skipped, retrieval does not embed queries"
+        return f"{await chatbot.embedding_batcher.prime(state.queries)} queries embedded"
+
+    async def retrieval():
+        results = await asyncio.gather(*[chatbot.aget_relevant_documents(q) for q in state.queries])
+        return f"{sum(1 for docs in results if docs)}/{len(results)} queries with context"
+
+    await asyncio.gather(state.step("groq_connections", groq_connections),
+                         state.step("transcription_client", transcription_client))
+    await state.step("embed_queries", embed_queries)
+    await state.step("retrieval", retrieval)
+    state.finish(time.perf_counter() - start)
+
+
+class FirstRequestTimer:
+    """ASGI middleware timing the first request to each endpoint until its response is sent"""
+
+    def __init__(self, app, state: WarmupState):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint = f"{scope['method']} /{scope['path'].lstrip('/').split('/')[0]}"
+        if endpoint in self.state.first_requests or len(self.state.first_requests) >= MAX_TRACKED_ENDPOINTS:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = None
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            self.state.record_first_request(endpoint, (time.perf_counter() - start) * 1000, status)